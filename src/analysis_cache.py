@@ -0,0 +1,177 @@
+# analysis_cache.py - caché persistente (SQLite) de mediciones de página
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils import LINE_DETECTION_CONFIG
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cotizador", "analysis_cache.sqlite3")
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Bytes estimados por fila además del contenido (clave, índices de SQLite)
+ROW_OVERHEAD_BYTES = 128
+# Versión del esquema (PRAGMA user_version). La 1 incluye en la clave las
+# opciones de medición; las filas anteriores no las registran y se descartan
+SCHEMA_VERSION = 1
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(settings=None):
+    """
+    Parte de la clave con todo lo que cambia una medición además del
+    archivo, la página y el dpi: los umbrales vigentes de
+    LINE_DETECTION_CONFIG y las opciones de medición indicadas (settings,
+    ver analysis_engine.cache_settings).
+    """
+    return json.dumps({'thresholds': LINE_DETECTION_CONFIG, 'settings': settings or {}}, sort_keys=True)
+
+
+class AnalysisCache:
+    """
+    Caché en disco de las mediciones por página (conteos de píxeles y tipo de línea).
+
+    La clave es (hash del contenido, índice de página, DPI, ajustes), con
+    ajustes los umbrales y las opciones de medición (settings_key): una
+    medición solo se reutiliza con la misma configuración con que se hizo.
+    Al superar max_bytes se eliminan las entradas menos usadas recientemente.
+    Es seguro usarla desde el hilo del análisis y desde el hilo de la interfaz.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS page_stats")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_stats (
+                file_hash TEXT NOT NULL,
+                page_index INTEGER NOT NULL,
+                dpi REAL NOT NULL,
+                settings TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, page_index, dpi, settings)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_stats_access ON page_stats (last_access)")
+        self._conn.commit()
+        self._size_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM page_stats").fetchone()[0]
+
+    def get_document(self, file_hash, dpi, settings=None):
+        """Devuelve {índice de página: dict de medición} de todas las páginas en caché del archivo."""
+        key = settings_key(settings)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_index, payload FROM page_stats WHERE file_hash = ? AND dpi = ? AND settings = ?",
+                (file_hash, float(dpi), key)
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    "UPDATE page_stats SET last_access = ? WHERE file_hash = ? AND dpi = ? AND settings = ?",
+                    (time.time(), file_hash, float(dpi), key)
+                )
+                self._conn.commit()
+        return {page_index: json.loads(payload) for page_index, payload in rows}
+
+    def get(self, file_hash, page_index, dpi, settings=None):
+        key = settings_key(settings)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM page_stats WHERE file_hash = ? AND page_index = ? AND dpi = ? AND settings = ?",
+                (file_hash, page_index, float(dpi), key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE page_stats SET last_access = ? "
+                "WHERE file_hash = ? AND page_index = ? AND dpi = ? AND settings = ?",
+                (time.time(), file_hash, page_index, float(dpi), key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def record(self, hits=0, misses=0):
+        """Suma aciertos/fallos resueltos fuera de get() (por ejemplo con get_document)."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def put(self, file_hash, page_index, dpi, stats, settings=None):
+        payload = json.dumps(stats, sort_keys=True)
+        size_bytes = len(payload) + ROW_OVERHEAD_BYTES
+        key = (file_hash, page_index, float(dpi), settings_key(settings))
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size_bytes FROM page_stats WHERE file_hash = ? AND page_index = ? AND dpi = ? AND settings = ?",
+                key
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_stats VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (payload, size_bytes, time.time())
+            )
+            self._size_bytes += size_bytes - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # LRU por tamaño: se borran las entradas con acceso más antiguo en lotes
+        while self._size_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT rowid, size_bytes FROM page_stats ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                self._size_bytes = 0
+                break
+            evicted = []
+            for rowid, size in rows:
+                evicted.append((rowid,))
+                self._size_bytes -= size
+                if self._size_bytes <= self.max_bytes:
+                    break
+            self._conn.executemany("DELETE FROM page_stats WHERE rowid = ?", evicted)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM page_stats").fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': entries,
+                'size_bytes': self._size_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM page_stats")
+            self._conn.commit()
+            self._size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
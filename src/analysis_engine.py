@@ -0,0 +1,1158 @@
+# analysis_engine.py - motor de análisis de páginas PDF sin dependencias de Qt
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass, asdict, field, replace
+from time import perf_counter
+from typing import Iterator, Optional, Union
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+try:
+    import numpy  # noqa: F401  (las vistas de Pixmap de utils.pixmap_to_array la requieren)
+    _HAS_NUMPY = True
+except Exception:
+    _HAS_NUMPY = False
+
+from analysis_cache import file_content_hash
+from coverage_sampling import estimate_coverage, settles_price
+from document_registry import DocumentPool
+from metrics import add_time
+from native_images import measure_native_image
+from page_fingerprint import PageFingerprinter
+from resolution_policy import choose_dpi
+from vector_analysis import classify_page
+from utils import (
+    LINE_DETECTION_CONFIG, points_to_cm, DEFAULT_DPI, calculate_print_cost,
+    PRINT_COSTS, LINE_COSTS, compute_pixel_stats_and_line_type,
+    combine_pixel_stats, count_gray_below, pixmap_to_array
+)
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+PAGES_PER_TASK = 4
+CANCEL_POLL_S = 0.05
+
+# Opciones del análisis; cada llamada puede sobrescribirlas con config={...}
+ANALYSIS_CONFIG = {
+    # Memoria máxima por rasterizado: las páginas mayores se procesan por bandas horizontales
+    "band_budget_bytes": 64 * 1024 * 1024,
+    # Píxeles máximos por página (resolution_policy.choose_dpi): el dpi del
+    # análisis es el máximo y las páginas que no caben se miden con menos
+    # resolución, nunca por debajo de min_dpi ni, si tienen trazos o texto,
+    # de line_min_dpi. None mide todas las páginas con el dpi del análisis
+    "pixel_budget": 32_000_000,
+    "min_dpi": 150,
+    "line_min_dpi": DEFAULT_DPI,
+    # Resolver sin rasterizar las páginas vacías o de solo trazos de poca cobertura
+    "vector_fast_path": True,
+    # Cobertura máxima estimada (%) para aceptar el resultado vectorial: por
+    # debajo del primer rango de PRINT_COSTS (6%) y del umbral de línea (9%)
+    # el precio es el mismo que con el conteo exacto
+    "vector_max_coverage": 5.5,
+    # Contar primero en escala de grises (un byte por píxel, sin tipo de línea).
+    # Es una aproximación protegida por un margen, no una cota: el gris es la
+    # luminancia y el conteo RGB usa el canal mínimo (ver _measure_gray). Se
+    # cuentan los píxeles por debajo del umbral de blanco y por debajo de ese
+    # umbral más gray_white_margin; si todo ese intervalo da un mismo precio
+    # fuera del rango de línea (0-9%) se usa; si no, la página se cuenta en
+    # color. Las páginas de solo trazos van directamente a color. Como
+    # coverage_estimate, hay que pedirla: puede diferir del conteo exacto
+    "gray_first": False,
+    "gray_white_margin": 2,
+    # Rasterizar solo el rectángulo con tinta (PageContent.ink_rect, de
+    # get_bboxlog) ampliado crop_margin_px; el resto de la página se cuenta
+    # como blanco. Se recorta si se ahorra al menos crop_min_saving del área
+    "crop_to_content": True,
+    "crop_margin_px": 4,
+    "crop_min_saving": 0.1,
+    # Páginas escaneadas (una sola imagen, sin máscaras ni recortes): contar
+    # la imagen embebida decodificada (JPEG reducido con draft) en lugar de
+    # rasterizar la página (native_images.measure_native_image). Si el
+    # intervalo del conteo, ampliado native_margin puntos, cruza un límite de
+    # precio o llega al rango de línea, la página se rasteriza. El margen es
+    # empírico, no una cota del error del remuestreo: como coverage_estimate,
+    # es una aproximación que hay que pedir
+    "native_images": False,
+    "native_margin": 1.0,
+    # DPI de la sonda que descarta páginas escaneadas en blanco (0 la desactiva)
+    "blank_probe_dpi": 18,
+    # Medir una sola vez las páginas con el mismo contenido (huella de contenido y recursos)
+    "deduplicate_pages": True,
+    # Modo estimación: la cobertura se estima por muestreo (coverage_sampling) y
+    # solo se cuenta exacta si el intervalo de confianza cruza un límite de precio
+    "coverage_estimate": False,
+    # Bandas horizontales (estratos) y DPI del render de guía que reparte la muestra
+    "estimate_bands": 4,
+    "estimate_guide_dpi": 18,
+    # Franjas a resolución completa y filas de píxeles de cada una
+    "estimate_strips": 24,
+    "estimate_strip_rows": 2,
+    # Nivel de confianza del intervalo
+    "estimate_confidence": 0.99,
+    # Tiempos por etapa en PageStats.timings (analyze_documents lo activa al recibir metrics)
+    "collect_metrics": False,
+}
+
+# Opciones que desactivan todas las vías rápidas y aproximaciones de
+# ANALYSIS_CONFIG: cada página se rasteriza completa al dpi del análisis y se
+# cuenta en color. Es la referencia con la que se comparan
+EXACT_CONFIG = {
+    "pixel_budget": None,
+    "vector_fast_path": False,
+    "blank_probe_dpi": 0,
+    "gray_first": False,
+    "crop_to_content": False,
+    "native_images": False,
+    "deduplicate_pages": False,
+    "coverage_estimate": False,
+}
+
+
+# Opciones que cambian una medición "raster" (la única que se guarda en
+# caché): con el dpi pedido y los umbrales forman la clave de AnalysisCache.
+# pixel_budget y sus mínimos deciden el dpi real de cada página; las demás,
+# qué se rasteriza y con qué aproximaciones
+CACHE_KEY_OPTIONS = (
+    "band_budget_bytes", "pixel_budget", "min_dpi", "line_min_dpi",
+    "gray_first", "gray_white_margin", "crop_to_content", "crop_margin_px", "crop_min_saving",
+    "native_images", "native_margin",
+)
+
+
+def cache_settings(config):
+    """Opciones de CACHE_KEY_OPTIONS de una configuración ya resuelta (resolve_config)."""
+    return {key: config[key] for key in CACHE_KEY_OPTIONS}
+
+
+def resolve_config(config=None):
+    """Combina ANALYSIS_CONFIG con las opciones indicadas por el llamador."""
+    resolved = dict(ANALYSIS_CONFIG)
+    if config:
+        resolved.update(config)
+    return resolved
+
+
+@dataclass
+class PageStats:
+    """Medición de una página, independiente del lienzo y del precio."""
+    width_px: int
+    height_px: int
+    non_white_percentage: int
+    line_type: Optional[str]
+    total_pixels: int = 0
+    white_count: int = 0
+    non_white_count: int = 0
+    black_count: int = 0
+    warning: Optional[str] = None
+    # Cómo se obtuvo: "raster" (conteo de píxeles), "blank", "probe" (sonda a baja
+    # resolución), "vector" (sin rasterizar), "sampled" (estimación por muestreo),
+    # "gray" (conteo aproximado en escala de grises) o "native" (imagen embebida
+    # de una página escaneada). Solo las "raster" se guardan en caché
+    method: str = "raster"
+    # Página de la que se reutilizó la medición ("plano.pdf p. 3"), si era idéntica
+    duplicate_of: Optional[str] = None
+    # Intervalo de confianza (%) de la cobertura, solo en las mediciones "sampled"
+    coverage_interval: Optional[tuple] = None
+    # DPI con que se midió (width_px y height_px están en esa resolución); None
+    # en mediciones anteriores a la política de resolución: el dpi del análisis
+    dpi: Optional[float] = None
+    # Tamaño de la página en puntos (page.rect), del que sale el precio: los
+    # píxeles se redondean con el dpi de cada página. None en mediciones
+    # anteriores que no lo guardan (ver page_size_pt)
+    width_pt: Optional[float] = None
+    height_pt: Optional[float] = None
+    # Segundos por etapa de esta medición (ver metrics.STAGES), solo con config['collect_metrics']
+    timings: Optional[dict] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self):
+        data = asdict(self)
+        del data['timings']
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@dataclass
+class PageResult:
+    """Resultado del análisis y cotización de una página."""
+    pdf_name: str
+    page_num: int
+    width_cm: float
+    height_cm: float
+    width_cm_original: float
+    height_cm_original: float
+    non_white_percentage: int
+    print_type_key: str
+    print_type: str
+    cost: float
+    canvas: str
+    line_type: Optional[str] = None
+    warning: Optional[str] = None
+    method: str = "raster"
+    duplicate_of: Optional[str] = None
+    coverage_interval: Optional[tuple] = None
+    dpi: float = DEFAULT_DPI
+    # Medición de la que sale el precio, para recotizar con otro lienzo sin rasterizar
+    stats: Optional[PageStats] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self):
+        """Devuelve el formato de diccionario usado por la tabla y el reporte."""
+        return {
+            'pdf_name': self.pdf_name,
+            'page_num': self.page_num,
+            'dimensions': f"{self.width_cm:.2f} x {self.height_cm:.2f} cm",
+            'non_white_percentage': self.non_white_percentage,
+            'print_type': self.print_type,
+            'cost': self.cost,
+            'canvas': self.canvas,
+            'original_dimensions': f"{self.width_cm_original:.2f} x {self.height_cm_original:.2f} cm",
+            'method': self.method,
+            'duplicate_of': self.duplicate_of,
+            'coverage_interval': self.coverage_interval,
+            'dpi': self.dpi
+        }
+
+
+@dataclass
+class PageError:
+    """Página (o documento, si page_num es None) que no se pudo analizar."""
+    pdf_name: str
+    page_num: Optional[int]
+    message: str
+
+
+def determine_print_type(width_cm, height_cm):
+    def fits(dimensions, ref_width, ref_height):
+        return (dimensions[0] <= ref_width and dimensions[1] <= ref_height)
+
+    short_side = round(min(width_cm, height_cm))
+    long_side = round(max(width_cm, height_cm))
+
+    # Primero comprobar cuarto pliego (el más pequeño)
+    cuarto_dims = PRINT_COSTS["cuarto_pliego"]["dimensions_cm"]
+    if fits((width_cm, height_cm), cuarto_dims[0], cuarto_dims[1]) or fits((height_cm, width_cm), cuarto_dims[0], cuarto_dims[1]):
+        return "cuarto_pliego"
+
+    # Luego medio pliego
+    medio_dims = PRINT_COSTS["medio_pliego"]["dimensions_cm"]
+    if fits((width_cm, height_cm), medio_dims[0], medio_dims[1]) or fits((height_cm, width_cm), medio_dims[0], medio_dims[1]):
+        return "medio_pliego"
+
+    # Luego pliego estándar con margen flexible en altura
+    if short_side <= 74:
+        return "pliego"
+
+    # Finalmente tamaños extra
+    if 75 <= short_side <= 92:
+        return "extra_90"
+    elif 93 <= short_side <= 105:
+
+        return "large_format"
+
+
+def pixmap_to_image(pix):
+    """Convierte un Pixmap en imagen PIL (copia); solo cuando se necesita PIL."""
+    mode = "RGBA" if pix.alpha else "RGB"
+    return Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+
+
+def page_pixel_rect(page, mat):
+    """Rectángulo en píxeles que ocupa la página completa con la matriz dada."""
+    return page.rect.transform(mat).irect
+
+
+def content_pixel_rect(ink_rect, mat, pixel_rect, margin_px, min_saving=0.0):
+    """
+    Parte de pixel_rect que hay que rasterizar: ink_rect (en coordenadas de
+    page.rect) en píxeles, ampliado margin_px por el antialiasing. Fuera de
+    ella la página es blanca. Devuelve pixel_rect si no hay ink_rect o si el
+    recorte ahorra menos de min_saving del área.
+    """
+    if ink_rect is None:
+        return pixel_rect
+    if ink_rect.is_empty:
+        return fitz.IRect()
+    clip = (ink_rect * mat).irect
+    clip = fitz.IRect(clip.x0 - margin_px, clip.y0 - margin_px, clip.x1 + margin_px, clip.y1 + margin_px)
+    clip &= pixel_rect
+    if clip.is_empty:
+        return fitz.IRect()
+    if clip.width * clip.height > (1 - min_saving) * pixel_rect.width * pixel_rect.height:
+        return pixel_rect
+    return clip
+
+
+def _white_outside(pixel_rect, render_rect):
+    """Conteo (formato de combine_pixel_stats) de lo que queda fuera de render_rect: todo blanco."""
+    outside = pixel_rect.width * pixel_rect.height
+    if not render_rect.is_empty:
+        outside -= render_rect.width * render_rect.height
+    return {'total_pixels': outside, 'white_count': outside, 'black_count': 0}
+
+
+def _render_bands(page, mat, pixel_rect, budget_bytes, colorspace=fitz.csRGB):
+    """
+    Rasteriza pixel_rect en bandas horizontales que no superan budget_bytes,
+    en colorspace y sin alfa.
+
+    Si el área cabe en el presupuesto se hace un único get_pixmap, idéntico
+    al render de página completa. Las bandas se alinean a filas enteras del
+    mismo render; el recorte de MuPDF puede variar ±1 el antialiasing de los
+    bordes que cruzan una banda, sin efecto en el porcentaje redondeado.
+    """
+    row_bytes = max(pixel_rect.width * colorspace.n, 1)
+    rows_per_band = max(1, budget_bytes // row_bytes)
+
+    if pixel_rect.height <= rows_per_band and pixel_rect == page_pixel_rect(page, mat):
+        yield page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+        return
+
+    # Una sola interpretación del contenido para todas las bandas
+    display_list = page.get_displaylist()
+    inverse = ~mat
+    for y0 in range(pixel_rect.y0, pixel_rect.y1, rows_per_band):
+        y1 = min(y0 + rows_per_band, pixel_rect.y1)
+        clip = fitz.Rect(pixel_rect.x0, y0, pixel_rect.x1, y1) * inverse
+        yield display_list.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False, clip=clip)
+
+
+def _measure_pixmap(pix, timings=None):
+    if timings is None:
+        if _HAS_NUMPY:
+            try:
+                return compute_pixel_stats_and_line_type(pixmap_to_array(pix))
+            except Exception:
+                pass
+        return compute_pixel_stats_and_line_type(pixmap_to_image(pix))
+
+    # Misma lógica, separando la conversión del conteo
+    started = perf_counter()
+    if _HAS_NUMPY:
+        try:
+            pixels = pixmap_to_array(pix)
+            add_time(timings, "convert", started)
+            started = perf_counter()
+            stats = compute_pixel_stats_and_line_type(pixels)
+            add_time(timings, "count", started)
+            return stats
+        except Exception:
+            started = perf_counter()
+    image = pixmap_to_image(pix)
+    add_time(timings, "convert", started)
+    started = perf_counter()
+    stats = compute_pixel_stats_and_line_type(image)
+    add_time(timings, "count", started)
+    return stats
+
+
+def _measure_bands(page, mat, pixel_rect, budget_bytes, timings=None):
+    partials = []
+    started = perf_counter() if timings is not None else None
+    for pix in _render_bands(page, mat, pixel_rect, budget_bytes):
+        if timings is not None:
+            add_time(timings, "render", started)
+            timings["rasterized_bytes"] = timings.get("rasterized_bytes", 0) + pix.stride * pix.height
+        partials.append(_measure_pixmap(pix, timings))
+        # Liberar la banda antes de rasterizar la siguiente
+        del pix
+        if timings is not None:
+            started = perf_counter()
+    return partials
+
+
+def _gray_pixels(pix):
+    if _HAS_NUMPY:
+        return pixmap_to_array(pix)
+    return Image.frombytes("L", [pix.width, pix.height], pix.samples)
+
+
+def _measure_gray(page, mat, pixel_rect, budget_bytes, config, timings=None, render_rect=None):
+    """
+    Conteo en escala de grises (ver config['gray_first']). Devuelve el
+    diccionario de combine_pixel_stats, sin tipo de línea ni conteo de
+    negros, o None si el intervalo de cobertura no basta para cotizar. Solo
+    se rasteriza render_rect (por defecto, pixel_rect); el resto es blanco.
+
+    Aproxima el conteo RGB (canal mínimo bajo el umbral de blanco) sin
+    acotarlo: MuPDF dibuja el gris como la luminancia, una media ponderada
+    de R, G y B. Los píxeles con gris bajo el umbral casi siempre lo están
+    también en RGB, porque la luminancia no baja del canal más oscuro, pero
+    un color pálido con un solo canal bajo el umbral, como (255, 255, 240),
+    da gris 254. El margen config['gray_white_margin'] (2 niveles: del
+    umbral 253 hasta el 255 del blanco puro) recoge esos colores; con la
+    conversión de MuPDF todo color con algún canal por debajo de 253 da gris
+    por debajo de 255. Lo que el margen no cubre es el antialiasing y el
+    remuestreo de imágenes, que cada render hace por su cuenta y que cambian
+    unos pocos píxeles de borde. Por eso el conteo en gris solo se usa si el
+    intervalo completo da un mismo precio y queda fuera del rango de línea.
+    """
+    if render_rect is None:
+        render_rect = pixel_rect
+    white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    thresholds = (white_threshold, min(256, white_threshold + config["gray_white_margin"]))
+    total_pixels = _white_outside(pixel_rect, render_rect)['total_pixels']
+    low_count = 0
+    high_count = 0
+    started = perf_counter() if timings is not None else None
+    for pix in _render_bands(page, mat, render_rect, budget_bytes, colorspace=fitz.csGRAY):
+        if timings is not None:
+            add_time(timings, "render", started)
+            timings["rasterized_bytes"] = timings.get("rasterized_bytes", 0) + pix.stride * pix.height
+            started = perf_counter()
+        pixels = _gray_pixels(pix)
+        if timings is not None:
+            add_time(timings, "convert", started)
+            started = perf_counter()
+        low, high = count_gray_below(pixels, thresholds)
+        total_pixels += pix.width * pix.height
+        low_count += low
+        high_count += high
+        del pixels, pix
+        if timings is not None:
+            add_time(timings, "count", started)
+            started = perf_counter()
+
+    if total_pixels <= 0:
+        return None
+    low = low_count / total_pixels * 100
+    high = high_count / total_pixels * 100
+    if not settles_price(low, high):
+        return None
+    return {
+        'total_pixels': total_pixels,
+        'white_count': total_pixels - low_count,
+        'non_white_count': low_count,
+        'black_count': 0,
+        'non_white_percentage': low,
+        'line_type': None
+    }
+
+
+def _histogram_non_white(pix):
+    gray_image = pixmap_to_image(pix).convert("L")
+    return sum(gray_image.histogram()[:254])
+
+
+def probe_is_blank(page, probe_dpi, white_threshold=None):
+    """
+    Rasteriza la página en grises a probe_dpi y comprueba que todos los
+    píxeles superen el umbral de blanco. Cuesta una fracción de milisegundo
+    frente al render completo.
+    """
+    if white_threshold is None:
+        white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    zoom = probe_dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    return min(pix.samples, default=255) >= white_threshold
+
+
+def _blank_page_stats(pixel_rect, method):
+    total_pixels = pixel_rect.width * pixel_rect.height
+    return PageStats(
+        width_px=pixel_rect.width,
+        height_px=pixel_rect.height,
+        non_white_percentage=0,
+        line_type="color",
+        total_pixels=total_pixels,
+        white_count=total_pixels,
+        method=method
+    )
+
+
+def vector_page_stats(page, pixel_rect, dpi=DEFAULT_DPI, config=None, content=None):
+    """
+    Mide una página sin rasterizar cuando su contenido vectorial lo permite.
+
+    Las páginas sin contenido u operaciones de dibujo son 100% blancas
+    (resultado exacto). Las de solo imágenes cuya sonda a
+    config['blank_probe_dpi'] sale blanca (escaneos en blanco) se dan por 0%;
+    como con la página vacía, se cotizan con línea "color". Las de solo trazos se aceptan si ningún color puede dar píxeles negros
+    (tipo de línea "color") y la cota superior de cobertura queda por debajo
+    de config['vector_max_coverage']. En otro caso devuelve None y la página
+    se rasteriza. content es la clasificación ya hecha con este mismo dpi, si la hay.
+    """
+    config = resolve_config(config)
+    if content is None:
+        content = classify_page(page, dpi=dpi)
+    total_pixels = pixel_rect.width * pixel_rect.height
+
+    if content.kind == "blank":
+        return _blank_page_stats(pixel_rect, "blank")
+
+    if content.kind == "images" and config["blank_probe_dpi"]:
+        if probe_is_blank(page, config["blank_probe_dpi"]):
+            return _blank_page_stats(pixel_rect, "probe")
+        return None
+
+    if (content.kind == "lines" and not content.black_capable
+            and content.max_coverage < config["vector_max_coverage"]):
+        non_white_count = min(total_pixels, int(round(total_pixels * content.max_coverage / 100)))
+        return PageStats(
+            width_px=pixel_rect.width,
+            height_px=pixel_rect.height,
+            non_white_percentage=int(round(content.max_coverage)),
+            line_type="color",
+            total_pixels=total_pixels,
+            white_count=total_pixels - non_white_count,
+            non_white_count=non_white_count,
+            method="vector"
+        )
+    return None
+
+
+def estimate_page_stats(page, mat, pixel_rect, config):
+    """
+    Medición por muestreo (ver coverage_sampling.estimate_coverage) si su
+    intervalo de confianza lleva a un único precio; si no, None y la página
+    se cuenta exacta.
+    """
+    estimate = estimate_coverage(page, mat, pixel_rect, config)
+    if estimate is None or not estimate.is_decisive():
+        return None
+    total_pixels = pixel_rect.width * pixel_rect.height
+    non_white_count = min(total_pixels, int(round(total_pixels * estimate.percentage / 100)))
+    black_ratio = estimate.black_ratio
+    return PageStats(
+        width_px=pixel_rect.width,
+        height_px=pixel_rect.height,
+        non_white_percentage=int(round(estimate.percentage)),
+        line_type="negra" if black_ratio >= LINE_DETECTION_CONFIG["min_black_ratio"] else "color",
+        total_pixels=total_pixels,
+        white_count=total_pixels - non_white_count,
+        non_white_count=non_white_count,
+        black_count=int(round(non_white_count * black_ratio)),
+        method="sampled",
+        coverage_interval=(round(estimate.low, 2), round(estimate.high, 2))
+    )
+
+
+def page_size_pt(stats, dpi=DEFAULT_DPI):
+    """
+    Ancho y alto (puntos) de una página medida. Las mediciones sin
+    width_pt/height_pt lo calculan de los píxeles y su dpi (o el indicado).
+    """
+    if stats.width_pt is not None and stats.height_pt is not None:
+        return stats.width_pt, stats.height_pt
+    dpi = stats.dpi or dpi
+    return stats.width_px * 72 / dpi, stats.height_px * 72 / dpi
+
+
+def measure_page(page, dpi=DEFAULT_DPI, config=None):
+    """
+    Mide la cobertura y el tipo de línea de una página.
+
+    Con config['vector_fast_path'] se intenta primero vector_page_stats; si
+    no basta, se rasteriza y se cuenta en una sola pasada. Las páginas que
+    superan config['band_budget_bytes'] se rasterizan por bandas y sus
+    conteos se acumulan banda a banda.
+
+    Con config['native_images'] las páginas escaneadas se cuentan sobre su
+    imagen embebida (native_images.measure_native_image), sin rasterizar,
+    cuando el resultado lleva al mismo precio que el render.
+
+    Con config['coverage_estimate'] se prueba antes estimate_page_stats y
+    solo se cuenta a resolución completa si la estimación no basta.
+
+    Con config['crop_to_content'] solo se rasteriza el rectángulo con tinta
+    de la página (content_pixel_rect) y el resto se cuenta como blanco, con
+    el mismo resultado que el render completo.
+
+    Con config['gray_first'] el conteo se hace primero en escala de grises
+    (_measure_gray) y solo se rasteriza en color si la página puede caer en
+    el rango de línea o cerca de un límite de precio. Las páginas medidas
+    solo en gris no llevan tipo de línea (PageStats.line_type None) y su
+    método es "gray".
+
+    dpi es la resolución máxima: con config['pixel_budget'] cada página se
+    mide con la que elija resolution_policy.choose_dpi según su tamaño y su
+    contenido, y PageStats.dpi la registra.
+
+    Con config['collect_metrics'] la medición lleva en timings los segundos
+    de cada etapa (classify, sample, render, convert, count) y los bytes
+    rasterizados.
+
+    PageStats lleva además el tamaño de la página en puntos (width_pt,
+    height_pt): el precio no depende del dpi con que se midió.
+    """
+    stats = _measure_page(page, dpi, resolve_config(config))
+    stats.width_pt = page.rect.width
+    stats.height_pt = page.rect.height
+    return stats
+
+
+def _measure_page(page, dpi, config):
+    timings = {} if config["collect_metrics"] else None
+    content = None
+    if config["pixel_budget"] or config["gray_first"] or config["crop_to_content"] or config["native_images"]:
+        started = perf_counter() if timings is not None else None
+        try:
+            content = classify_page(page, dpi=dpi)
+        except Exception:
+            content = None
+        if timings is not None:
+            add_time(timings, "classify", started)
+    # Solo trazos (planos): casi siempre en el rango de línea, donde el gris no basta
+    gray_first = config["gray_first"] and (content is None or content.kind != "lines")
+    ink_rect = content.ink_rect if content is not None and config["crop_to_content"] else None
+    if config["pixel_budget"]:
+        page_dpi = choose_dpi(page.rect, dpi, config, content)
+        if page_dpi != dpi:
+            if content is not None and content.kind == "lines":
+                # La cota de cobertura de los trazos depende de la resolución
+                content = None
+            dpi = page_dpi
+    mat = fitz.Matrix(dpi / 72.0, dpi / 72.0)
+    pixel_rect = page_pixel_rect(page, mat)
+    width_px = pixel_rect.width
+    height_px = pixel_rect.height
+    budget = config["band_budget_bytes"]
+
+    if config["vector_fast_path"]:
+        started = perf_counter() if timings is not None else None
+        try:
+            stats = vector_page_stats(page, pixel_rect, dpi=dpi, config=config, content=content)
+        except Exception:
+            stats = None
+        if timings is not None:
+            add_time(timings, "classify", started)
+        if stats is not None:
+            stats.dpi = dpi
+            stats.timings = timings
+            return stats
+
+    if config["native_images"] and content is not None and content.kind == "images":
+        try:
+            stats = measure_native_image(page, mat, pixel_rect, config, content, timings)
+        except Exception:
+            stats = None
+        if stats is not None:
+            return PageStats(
+                width_px=width_px,
+                height_px=height_px,
+                non_white_percentage=int(round(stats['non_white_percentage'])),
+                line_type=stats['line_type'],
+                total_pixels=stats['total_pixels'],
+                white_count=stats['white_count'],
+                non_white_count=stats['non_white_count'],
+                black_count=stats['black_count'],
+                method="native",
+                dpi=dpi,
+                timings=timings
+            )
+
+    if config["coverage_estimate"]:
+        started = perf_counter() if timings is not None else None
+        try:
+            stats = estimate_page_stats(page, mat, pixel_rect, config)
+        except Exception:
+            stats = None
+        if timings is not None:
+            add_time(timings, "sample", started)
+        if stats is not None:
+            stats.dpi = dpi
+            stats.timings = timings
+            return stats
+
+    try:
+        render_rect = content_pixel_rect(ink_rect, mat, pixel_rect, config["crop_margin_px"],
+                                         config["crop_min_saving"])
+        stats = None
+        method = "raster"
+        if render_rect.is_empty:
+            # Sin tinta: toda la página es blanca
+            stats = combine_pixel_stats([_white_outside(pixel_rect, render_rect)])
+        elif gray_first:
+            stats = _measure_gray(page, mat, pixel_rect, budget, config, timings, render_rect)
+            if stats is not None:
+                method = "gray"
+        if stats is None:
+            partials = _measure_bands(page, mat, render_rect, budget, timings)
+            if render_rect != pixel_rect:
+                partials.append(_white_outside(pixel_rect, render_rect))
+            stats = combine_pixel_stats(partials)
+    except Exception as e:
+        # Fallback al método antiguo (histograma en grises) si algo falla
+        non_white_pixels_count = sum(
+            _histogram_non_white(pix) for pix in _render_bands(page, mat, pixel_rect, budget)
+        )
+        total_pixels = width_px * height_px
+        non_white_percentage = round((non_white_pixels_count / total_pixels) * 100) if total_pixels > 0 else 0
+
+        # Sin conteo de negros no hay tipo de línea; se asume color para no bajar el precio
+        return PageStats(
+            width_px=width_px,
+            height_px=height_px,
+            non_white_percentage=non_white_percentage,
+            line_type="color",
+            total_pixels=total_pixels,
+            warning=f"Warning detect_line_type failed: {e}",
+            dpi=dpi,
+            timings=timings
+        )
+
+    return PageStats(
+        width_px=width_px,
+        height_px=height_px,
+        non_white_percentage=int(round(stats['non_white_percentage'])),
+        line_type=stats['line_type'],
+        total_pixels=stats['total_pixels'],
+        white_count=stats['white_count'],
+        non_white_count=stats['non_white_count'],
+        black_count=stats['black_count'],
+        method=method,
+        dpi=dpi,
+        timings=timings
+    )
+
+
+def price_page(stats, pdf_name, page_num, canvas=None, dpi=DEFAULT_DPI):
+    """
+    Aplica lienzo y tarifas (PRINT_COSTS/LINE_COSTS) a una página ya medida.
+    Las medidas en cm salen del tamaño en puntos (page_size_pt); dpi solo se
+    usa si la medición no registra ni ese tamaño ni su propio dpi.
+    """
+    if stats.dpi:
+        dpi = stats.dpi
+    if stats.timings is None:
+        return _price_page(stats, pdf_name, page_num, canvas, dpi)
+    started = perf_counter()
+    result = _price_page(stats, pdf_name, page_num, canvas, dpi)
+    add_time(stats.timings, "price", started)
+    return result
+
+
+def _price_page(stats, pdf_name, page_num, canvas, dpi):
+    width_pt, height_pt = page_size_pt(stats, dpi)
+    width_cm_original = points_to_cm(max(width_pt, height_pt))
+    height_cm_original = points_to_cm(min(width_pt, height_pt))
+
+    if canvas:
+        canvas_dims = PRINT_COSTS[canvas]["dimensions_cm"]
+        width_cm = max(canvas_dims)
+        height_cm = min(canvas_dims)
+        canvas_name = PRINT_COSTS[canvas]["display_name"]
+    else:
+        width_cm = width_cm_original
+        height_cm = height_cm_original
+        canvas_name = "Original"
+
+    non_white_percentage = stats.non_white_percentage
+
+    if canvas:
+        print_type_key = canvas
+    else:
+        print_type_key = determine_print_type(width_cm_original, height_cm_original)
+
+    # Si está en 0% - 9% siempre aplicar LINE_COSTS según el tipo de línea
+    if 0 <= non_white_percentage <= 9 and print_type_key in LINE_COSTS:
+        line_type = stats.line_type
+        cost = LINE_COSTS[print_type_key].get(line_type, 0)
+        tipo_texto = f"{PRINT_COSTS.get(print_type_key, {}).get('display_name', print_type_key)} línea {line_type}"
+
+        # Aplicar redondeos según tipo para mantener consistencia
+        if print_type_key == "cuarto_pliego":
+            cost = round(cost / 500) * 500
+        elif print_type_key in ["pliego", "extra_90", "extra_100", "large_format"]:
+            cost = round(cost / 1000) * 1000
+
+        return PageResult(
+            pdf_name=pdf_name,
+            page_num=page_num,
+            width_cm=width_cm,
+            height_cm=height_cm,
+            width_cm_original=width_cm_original,
+            height_cm_original=height_cm_original,
+            non_white_percentage=non_white_percentage,
+            print_type_key=print_type_key,
+            print_type=tipo_texto,
+            cost=cost,
+            canvas=canvas_name,
+            line_type=line_type,
+            warning=stats.warning,
+            method=stats.method,
+            duplicate_of=stats.duplicate_of,
+            coverage_interval=stats.coverage_interval,
+            dpi=dpi,
+            stats=stats
+        )
+
+    # Si no es caso "línea", usar la lógica normal
+    cost = calculate_print_cost(print_type_key, non_white_percentage, width_cm)
+
+    return PageResult(
+        pdf_name=pdf_name,
+        page_num=page_num,
+        width_cm=width_cm,
+        height_cm=height_cm,
+        width_cm_original=width_cm_original,
+        height_cm_original=height_cm_original,
+        non_white_percentage=non_white_percentage,
+        print_type_key=print_type_key,
+        print_type=PRINT_COSTS[print_type_key]['display_name'],
+        cost=cost,
+        canvas=canvas_name,
+        method=stats.method,
+        duplicate_of=stats.duplicate_of,
+        coverage_interval=stats.coverage_interval,
+        dpi=dpi,
+        stats=stats
+    )
+
+
+def analyze_page(page, pdf_name, canvas=None, dpi=DEFAULT_DPI, config=None):
+    """Rasteriza una página, mide su cobertura y calcula su costo."""
+    stats = measure_page(page, dpi=dpi, config=config)
+    return price_page(stats, pdf_name, page.number + 1, canvas=canvas, dpi=dpi)
+
+
+def _document_cache_state(cache, path, dpi, config, metrics=None):
+    """Hash del archivo y mediciones ya guardadas en caché para sus páginas con esta configuración."""
+    if cache is None or not path:
+        return None, {}
+    started = perf_counter() if metrics is not None else None
+    try:
+        file_hash = file_content_hash(path)
+        cached = cache.get_document(file_hash, dpi, cache_settings(config))
+    except Exception:
+        return None, {}
+    finally:
+        if metrics is not None:
+            metrics.add("cache", perf_counter() - started)
+    return file_hash, {page_index: PageStats.from_dict(data) for page_index, data in cached.items()}
+
+
+def _store_in_cache(cache, file_hash, page_index, dpi, config, stats):
+    # Las mediciones de respaldo (con advertencia) no se guardan, ni las
+    # vectoriales: recalcularlas es más barato que leerlas
+    if cache is None or file_hash is None or stats.warning or stats.method != "raster":
+        return
+    try:
+        cache.put(file_hash, page_index, dpi, replace(stats, duplicate_of=None).to_dict(), cache_settings(config))
+    except Exception:
+        pass
+
+
+def document_name(path, names=None):
+    """pdf_name de los resultados de path: el de names ({ruta: nombre}) o el nombre del archivo."""
+    if names:
+        name = names.get(path)
+        if name:
+            return name
+    return os.path.basename(path)
+
+
+def page_label(pdf_name, page_num):
+    return f"{pdf_name} p. {page_num}"
+
+
+def _page_fingerprint(fingerprinter, page):
+    if fingerprinter is None:
+        return None
+    try:
+        return fingerprinter.fingerprint(page)
+    except Exception:
+        # Sin huella la página simplemente se mide
+        return None
+
+
+def _duplicate_stats(seen_pages, fingerprint):
+    """Medición de la primera página con la misma huella, marcada como duplicada."""
+    if seen_pages is None or fingerprint is None or fingerprint not in seen_pages:
+        return None
+    label, stats = seen_pages[fingerprint]
+    return replace(stats, duplicate_of=label, timings=None)
+
+
+def analyze_document(doc, pdf_name, canvas=None, dpi=DEFAULT_DPI, start=0, stop=None,
+                     config=None, cache=None, seen_pages=None,
+                     metrics=None) -> Iterator[Union[PageResult, PageError]]:
+    """
+    Analiza las páginas [start, stop) de un documento ya abierto, en orden.
+
+    Con cache (AnalysisCache) se reutilizan las mediciones guardadas y solo
+    se rasterizan las páginas que no estén en ella. Con
+    config['deduplicate_pages'] las páginas con la misma huella de contenido
+    reutilizan la medición de la primera; seen_pages ({huella: (etiqueta,
+    PageStats)}) permite compartirlas entre documentos. metrics
+    (PipelineMetrics) recibe el tiempo de consulta de la caché.
+    """
+    config = resolve_config(config)
+    if stop is None:
+        stop = doc.page_count
+    if seen_pages is None and config["deduplicate_pages"]:
+        seen_pages = {}
+    fingerprinter = PageFingerprinter(doc) if seen_pages is not None else None
+    file_hash, cached = _document_cache_state(cache, doc.name, dpi, config, metrics)
+    for page_num in range(start, stop):
+        try:
+            stats = cached.get(page_num)
+            if stats is not None:
+                cache.record(hits=1)
+            else:
+                if file_hash is not None:
+                    cache.record(misses=1)
+                page = doc.load_page(page_num)
+                fingerprint = _page_fingerprint(fingerprinter, page)
+                stats = _duplicate_stats(seen_pages, fingerprint)
+                if stats is None:
+                    stats = measure_page(page, dpi=dpi, config=config)
+                    if fingerprint is not None:
+                        seen_pages[fingerprint] = (page_label(pdf_name, page_num + 1), stats)
+                _store_in_cache(cache, file_hash, page_num, dpi, config, stats)
+            yield price_page(stats, pdf_name, page_num + 1, canvas=canvas, dpi=dpi)
+        except Exception as e:
+            yield PageError(pdf_name, page_num + 1, str(e))
+
+
+# Documentos abiertos por cada proceso del pool; se reutilizan entre rangos del mismo archivo
+_worker_documents = DocumentPool(max_open=1)
+
+
+def measure_page_range(path, page_indices, dpi, config, documents=None, keep_open=True):
+    """
+    Tarea del pool: mide páginas y devuelve [(índice, PageStats o mensaje de error)].
+
+    El documento se abre a través de documents (DocumentPool; por defecto
+    _worker_documents, el del proceso). Con keep_open False se cierra al
+    terminar el rango en lugar de guardarlo para el siguiente, y el archivo
+    queda libre para borrarlo o reemplazarlo (en Windows no se puede
+    mientras esté abierto).
+    """
+    if documents is None:
+        documents = _worker_documents
+    started = perf_counter() if config["collect_metrics"] else None
+    try:
+        doc = documents.get(path)
+    except Exception as e:
+        return [(page_index, str(e)) for page_index in page_indices]
+    open_seconds = perf_counter() - started if started is not None else None
+
+    measured = []
+    try:
+        for page_index in page_indices:
+            try:
+                stats = measure_page(doc.load_page(page_index), dpi=dpi, config=config)
+                if open_seconds is not None:
+                    # La apertura (o reutilización) del documento se carga a la primera página del rango
+                    stats.timings["open"] = open_seconds
+                    open_seconds = None
+                measured.append((page_index, stats))
+            except Exception as e:
+                measured.append((page_index, str(e)))
+    finally:
+        if not keep_open:
+            documents.release(path)
+    return measured
+
+
+def _plan_parallel_tasks(paths, dpi, pages_per_task, config, cache, documents, names=None, metrics=None):
+    """
+    Recorre los documentos en orden y produce los pasos del análisis: páginas
+    ya medidas (caché), páginas repetidas de otra anterior, rangos a medir en
+    el pool o errores de apertura. Los rangos llevan {índice: huella}. Cada
+    documento se abre a través de documents (DocumentPool) y se cierra al
+    terminar de recorrerlo.
+    """
+    # Huellas ya planificadas para medirse; las repeticiones esperan a la primera
+    planned = set()
+    for path in paths:
+        pdf_name = document_name(path, names)
+        started = perf_counter() if metrics is not None else None
+        try:
+            doc = documents.get(path)
+        except Exception as e:
+            yield PageError(pdf_name, None, str(e))
+            continue
+        finally:
+            if metrics is not None:
+                metrics.add("open", perf_counter() - started)
+
+        try:
+            file_hash, cached = _document_cache_state(cache, path, dpi, config, metrics)
+            fingerprinter = PageFingerprinter(doc) if config["deduplicate_pages"] else None
+            batch = {}
+            for page_index in range(doc.page_count):
+                stats = cached.get(page_index)
+                fingerprint = None
+                if stats is None:
+                    fingerprint = _page_fingerprint(fingerprinter, doc.load_page(page_index))
+                    if fingerprint is None or fingerprint not in planned:
+                        if fingerprint is not None:
+                            planned.add(fingerprint)
+                        batch[page_index] = fingerprint
+                        if len(batch) == pages_per_task:
+                            yield ('measure', path, pdf_name, file_hash, batch)
+                            batch = {}
+                        continue
+                if batch:
+                    yield ('measure', path, pdf_name, file_hash, batch)
+                    batch = {}
+                if stats is not None:
+                    yield ('cached', pdf_name, page_index, stats)
+                else:
+                    yield ('duplicate', path, pdf_name, file_hash, page_index, fingerprint)
+            if batch:
+                yield ('measure', path, pdf_name, file_hash, batch)
+        finally:
+            documents.release(path)
+
+
+def _analyze_documents_parallel(paths, canvas, dpi, workers, pages_per_task, cancel_event, config, cache, names,
+                                metrics):
+    executor = ProcessPoolExecutor(max_workers=workers)
+    documents = DocumentPool()
+    # Las repeticiones cuya primera aparición falló se miden en este proceso
+    retry_documents = DocumentPool(max_open=1)
+    try:
+        # Se limita el número de rangos en vuelo para no acumular resultados en memoria
+        pending = deque()
+        steps = _plan_parallel_tasks(paths, dpi, pages_per_task, config, cache, documents, names, metrics)
+        max_in_flight = workers * 2
+        seen_pages = {}
+
+        def submit_next():
+            for step in steps:
+                if isinstance(step, PageError) or step[0] != 'measure':
+                    pending.append(step)
+                    continue
+                _, path, pdf_name, file_hash, fingerprints = step
+                future = executor.submit(measure_page_range, path, list(fingerprints), dpi, config)
+                pending.append((pdf_name, file_hash, fingerprints, future))
+                return
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            head = pending.popleft()
+            if isinstance(head, PageError):
+                yield head
+                continue
+            if head[0] == 'cached':
+                _, pdf_name, page_index, stats = head
+                cache.record(hits=1)
+                yield price_page(stats, pdf_name, page_index + 1, canvas=canvas, dpi=dpi)
+                continue
+            if head[0] == 'duplicate':
+                _, path, pdf_name, file_hash, page_index, fingerprint = head
+                if file_hash is not None:
+                    cache.record(misses=1)
+                try:
+                    stats = _duplicate_stats(seen_pages, fingerprint)
+                    if stats is None:
+                        # La primera aparición falló; esta se mide aquí mismo
+                        [(_, stats)] = measure_page_range(path, [page_index], dpi, config,
+                                                         documents=retry_documents)
+                        if isinstance(stats, str):
+                            raise RuntimeError(stats)
+                        seen_pages[fingerprint] = (page_label(pdf_name, page_index + 1), stats)
+                    _store_in_cache(cache, file_hash, page_index, dpi, config, stats)
+                    yield price_page(stats, pdf_name, page_index + 1, canvas=canvas, dpi=dpi)
+                except Exception as e:
+                    yield PageError(pdf_name, page_index + 1, str(e))
+                continue
+
+            pdf_name, file_hash, fingerprints, future = head
+            if cancel_event is not None:
+                # Se espera en intervalos cortos para atender la cancelación sin esperar el rango completo
+                while not wait([future], timeout=CANCEL_POLL_S).done:
+                    if cancel_event.is_set():
+                        return
+            measured = future.result()
+            submit_next()
+            for page_index, stats in measured:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                if isinstance(stats, str):
+                    yield PageError(pdf_name, page_index + 1, stats)
+                    continue
+                if file_hash is not None:
+                    cache.record(misses=1)
+                if fingerprints[page_index] is not None:
+                    seen_pages[fingerprints[page_index]] = (page_label(pdf_name, page_index + 1), stats)
+                _store_in_cache(cache, file_hash, page_index, dpi, config, stats)
+                try:
+                    yield price_page(stats, pdf_name, page_index + 1, canvas=canvas, dpi=dpi)
+                except Exception as e:
+                    yield PageError(pdf_name, page_index + 1, str(e))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        documents.close_all()
+        retry_documents.close_all()
+
+
+def analyze_documents(paths, canvas=None, dpi=DEFAULT_DPI, workers=1,
+                      pages_per_task=PAGES_PER_TASK, cancel_event=None,
+                      config=None, cache=None, metrics=None, names=None) -> Iterator[Union[PageResult, PageError]]:
+    """
+    Analiza uno o varios PDFs y produce un resultado por página, en orden.
+
+    Args:
+        paths: Rutas de los archivos PDF.
+        canvas: Clave de PRINT_COSTS del lienzo a aplicar, o None para el tamaño original.
+        dpi: Resolución de rasterizado.
+        workers: Procesos a usar. Con más de uno, cada proceso abre su propio
+            documento y mide rangos de pages_per_task páginas; el precio se
+            calcula en el proceso principal.
+        cancel_event: threading.Event opcional; al activarse el análisis se
+            detiene antes de la siguiente página.
+        config: Opciones que sobrescriben ANALYSIS_CONFIG.
+        cache: AnalysisCache opcional consultada antes de rasterizar cada página.
+        metrics: PipelineMetrics opcional; activa config['collect_metrics'] y
+            acumula los tiempos por etapa y los contadores de la ejecución.
+        names: Diccionario opcional {ruta: nombre} con el pdf_name de los
+            resultados de cada documento (p. ej. su ruta relativa a la carpeta
+            analizada); las rutas que no estén usan el nombre del archivo.
+
+    Con config['deduplicate_pages'] las páginas idénticas (en el mismo o en
+    distintos documentos) se miden una vez; las repeticiones llevan
+    duplicate_of con la página original.
+    """
+    # Se resuelve aquí para que los procesos del pool reciban la configuración completa
+    config = resolve_config(config)
+    if metrics is not None:
+        config["collect_metrics"] = True
+        yield from metrics.observe(
+            _analyze_documents(paths, canvas, dpi, workers, pages_per_task, cancel_event, config, cache,
+                               names, metrics),
+            cache
+        )
+    else:
+        yield from _analyze_documents(paths, canvas, dpi, workers, pages_per_task, cancel_event, config, cache,
+                                      names, None)
+
+
+def _analyze_documents(paths, canvas, dpi, workers, pages_per_task, cancel_event, config, cache, names, metrics):
+    if workers > 1:
+        yield from _analyze_documents_parallel(paths, canvas, dpi, workers, pages_per_task, cancel_event,
+                                               config, cache, names, metrics)
+        return
+
+    # Huellas de páginas ya medidas, compartidas entre todos los documentos
+    seen_pages = {} if config["deduplicate_pages"] else None
+    documents = DocumentPool()
+
+    for path in paths:
+        pdf_name = document_name(path, names)
+        started = perf_counter() if metrics is not None else None
+        try:
+            doc = documents.get(path)
+        except Exception as e:
+            yield PageError(pdf_name, None, str(e))
+            continue
+        finally:
+            if metrics is not None:
+                metrics.add("open", perf_counter() - started)
+        try:
+            for outcome in analyze_document(doc, pdf_name, canvas=canvas, dpi=dpi, config=config,
+                                            cache=cache, seen_pages=seen_pages, metrics=metrics):
+                yield outcome
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+        finally:
+            documents.release(path)
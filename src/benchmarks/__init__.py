@@ -0,0 +1,3 @@
+# benchmarks - medición de rendimiento del análisis sobre un corpus sintético y determinista
+from benchmarks.corpus import generate_corpus, generate_document, SIZE_CLASSES, PAGE_KINDS
+from benchmarks.runner import run_benchmark, measure_class, compare
@@ -0,0 +1,64 @@
+# __main__.py - python -m benchmarks [--dpi 300] [--jobs 1] [--pages-per-kind 2] [--estimate] [--stages] [--out resultados.json]
+import argparse
+import json
+import sys
+
+from analysis_engine import EXACT_CONFIG
+from benchmarks.corpus import DEFAULT_PAGES_PER_KIND, DEFAULT_SEED, SIZE_CLASSES
+from benchmarks.runner import run_benchmark, compare
+from utils import DEFAULT_DPI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Rendimiento del análisis sobre un corpus sintético")
+    parser.add_argument("--dpi", type=float, default=DEFAULT_DPI, help="Resolución de rasterizado")
+    parser.add_argument("--jobs", type=int, default=1, help="Procesos de análisis")
+    parser.add_argument("--pages-per-kind", type=int, default=DEFAULT_PAGES_PER_KIND,
+                        help="Páginas de cada tipo (líneas, foto, escaneo, vacía) por documento")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Semilla del corpus")
+    parser.add_argument("--classes", nargs="+", choices=sorted(SIZE_CLASSES), default=None,
+                        help="Clases de tamaño a medir (por defecto, todas)")
+    parser.add_argument("--corpus-dir", default=None, help="Carpeta del corpus generado")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="Desactiva todas las vías rápidas (EXACT_CONFIG): cada página se rasteriza completa")
+    parser.add_argument("--estimate", action="store_true",
+                        help="Modo estimación por muestreo; comprueba que los precios coinciden con el conteo exacto")
+    parser.add_argument("--stages", action="store_true", help="Incluye el tiempo de cada etapa del análisis")
+    parser.add_argument("--out", default=None, help="Archivo JSON de resultados (por defecto, stdout)")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.no_fast_path:
+        config.update(EXACT_CONFIG)
+    if args.estimate:
+        config["coverage_estimate"] = True
+
+    results = run_benchmark(
+        corpus_dir=args.corpus_dir,
+        pages_per_kind=args.pages_per_kind,
+        seed=args.seed,
+        dpi=args.dpi,
+        jobs=max(1, args.jobs),
+        size_classes=args.classes,
+        config=config or None,
+        stages=args.stages,
+        log=lambda message: print(message, file=sys.stderr, flush=True)
+    )
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        for line in compare(previous, results):
+            print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
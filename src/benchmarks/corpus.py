@@ -0,0 +1,117 @@
+# corpus.py - corpus sintético y determinista de PDFs para medir el rendimiento del análisis
+import os
+import random
+
+import fitz  # PyMuPDF
+
+# Clases de tamaño (ancho x alto en cm), una por tipo de impresión de PRINT_COSTS
+SIZE_CLASSES = {
+    "cuarto_pliego": (50, 35),
+    "medio_pliego": (70, 50),
+    "pliego": (100, 70),
+    "extra_90": (120, 90),
+    "large_format": (150, 100),
+}
+# Tipos de página de cada documento
+PAGE_KINDS = ("lines", "photo", "scan", "blank")
+DEFAULT_SEED = 2024
+DEFAULT_PAGES_PER_KIND = 2
+
+# Resolución de las imágenes insertadas (píxeles del lado mayor); la página las escala
+PHOTO_SIZE_PX = 600
+SCAN_SIZE_PX = 1200
+
+
+def cm_to_points(cm):
+    return cm * 72 / 2.54
+
+
+def _draw_lines(page, rng):
+    """Plano de líneas: trazos rectos y rectángulos sin relleno en negro y en color."""
+    width, height = page.rect.width, page.rect.height
+    shape = page.new_shape()
+    for _ in range(rng.randint(150, 300)):
+        start = fitz.Point(rng.uniform(0, width), rng.uniform(0, height))
+        if rng.random() < 0.8:
+            end = fitz.Point(rng.uniform(0, width), rng.uniform(0, height))
+            shape.draw_line(start, end)
+        else:
+            shape.draw_rect(fitz.Rect(start, start + (rng.uniform(10, 200), rng.uniform(10, 200))))
+        color = (0, 0, 0) if rng.random() < 0.6 else (rng.random(), rng.random(), rng.random())
+        shape.finish(color=color, width=rng.choice((0.25, 0.5, 1.0, 2.0)))
+    shape.commit()
+
+
+def _photo_pixmap(rng):
+    """Imagen a color con degradados y ruido: cubre toda la página ("full bleed")."""
+    width, height = PHOTO_SIZE_PX, PHOTO_SIZE_PX * 2 // 3
+    base = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+    samples = bytearray(width * height * 3)
+    noise = rng.randbytes(width * height)
+    i = 0
+    for y in range(height):
+        for x in range(width):
+            n = noise[y * width + x] >> 3
+            samples[i] = (base[0] + x * 255 // width + n) & 255
+            samples[i + 1] = (base[1] + y * 255 // height + n) & 255
+            samples[i + 2] = (base[2] + (x + y) * 128 // (width + height) + n) & 255
+            i += 3
+    return fitz.Pixmap(fitz.csRGB, width, height, bytes(samples), False)
+
+
+def _scan_pixmap(rng):
+    """Página escaneada en gris: papel casi blanco con renglones de "texto" oscuro."""
+    width, height = SCAN_SIZE_PX, SCAN_SIZE_PX * 2 // 3
+    paper = rng.randbytes(width * height)
+    samples = bytearray(248 + (value & 7) for value in paper)
+    line_height = 14
+    for top in range(40, height - 40, line_height * 2):
+        x = 40
+        while x < width - 60:
+            word = rng.randint(10, 60)
+            for y in range(top, top + line_height):
+                row = y * width
+                samples[row + x:row + x + word] = bytes([rng.randint(20, 80)]) * word
+            x += word + rng.randint(8, 20)
+    return fitz.Pixmap(fitz.csGRAY, width, height, bytes(samples), False)
+
+
+def _add_page(doc, kind, size_cm, rng):
+    width_cm, height_cm = size_cm
+    page = doc.new_page(width=cm_to_points(width_cm), height=cm_to_points(height_cm))
+    if kind == "lines":
+        _draw_lines(page, rng)
+    elif kind == "photo":
+        page.insert_image(page.rect, pixmap=_photo_pixmap(rng))
+    elif kind == "scan":
+        page.insert_image(page.rect, pixmap=_scan_pixmap(rng))
+    # "blank": página sin contenido
+
+
+def generate_document(path, size_class, pages_per_kind=DEFAULT_PAGES_PER_KIND, seed=DEFAULT_SEED):
+    """
+    Escribe en path un PDF de la clase de tamaño indicada con pages_per_kind
+    páginas de cada tipo de PAGE_KINDS, intercaladas. Con la misma semilla el
+    archivo es idéntico byte a byte.
+    """
+    rng = random.Random(f"{seed}-{size_class}")
+    doc = fitz.open()
+    try:
+        for _ in range(pages_per_kind):
+            for kind in PAGE_KINDS:
+                _add_page(doc, kind, SIZE_CLASSES[size_class], rng)
+        doc.set_metadata({})
+        doc.save(path, garbage=3, deflate=True, no_new_id=True)
+    finally:
+        doc.close()
+    return path
+
+
+def generate_corpus(folder, pages_per_kind=DEFAULT_PAGES_PER_KIND, seed=DEFAULT_SEED, size_classes=None):
+    """Genera un PDF por clase de tamaño en folder y devuelve {clase: ruta}."""
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for size_class in size_classes or SIZE_CLASSES:
+        path = os.path.join(folder, f"{size_class}_{pages_per_kind}x_{seed}.pdf")
+        paths[size_class] = generate_document(path, size_class, pages_per_kind, seed)
+    return paths
@@ -0,0 +1,162 @@
+# runner.py - mide el análisis sobre el corpus sintético y escribe los resultados en JSON
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from analysis_engine import analyze_documents, price_page, PageError, EXACT_CONFIG
+from metrics import PipelineMetrics
+from utils import DEFAULT_DPI, PRINT_COSTS
+from benchmarks.corpus import generate_corpus, DEFAULT_PAGES_PER_KIND, DEFAULT_SEED
+
+
+def percentile(values, fraction):
+    """Percentil por interpolación lineal (fraction entre 0 y 1)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _peak_rss_bytes():
+    # ru_maxrss está en KiB en Linux (en bytes en macOS); incluye los procesos del pool ya terminados
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+
+def check_pricing_decisions(path, dpi, estimated):
+    """
+    Compara los precios de las páginas estimadas (PageResult por número de
+    página) con los del conteo exacto, en tamaño original y con cada lienzo
+    de PRINT_COSTS (sin ninguna vía rápida, EXACT_CONFIG). Devuelve la
+    lista de diferencias.
+    """
+    mismatches = []
+    for exact in analyze_documents([path], dpi=dpi, config=EXACT_CONFIG):
+        if isinstance(exact, PageError) or exact.page_num not in estimated:
+            continue
+        stats = estimated[exact.page_num].stats
+        for canvas in (None, *PRINT_COSTS):
+            got = price_page(stats, exact.pdf_name, exact.page_num, canvas=canvas, dpi=dpi).cost
+            expected = price_page(exact.stats, exact.pdf_name, exact.page_num, canvas=canvas, dpi=dpi).cost
+            if got != expected:
+                mismatches.append({'page': exact.page_num, 'canvas': canvas, 'estimated': got, 'exact': expected})
+    return mismatches
+
+
+def measure_class(path, dpi, jobs, config, stages=False):
+    """
+    Analiza un documento y devuelve sus métricas. La latencia por página es
+    el tiempo entre resultados consecutivos (con jobs > 1 refleja la
+    cadencia de salida, no el tiempo de cada página). Con stages se añade
+    el desglose por etapa de PipelineMetrics. En modo estimación
+    (config['coverage_estimate']) se comprueba después, fuera del tiempo
+    medido, que las páginas estimadas cuestan lo mismo que con el conteo exacto.
+    """
+    pipeline_metrics = PipelineMetrics() if stages else None
+    estimate_mode = bool(config and config.get("coverage_estimate"))
+    estimated = {}
+    latencies = []
+    methods = {}
+    errors = 0
+    started = last = time.perf_counter()
+    for outcome in analyze_documents([path], dpi=dpi, workers=jobs, config=config, metrics=pipeline_metrics):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+        if isinstance(outcome, PageError):
+            errors += 1
+        else:
+            methods[outcome.method] = methods.get(outcome.method, 0) + 1
+            if estimate_mode and outcome.method == "sampled":
+                estimated[outcome.page_num] = outcome
+    elapsed = time.perf_counter() - started
+    pages = len(latencies) - errors
+    result = {
+        'pages': pages,
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'pages_per_s': round(pages / elapsed, 3) if elapsed > 0 else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(_peak_rss_bytes() / (1024 * 1024), 1),
+        'methods': methods,
+    }
+    if pipeline_metrics is not None:
+        result['stages'] = pipeline_metrics.to_dict()['stages']
+        result['rasterized_mb'] = round(pipeline_metrics.counters['rasterized_bytes'] / (1024 * 1024), 1)
+    if estimate_mode:
+        result['pricing_mismatches'] = check_pricing_decisions(path, dpi, estimated) if estimated else []
+    return result
+
+
+def _measure_in_child(path, dpi, jobs, config, stages, results):
+    results.put(measure_class(path, dpi, jobs, config, stages))
+
+
+def run_benchmark(corpus_dir=None, pages_per_kind=DEFAULT_PAGES_PER_KIND, seed=DEFAULT_SEED,
+                  dpi=DEFAULT_DPI, jobs=1, size_classes=None, config=None, stages=False, log=None):
+    """
+    Genera el corpus (o reutiliza el de corpus_dir) y mide cada clase de
+    tamaño en un proceso nuevo, para que el pico de memoria sea el de esa
+    clase. Sin caché de análisis: se mide siempre el trabajo completo.
+    """
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), "cotizador-benchmark")
+    paths = generate_corpus(corpus_dir, pages_per_kind, seed, size_classes)
+    context = multiprocessing.get_context("spawn")
+    classes = {}
+    for size_class, path in paths.items():
+        if log:
+            log(f"{size_class}: {os.path.basename(path)}")
+        results = context.Queue()
+        process = context.Process(target=_measure_in_child, args=(path, dpi, jobs, config, stages, results))
+        process.start()
+        metrics = results.get()
+        process.join()
+        classes[size_class] = metrics
+        if log:
+            log(f"  {metrics['pages_per_s']} pág/s, p50 {metrics['p50_ms']} ms, "
+                f"p95 {metrics['p95_ms']} ms, RSS {metrics['peak_rss_mb']} MB")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'pymupdf': fitz.VersionBind,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'dpi': dpi,
+            'jobs': jobs,
+            'seed': seed,
+            'pages_per_kind': pages_per_kind,
+            'config': config or {},
+            'stages': stages,
+        },
+        'classes': classes,
+    }
+
+
+def compare(previous, current):
+    """Líneas de texto con la variación de cada métrica entre dos resultados."""
+    lines = []
+    for size_class, metrics in current['classes'].items():
+        before = previous.get('classes', {}).get(size_class)
+        if not before:
+            continue
+        changes = []
+        for key in ('pages_per_s', 'p50_ms', 'p95_ms', 'peak_rss_mb'):
+            if before.get(key) and metrics.get(key) is not None:
+                changes.append(f"{key} {before[key]} -> {metrics[key]} ({(metrics[key] / before[key] - 1) * 100:+.1f}%)")
+        lines.append(f"{size_class}: " + ", ".join(changes))
+    return lines
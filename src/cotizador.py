@@ -0,0 +1,236 @@
+# cotizador.py - cotización por línea de comandos, sin interfaz gráfica
+#
+#   python -m cotizador quote <archivos o carpetas...> [--canvas pliego] [--jobs 8] [--format jsonl|csv]
+#                             [--estimate] [--gray-first] [--native-images] [--pixel-budget 32]
+#                             [--metrics-json tiempos.json] [--metrics-prom cotizador.prom]
+#   python -m cotizador watch <carpeta> [--canvas pliego] [--jobs 8]
+#   python -m cotizador serve [--host 127.0.0.1] [--port 8765] [--jobs 8]
+#
+# Usa el mismo motor que la pestaña del analizador (analysis_engine) y escribe
+# un registro por página en stdout a medida que se termina, y al final el total.
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from analysis_cache import AnalysisCache
+from analysis_engine import analyze_documents, PageError, DEFAULT_WORKERS
+from folder_discovery import iter_pdf_files, parse_filter_text, relative_name
+from hot_folder import HotFolder, HOT_FOLDER_CONFIG
+from metrics import PipelineMetrics
+from quote_report import QUOTE_FIELDS, quote_record
+from quote_server import QuoteServer, SERVER_CONFIG
+from utils import DEFAULT_DPI, PRINT_COSTS
+
+
+def iter_input_paths(paths, include, exclude, names=None):
+    """
+    Archivos tal cual y, de las carpetas, los PDFs de todas sus subcarpetas.
+    Con names ({ruta: nombre}) anota como nombre de cada PDF hallado en una
+    carpeta su ruta relativa a ella, antes de entregarlo.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for found in iter_pdf_files(path, include, exclude):
+                if names is not None:
+                    names[found] = relative_name(found, path)
+                yield found
+        else:
+            yield path
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def page(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def total(self, pages, cost, errors):
+        self.stream.write(json.dumps({'total_pages': pages, 'total_cost': cost, 'errors': errors}) + "\n")
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=QUOTE_FIELDS, lineterminator="\n")
+        self.writer.writeheader()
+
+    def page(self, record):
+        self.writer.writerow(record)
+
+    def total(self, pages, cost, errors):
+        # Fila final: "TOTAL" en pdf_name, páginas en page_num y costo total en cost
+        self.writer.writerow({'pdf_name': "TOTAL", 'page_num': pages, 'cost': cost,
+                              'warning': f"{errors} error(es)" if errors else None})
+
+
+WRITERS = {'jsonl': JsonLinesWriter, 'csv': CsvWriter}
+
+
+def run_quote(args, stdout=sys.stdout, stderr=sys.stderr):
+    """Ejecuta el subcomando quote; devuelve el código de salida (1 si hubo errores)."""
+    include, exclude = parse_filter_text(args.filter)
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = AnalysisCache()
+        except Exception as e:
+            print(f"Caché de análisis no disponible: {e}", file=stderr)
+
+    # Tiempos por etapa solo si se pidió algún archivo de métricas
+    metrics = PipelineMetrics() if args.metrics_json or args.metrics_prom else None
+    config = {}
+    if args.estimate:
+        config["coverage_estimate"] = True
+    if args.gray_first:
+        config["gray_first"] = True
+    if args.native_images:
+        config["native_images"] = True
+    if args.pixel_budget is not None:
+        config["pixel_budget"] = int(args.pixel_budget * 1_000_000) or None
+    writer = WRITERS[args.format](stdout)
+    pages = 0
+    total_cost = 0.0
+    errors = 0
+    names = {}
+    try:
+        outcomes = analyze_documents(
+            iter_input_paths(args.paths, include, exclude, names),
+            canvas=args.canvas,
+            dpi=args.dpi,
+            workers=max(1, args.jobs),
+            config=config or None,
+            cache=cache,
+            metrics=metrics,
+            names=names
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, PageError):
+                errors += 1
+                where = outcome.pdf_name if outcome.page_num is None else f"{outcome.pdf_name} p. {outcome.page_num}"
+                print(f"Error en {where}: {outcome.message}", file=stderr)
+                continue
+            pages += 1
+            total_cost += outcome.cost
+            writer.page(quote_record(outcome))
+            # Cada página se entrega en cuanto está lista, también por tubería
+            stdout.flush()
+        writer.total(pages, total_cost, errors)
+        stdout.flush()
+        if metrics is not None:
+            if args.metrics_json:
+                metrics.write_json(args.metrics_json)
+            if args.metrics_prom:
+                metrics.write_prometheus(args.metrics_prom)
+    finally:
+        if cache is not None:
+            cache.close()
+    return 1 if errors else 0
+
+
+def run_watch(args):
+    """Ejecuta el subcomando watch hasta Ctrl+C."""
+    include, exclude = parse_filter_text(args.filter)
+    hot_folder = HotFolder(
+        args.folder,
+        canvas=args.canvas,
+        jobs=args.jobs,
+        dpi=args.dpi,
+        include=include,
+        exclude=exclude,
+        config={'poll_interval_s': args.interval, 'settle_s': args.settle, 'max_queued': args.max_queued},
+        log=lambda message: print(message, file=sys.stderr, flush=True)
+    )
+    hot_folder.run()
+    return 0
+
+
+def run_serve(args):
+    """Ejecuta el subcomando serve hasta Ctrl+C."""
+    server = QuoteServer(
+        workers=args.jobs,
+        dpi=args.dpi,
+        config={'host': args.host, 'port': args.port, 'max_pending_jobs': args.max_pending}
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cotizador", description="Cotización de impresión de PDFs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    quote = commands.add_parser("quote", help="Cotiza PDFs y escribe un registro por página")
+    quote.add_argument("paths", nargs="+", help="Archivos PDF o carpetas (se recorren las subcarpetas)")
+    quote.add_argument("--canvas", choices=sorted(PRINT_COSTS), default=None,
+                       help="Lienzo a aplicar (por defecto, el tamaño original de cada página)")
+    quote.add_argument("--jobs", type=int, default=DEFAULT_WORKERS,
+                       help=f"Procesos de análisis (por defecto {DEFAULT_WORKERS}, uno por núcleo)")
+    quote.add_argument("--format", choices=sorted(WRITERS), default="jsonl", help="Formato de salida")
+    quote.add_argument("--filter", default="",
+                       help='Patrones para las carpetas, p. ej. "*.pdf; !*borrador*"')
+    quote.add_argument("--dpi", type=float, default=DEFAULT_DPI, help="Resolución máxima de rasterizado")
+    quote.add_argument("--pixel-budget", type=float, default=None,
+                       help="Megapíxeles máximos por página; las mayores se miden con menos DPI (0: siempre --dpi)")
+    quote.add_argument("--no-cache", action="store_true", help="No usar la caché de mediciones")
+    quote.add_argument("--estimate", action="store_true",
+                       help="Estima la cobertura por muestreo; solo cuenta exacto si el precio podría cambiar")
+    quote.add_argument("--gray-first", action="store_true",
+                       help="Cuenta primero en grises; en color solo si el precio podría cambiar (aproximado)")
+    quote.add_argument("--native-images", action="store_true",
+                       help="Cuenta los escaneos sobre su imagen embebida si el precio no puede cambiar (aproximado)")
+    quote.add_argument("--metrics-json", default=None, help="Escribe los tiempos por etapa en este archivo JSON")
+    quote.add_argument("--metrics-prom", default=None,
+                       help="Escribe los tiempos por etapa en formato de texto de Prometheus (textfile collector)")
+
+    watch = commands.add_parser("watch", help="Vigila una carpeta y cotiza los PDFs que llegan")
+    watch.add_argument("folder", help="Carpeta a vigilar (incluye subcarpetas)")
+    watch.add_argument("--canvas", choices=sorted(PRINT_COSTS), default=None,
+                       help="Lienzo a aplicar (por defecto, el tamaño original de cada página)")
+    watch.add_argument("--jobs", type=int, default=DEFAULT_WORKERS,
+                       help=f"Archivos analizados a la vez (por defecto {DEFAULT_WORKERS})")
+    watch.add_argument("--filter", default="", help='Patrones de archivos, p. ej. "*.pdf; !*borrador*"')
+    watch.add_argument("--dpi", type=float, default=DEFAULT_DPI, help="Resolución de rasterizado")
+    watch.add_argument("--interval", type=float, default=HOT_FOLDER_CONFIG["poll_interval_s"],
+                       help="Segundos entre recorridos de la carpeta")
+    watch.add_argument("--settle", type=float, default=HOT_FOLDER_CONFIG["settle_s"],
+                       help="Segundos sin cambios para considerar que un archivo terminó de copiarse")
+    watch.add_argument("--max-queued", type=int, default=HOT_FOLDER_CONFIG["max_queued"],
+                       help="Archivos listos en espera como máximo")
+
+    serve = commands.add_parser("serve", help="Servicio HTTP local de cotización")
+    serve.add_argument("--host", default=SERVER_CONFIG["host"], help="Dirección de escucha")
+    serve.add_argument("--port", type=int, default=SERVER_CONFIG["port"], help="Puerto de escucha")
+    serve.add_argument("--jobs", type=int, default=DEFAULT_WORKERS,
+                       help=f"Procesos de análisis (por defecto {DEFAULT_WORKERS})")
+    serve.add_argument("--dpi", type=float, default=DEFAULT_DPI, help="Resolución de rasterizado")
+    serve.add_argument("--max-pending", type=int, default=SERVER_CONFIG["max_pending_jobs"],
+                       help="Trabajos sin terminar admitidos antes de responder 429")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Los nombres de archivo pueden tener acentos aunque la consola no use UTF-8
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8")
+    if args.command == "quote":
+        return run_quote(args)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "serve":
+        return run_serve(args)
+    return 2
+
+
+if __name__ == "__main__":
+    # Necesario para el pool de procesos en el ejecutable empaquetado
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# coverage_sampling.py - estimación por muestreo de la cobertura de una página, con intervalo de confianza
+import math
+import random
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import fitz  # PyMuPDF
+
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    _HAS_NUMPY = False
+
+from utils import LINE_DETECTION_CONFIG, COVERAGE_BANDS, LINE_PRICING_MAX_PERCENTAGE, pixmap_to_array
+
+# El porcentaje se redondea a entero antes de cotizar: el precio cambia a
+# medio punto de cada límite de COVERAGE_BANDS y del rango de línea (0-9%)
+PRICING_BOUNDARIES = tuple(sorted(
+    {band - 0.5 for band in COVERAGE_BANDS} | {LINE_PRICING_MAX_PERCENTAGE + 0.5}
+))
+# Píxeles con tinta que debe tener la muestra para decidir el tipo de línea
+MIN_INKED_SAMPLE_PIXELS = 2000
+
+
+def straddles_boundary(low, high):
+    """True si el intervalo de cobertura [low, high] (%) contiene un límite de precio."""
+    return any(low <= boundary <= high for boundary in PRICING_BOUNDARIES)
+
+
+def settles_price(low, high):
+    """
+    True si toda cobertura de [low, high] (%) lleva al mismo precio sin
+    conocer el tipo de línea: el intervalo no contiene un límite y queda
+    por encima del rango de línea (0-9%), donde negra y color cuestan igual.
+    """
+    return low > LINE_PRICING_MAX_PERCENTAGE + 0.5 and not straddles_boundary(low, high)
+
+
+@dataclass
+class CoverageEstimate:
+    """Cobertura estimada por muestreo, con intervalos de confianza."""
+    # Porcentaje de píxeles no blancos y su intervalo (en %)
+    percentage: float
+    low: float
+    high: float
+    # Fracción de píxeles negros entre los no blancos y su intervalo
+    black_ratio: float
+    black_ratio_low: float
+    black_ratio_high: float
+    strips: int
+    sampled_pixels: int
+    inked_pixels: int
+
+    def is_decisive(self, min_black_ratio=None):
+        """
+        True si cualquier valor del intervalo lleva al mismo precio: no cruza
+        un límite de rango y, si la página se cobra por tipo de línea, el
+        intervalo de la fracción de negros queda de un solo lado del umbral.
+        """
+        if min_black_ratio is None:
+            min_black_ratio = LINE_DETECTION_CONFIG["min_black_ratio"]
+        if settles_price(self.low, self.high):
+            return True
+        if straddles_boundary(self.low, self.high):
+            return False
+        if self.inked_pixels < MIN_INKED_SAMPLE_PIXELS:
+            return False
+        return not (self.black_ratio_low < min_black_ratio <= self.black_ratio_high)
+
+
+def t_quantile(confidence, df):
+    """
+    Cuantil bilateral de la t de Student (expansión de Cornish-Fisher sobre
+    la normal); con df infinito es el de la normal.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    if not math.isfinite(df):
+        return z
+    df = max(df, 1.0)
+    return (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+def _line_fractions(pix, black_threshold, white_threshold, axis=1):
+    """
+    Fracción de píxeles no blancos y negros de cada fila (axis=1) o columna
+    (axis=0) del Pixmap, con los mismos criterios que el conteo exacto
+    (utils._pixel_counts_numpy).
+    """
+    arr = pixmap_to_array(pix)
+    mn = np.minimum(np.minimum(arr[:, :, 0], arr[:, :, 1]), arr[:, :, 2])
+    mx = np.maximum(np.maximum(arr[:, :, 0], arr[:, :, 1]), arr[:, :, 2])
+    non_white = mn < white_threshold
+    black = mx <= black_threshold
+    if black_threshold >= white_threshold:
+        black &= non_white
+    length = max(non_white.shape[axis], 1)
+    return non_white.sum(axis=axis) / length, black.sum(axis=axis) / length
+
+
+def _edges(length, parts):
+    return [length * i // parts for i in range(parts + 1)]
+
+
+def _band_variances(non_white, black, bands):
+    """
+    Por banda, la varianza entre líneas (filas o columnas) de la fracción no
+    blanca y la de (negros - R·no blancos), con R la razón global.
+    """
+    ratio = float(black.sum() / non_white.sum()) if non_white.sum() else 1.0
+    edges = _edges(len(non_white), bands)
+    variances = []
+    for band in range(bands):
+        p = non_white[edges[band]:edges[band + 1]]
+        b = black[edges[band]:edges[band + 1]]
+        if len(p) > 1:
+            variances.append((float(p.var(ddof=1)), float((b - ratio * p).var(ddof=1))))
+        else:
+            variances.append((0.0, 0.0))
+    return variances
+
+
+def _guide(page, bands, guide_dpi, black_threshold, white_threshold):
+    """
+    Render de guía a baja resolución. Elige la orientación de las franjas
+    (filas si axis=1, columnas si axis=0) con menor varianza entre líneas:
+    en un escaneo de texto las columnas promedian los renglones y varían
+    mucho menos que las filas. Devuelve (axis, varianzas por banda); las
+    varianzas reparten las franjas y acotan por abajo la de una banda cuya
+    muestra no varía.
+    """
+    zoom = guide_dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    best = None
+    for axis in (1, 0):
+        variances = _band_variances(*_line_fractions(pix, black_threshold, white_threshold, axis), bands)
+        # Varianza de la asignación de Neyman: proporcional a (suma de W·S)^2
+        spread = sum(math.sqrt(p_var) for p_var, _ in variances)
+        if best is None or spread < best[0]:
+            best = (spread, axis, variances)
+    return best[1], best[2]
+
+
+def _allocate(strips, weights, minimum):
+    """Reparte strips entre bandas: minimum a cada una y el resto según weights (Neyman)."""
+    count = len(weights)
+    allocation = [minimum] * count
+    extra = strips - minimum * count
+    total = sum(weights)
+    if extra <= 0 or total <= 0:
+        return allocation
+    shares = [extra * weight / total for weight in weights]
+    for band, share in enumerate(shares):
+        allocation[band] += int(share)
+    # Resto mayor: las franjas sobrantes van a las bandas con mayor fracción pendiente
+    remaining = extra - sum(int(share) for share in shares)
+    for band in sorted(range(count), key=lambda b: int(shares[b]) - shares[b])[:remaining]:
+        allocation[band] += 1
+    return allocation
+
+
+def _stratified_interval(terms, confidence):
+    """
+    Semiancho del intervalo de un total estratificado. terms: por banda,
+    (coeficiente de varianza, varianza, tamaño de muestra). Los grados de
+    libertad salen de la aproximación de Satterthwaite.
+    """
+    variance = sum(a * v for a, v, _ in terms)
+    if variance <= 0:
+        return 0.0
+    denominator = sum((a * v) ** 2 / (m - 1) for a, v, m in terms if m > 1)
+    df = variance ** 2 / denominator if denominator > 0 else float("inf")
+    return t_quantile(confidence, df) * math.sqrt(variance)
+
+
+def estimate_coverage(page, mat, pixel_rect, config):
+    """
+    Estima la cobertura de la página a la resolución de mat sin rasterizarla
+    completa.
+
+    Muestreo estratificado por conglomerados: la página se divide en
+    config['estimate_bands'] bandas (estratos) y en cada una se rasterizan,
+    a resolución completa, franjas de lado a lado de la página de
+    config['estimate_strip_rows'] píxeles de grosor en posiciones
+    aleatorias; la franja es la unidad de muestreo. Un render de guía a
+    config['estimate_guide_dpi'] elige si las bandas y franjas son
+    horizontales o verticales, reparte las config['estimate_strips'] franjas
+    (asignación de Neyman) y acota por abajo la varianza de cada banda. El
+    intervalo es de nivel config['estimate_confidence'].
+
+    Devuelve un CoverageEstimate, o None si no hay NumPy.
+    """
+    if not _HAS_NUMPY:
+        return None
+    black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
+    white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    strip_rows = max(1, config["estimate_strip_rows"])
+    confidence = config["estimate_confidence"]
+
+    axis, guide = _guide(page, config["estimate_bands"], config["estimate_guide_dpi"], black_threshold, white_threshold)
+    # Largo de la página en el sentido en que se reparten las franjas
+    length = pixel_rect.height if axis == 1 else pixel_rect.width
+    bands = len(guide)
+    edges = _edges(length, bands)
+    # Franjas posibles y peso de cada banda en la página
+    slots = [max(1, (edges[band + 1] - edges[band]) // strip_rows) for band in range(bands)]
+    weights = [(edges[band + 1] - edges[band]) / length for band in range(bands)]
+    allocation = _allocate(
+        config["estimate_strips"],
+        [weight * math.sqrt(p_var) for weight, (p_var, _) in zip(weights, guide)],
+        minimum=2
+    )
+
+    # Semilla fija por página: la misma página da siempre la misma estimación
+    rng = random.Random(f"{page.number}-{pixel_rect.width}x{pixel_rect.height}")
+    display_list = page.get_displaylist()
+    inverse = ~mat
+    samples = []
+    sampled_pixels = 0
+    inked_pixels = 0
+    for band in range(bands):
+        p_values = []
+        b_values = []
+        for slot in sorted(rng.sample(range(slots[band]), min(allocation[band], slots[band]))):
+            start = edges[band] + slot * strip_rows
+            stop = min(start + strip_rows, edges[band + 1])
+            if axis == 1:
+                strip = fitz.Rect(pixel_rect.x0, pixel_rect.y0 + start, pixel_rect.x1, pixel_rect.y0 + stop)
+            else:
+                strip = fitz.Rect(pixel_rect.x0 + start, pixel_rect.y0, pixel_rect.x0 + stop, pixel_rect.y1)
+            pix = display_list.get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False, clip=strip * inverse)
+            non_white, black = _line_fractions(pix, black_threshold, white_threshold)
+            p_values.append(float(non_white.mean()))
+            b_values.append(float(black.mean()))
+            sampled_pixels += pix.width * pix.height
+            inked_pixels += int(round(float(non_white.sum()) * pix.width))
+            del pix
+        samples.append((np.array(p_values), np.array(b_values)))
+
+    p_hat = sum(weight * p.mean() for weight, (p, _) in zip(weights, samples))
+    b_hat = sum(weight * b.mean() for weight, (_, b) in zip(weights, samples))
+    ratio = b_hat / p_hat if p_hat > 0 else 0.0
+
+    p_terms = []
+    ratio_terms = []
+    for band, (p, b) in enumerate(samples):
+        m = len(p)
+        # Coeficiente con corrección por población finita (franjas de la banda ya vistas)
+        coefficient = weights[band] ** 2 * max(0.0, 1.0 - m / slots[band]) / m
+        p_var, ratio_var = guide[band]
+        if m > 1:
+            p_var = max(p_var, float(p.var(ddof=1)))
+            # Estimador de razón: varianza por linealización (b - R·p)
+            ratio_var = max(ratio_var, float((b - ratio * p).var(ddof=1)))
+        p_terms.append((coefficient, p_var, m))
+        ratio_terms.append((coefficient, ratio_var, m))
+
+    half_width = _stratified_interval(p_terms, confidence)
+    ratio_half_width = _stratified_interval(ratio_terms, confidence) / p_hat if p_hat > 0 else 1.0
+
+    return CoverageEstimate(
+        percentage=p_hat * 100,
+        low=max(0.0, (p_hat - half_width) * 100),
+        high=min(100.0, (p_hat + half_width) * 100),
+        black_ratio=ratio,
+        black_ratio_low=max(0.0, ratio - ratio_half_width),
+        black_ratio_high=min(1.0, ratio + ratio_half_width),
+        strips=sum(len(p) for p, _ in samples),
+        sampled_pixels=sampled_pixels,
+        inked_pixels=inked_pixels
+    )
@@ -0,0 +1,135 @@
+# document_registry.py - registro perezoso de PDFs cargados y pool de documentos abiertos
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+# Máximo de documentos abiertos a la vez (cada uno mantiene un descriptor de archivo)
+DEFAULT_MAX_OPEN_DOCUMENTS = 16
+
+
+@dataclass
+class DocumentInfo:
+    """Datos de un PDF que se muestran antes de analizarlo; no mantiene el archivo abierto."""
+    path: str
+    name: str
+    page_count: int
+    # Tamaño de la primera página en puntos (None si el documento no tiene páginas)
+    width_pt: Optional[float] = None
+    height_pt: Optional[float] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _file_signature(path):
+    """(tamaño, fecha de modificación): si cambia, los datos en memoria ya no valen."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_document_info(path):
+    """
+    Lee el número de páginas y el tamaño de la primera página y cierra el
+    documento. No carga ni dibuja el resto de las páginas.
+    """
+    with fitz.open(path) as doc:
+        if not doc.is_pdf:
+            raise ValueError("El archivo no es un PDF")
+        width_pt = height_pt = None
+        if doc.page_count:
+            # Solo se interpreta el diccionario de la página, no su contenido
+            rect = doc.load_page(0).rect
+            width_pt, height_pt = rect.width, rect.height
+        return DocumentInfo(
+            path=path,
+            name=os.path.basename(path),
+            page_count=doc.page_count,
+            width_pt=width_pt,
+            height_pt=height_pt
+        )
+
+
+class DocumentPool:
+    """
+    Documentos fitz abiertos bajo demanda, con a lo sumo max_open a la vez.
+
+    Al pedir uno nuevo con el pool lleno se cierra el usado hace más tiempo
+    (LRU). Los documentos devueltos por get() pueden cerrarse en una llamada
+    posterior; quien necesite varios a la vez debe usar un max_open suficiente.
+    Cada documento se guarda con el tamaño y la fecha de modificación del
+    archivo al abrirlo: si el archivo se reemplaza en la misma ruta, get()
+    cierra el anterior y abre el nuevo.
+    """
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_DOCUMENTS):
+        self.max_open = max(1, max_open)
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def get(self, path):
+        signature = _file_signature(path)
+        with self._lock:
+            entry = self._documents.get(path)
+            if entry is not None:
+                opened_signature, doc = entry
+                if opened_signature == signature and not doc.is_closed:
+                    self._documents.move_to_end(path)
+                    return doc
+                del self._documents[path]
+                doc.close()
+            doc = fitz.open(path)
+            self._documents[path] = (signature, doc)
+            while len(self._documents) > self.max_open:
+                _, (_, oldest) = self._documents.popitem(last=False)
+                oldest.close()
+            return doc
+
+    def release(self, path):
+        """Cierra el documento de path si está abierto."""
+        with self._lock:
+            entry = self._documents.pop(path, None)
+            if entry is not None:
+                entry[1].close()
+
+    def close_all(self):
+        with self._lock:
+            for _, doc in self._documents.values():
+                doc.close()
+            self._documents.clear()
+
+
+class DocumentRegistry:
+    """
+    PDFs conocidos por la aplicación: sus datos básicos (DocumentInfo) se
+    leen una vez y se guardan en memoria por ruta, tamaño y fecha de
+    modificación. No mantiene documentos abiertos: el análisis los abre con
+    su propio DocumentPool al medirlos.
+    """
+
+    def __init__(self):
+        self._infos = {}
+        self._lock = threading.Lock()
+
+    def info(self, path):
+        """DocumentInfo de path; lanza la excepción de fitz si el archivo no se puede abrir."""
+        path = os.path.abspath(path)
+        signature = _file_signature(path)
+        with self._lock:
+            cached = self._infos.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        info = read_document_info(path)
+        with self._lock:
+            self._infos[path] = (signature, info)
+        return info
+
+    def close(self):
+        with self._lock:
+            self._infos.clear()
@@ -0,0 +1,141 @@
+# folder_discovery.py - búsqueda recursiva de PDFs en carpetas y cola de rutas para el análisis
+import fnmatch
+import os
+import threading
+
+# Patrones por defecto: se comparan con el nombre del archivo, sin distinguir mayúsculas
+DEFAULT_INCLUDE = ("*.pdf",)
+# Espera máxima entre comprobaciones de cancelación
+FEED_POLL_S = 0.05
+
+
+def parse_filter_text(text):
+    """
+    Convierte "*.pdf; !*borrador*" en (incluir, excluir). Los patrones se
+    separan con ";" o ","; los que empiezan con "!" excluyen archivos o carpetas.
+    """
+    include, exclude = [], []
+    for pattern in text.replace(",", ";").split(";"):
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if pattern.startswith("!"):
+            if pattern[1:].strip():
+                exclude.append(pattern[1:].strip())
+        else:
+            include.append(pattern)
+    return tuple(include) or DEFAULT_INCLUDE, tuple(exclude)
+
+
+def relative_name(path, root):
+    """Ruta de path relativa a root con "/": nombre de un PDF hallado en una carpeta o sus subcarpetas."""
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def display_names(paths):
+    """
+    {ruta: nombre} para mostrar archivos sueltos: el nombre del archivo o, si
+    dos se llaman igual, la ruta relativa a la carpeta que tienen en común.
+    """
+    names = {path: os.path.basename(path) for path in paths}
+    if len(set(names.values())) == len(names):
+        return names
+    try:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in names])
+    except ValueError:
+        # Unidades distintas (Windows): no hay carpeta común
+        return {path: os.path.abspath(path) for path in names}
+    return {path: relative_name(os.path.abspath(path), root) for path in names}
+
+
+def _matches_any(name, relative_path, patterns):
+    # Un patrón con "/" se compara con la ruta relativa; si no, con el nombre
+    for pattern in patterns:
+        target = relative_path if "/" in pattern else name
+        if fnmatch.fnmatch(target.lower(), pattern.lower()):
+            return True
+    return False
+
+
+def iter_pdf_files(root, include=DEFAULT_INCLUDE, exclude=(), cancel_event=None):
+    """
+    Recorre root y sus subcarpetas con os.scandir y produce las rutas de los
+    archivos que coinciden con include y no con exclude, a medida que se
+    encuentran. Las carpetas excluidas no se recorren; los enlaces simbólicos
+    a carpetas no se siguen (evita ciclos) y las carpetas sin permiso se omiten.
+    """
+    pending = [root]
+    while pending:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name.lower())
+        except OSError:
+            continue
+
+        subfolders = []
+        for entry in entries:
+            relative_path = relative_name(entry.path, root)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not _matches_any(entry.name, relative_path, exclude):
+                        subfolders.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if _matches_any(entry.name, relative_path, include) and not _matches_any(entry.name, relative_path, exclude):
+                yield entry.path
+        # Orden alfabético: la pila se recorre al revés
+        pending.extend(reversed(subfolders))
+
+
+class PathFeed:
+    """
+    Secuencia de rutas que puede crecer mientras se recorre: el análisis la
+    itera desde su hilo y la búsqueda de archivos agrega rutas desde otro.
+    La iteración espera nuevas rutas hasta que se llama a close() o se
+    activa cancel_event.
+    """
+
+    def __init__(self, paths=(), cancel_event=None):
+        self._paths = list(paths)
+        self._closed = False
+        self._condition = threading.Condition()
+        self.cancel_event = cancel_event
+
+    def __len__(self):
+        with self._condition:
+            return len(self._paths)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def extend(self, paths):
+        with self._condition:
+            self._paths.extend(paths)
+            self._condition.notify_all()
+
+    def close(self):
+        """No habrá más rutas; la iteración termina al agotar las actuales."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self._paths) and not self._closed:
+                    if self.cancel_event is not None and self.cancel_event.is_set():
+                        return
+                    self._condition.wait(FEED_POLL_S)
+                if index >= len(self._paths):
+                    return
+                path = self._paths[index]
+            index += 1
+            yield path
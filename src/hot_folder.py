@@ -0,0 +1,314 @@
+# hot_folder.py - carpeta vigilada: cotiza automáticamente los PDFs que se dejan en ella
+import heapq
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from analysis_engine import analyze_documents, PageError, DEFAULT_WORKERS
+from folder_discovery import iter_pdf_files, relative_name, DEFAULT_INCLUDE
+from quote_report import build_quote, quote_record, write_quotes_report
+from utils import DEFAULT_DPI
+
+# Sufijo de los archivos de cotización junto a cada PDF: "plano.pdf" -> "plano.cotizacion.json/.pdf"
+QUOTE_SUFFIX = ".cotizacion"
+
+# Opciones de la carpeta vigilada; cada HotFolder puede sobrescribirlas con config={...}
+HOT_FOLDER_CONFIG = {
+    # Intervalo entre recorridos de la carpeta
+    "poll_interval_s": 2.0,
+    # Tiempo sin cambios de tamaño ni fecha para considerar que un archivo terminó de copiarse
+    "settle_s": 5.0,
+    # Archivos listos en espera como máximo; con la cola llena se descarta el mayor
+    "max_queued": 64,
+    # Intentos por archivo si su proceso de análisis termina de forma anormal
+    "max_attempts": 2,
+}
+
+
+def quote_paths(pdf_path):
+    """Rutas (JSON, PDF) de la cotización de pdf_path."""
+    base = os.path.splitext(pdf_path)[0] + QUOTE_SUFFIX
+    return base + ".json", base + ".pdf"
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_atomic(path, write):
+    """
+    Escribe path con write(ruta temporal) y lo reemplaza de una vez: nunca
+    queda un archivo a medio escribir con el nombre final.
+    """
+    # Misma carpeta que el destino (os.replace no cruza unidades); no termina en .pdf
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_quote_signature(pdf_path):
+    """Firma (tamaño, fecha) del PDF con la que se escribió su cotización, o None."""
+    json_path, _ = quote_paths(pdf_path)
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            source = json.load(f)['source']
+        return source['size'], source['mtime_ns']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def quote_document(path, canvas, dpi):
+    """
+    Tarea del pool: analiza y cotiza un PDF completo. Devuelve
+    (PageResult por página, mensajes de error); nunca lanza excepciones.
+    """
+    results, errors = [], []
+    try:
+        for outcome in analyze_documents([path], canvas=canvas, dpi=dpi, workers=1):
+            if isinstance(outcome, PageError):
+                where = "" if outcome.page_num is None else f"p. {outcome.page_num}: "
+                errors.append(f"{where}{outcome.message}")
+            else:
+                # La medición no se necesita fuera del proceso
+                outcome.stats = None
+                results.append(outcome)
+    except Exception as e:
+        errors.append(str(e))
+    return results, errors
+
+
+class HotFolder:
+    """
+    Vigila una carpeta (y sus subcarpetas) por sondeo y cotiza cada PDF
+    nuevo o modificado cuando deja de cambiar.
+
+    Junto a cada PDF escribe "<nombre>.cotizacion.json" (cotización por
+    página y total) y "<nombre>.cotizacion.pdf" (el mismo reporte que
+    exporta el analizador). El JSON guarda el tamaño y la fecha del PDF: al
+    reiniciar, los archivos que ya tienen cotización vigente no se vuelven a
+    analizar. Un PDF dañado recibe un JSON con status "error" y tampoco se
+    reintenta hasta que cambie.
+
+    Los archivos listos esperan en una cola acotada ordenada por tamaño (los
+    pequeños primero) y se analizan en un pool de procesos. Si un proceso
+    termina de forma anormal con varios archivos en curso no se sabe cuál lo
+    causó: se reintentan de uno en uno sin contarles un intento.
+    """
+
+    def __init__(self, folder, canvas=None, jobs=DEFAULT_WORKERS, dpi=DEFAULT_DPI,
+                 include=DEFAULT_INCLUDE, exclude=(), config=None, log=print):
+        self.folder = folder
+        self.canvas = canvas
+        self.jobs = max(1, jobs)
+        self.dpi = dpi
+        self.include = include
+        # Los reportes generados también son PDF: nunca se toman como entrada
+        self.exclude = tuple(exclude) + (f"*{QUOTE_SUFFIX}.pdf",)
+        self.config = {**HOT_FOLDER_CONFIG, **(config or {})}
+        self.log = log
+        # Ruta -> (firma, momento desde el que no cambia)
+        self._observed = {}
+        # Ruta -> firma ya cotizada
+        self._done = {}
+        self._queue = []
+        self._queued = set()
+        # Futuro -> (ruta, firma) de los archivos en análisis
+        self._in_flight = {}
+        self._running = set()
+        self._attempts = {}
+        # Archivos en curso cuando se rompió el pool: se analizan solos
+        self._suspects = set()
+        self._sequence = itertools.count()
+        self._executor = None
+
+    # --- Descubrimiento ---
+
+    def scan(self, now=None):
+        """Recorre la carpeta y encola los archivos que dejaron de cambiar."""
+        now = time.monotonic() if now is None else now
+        present = set()
+        for path in iter_pdf_files(self.folder, self.include, self.exclude):
+            present.add(path)
+            try:
+                signature = file_signature(path)
+            except OSError:
+                continue
+            if self._done.get(path) == signature or path in self._queued or path in self._running:
+                continue
+            observed = self._observed.get(path)
+            if observed is None or observed[0] != signature:
+                self._observed[path] = (signature, now)
+                continue
+            if now - observed[1] < self.config["settle_s"]:
+                continue
+            if read_quote_signature(path) == signature:
+                # Cotizado en una ejecución anterior
+                self._done[path] = signature
+                self._observed.pop(path, None)
+                continue
+            self._enqueue(path, signature)
+
+        # Archivos borrados o movidos
+        for path in list(self._observed):
+            if path not in present:
+                del self._observed[path]
+        for path in list(self._done):
+            if path not in present:
+                del self._done[path]
+
+    def _enqueue(self, path, signature):
+        entry = (signature[0], next(self._sequence), path, signature)
+        if len(self._queue) >= self.config["max_queued"]:
+            largest = max(self._queue)
+            if largest[0] <= entry[0]:
+                # Cola llena de archivos menores: este espera al próximo recorrido
+                return
+            # Se descarta el mayor; volverá a encolarse en otro recorrido
+            self._queue.remove(largest)
+            heapq.heapify(self._queue)
+            self._queued.discard(largest[2])
+        heapq.heappush(self._queue, entry)
+        self._queued.add(path)
+
+    # --- Procesamiento ---
+
+    def _submit_ready(self):
+        while self._queue and len(self._in_flight) < self.jobs:
+            if self._in_flight and (self._queue[0][2] in self._suspects
+                                    or any(path in self._suspects for path, _ in self._in_flight.values())):
+                break
+            _, _, path, signature = heapq.heappop(self._queue)
+            self._queued.discard(path)
+            future = self._executor.submit(quote_document, path, self.canvas, self.dpi)
+            self._in_flight[future] = (path, signature)
+            self._running.add(path)
+
+    def _collect(self, timeout):
+        if not self._in_flight:
+            return
+        done, _ = wait(list(self._in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        crashed = []
+        for future in done:
+            path, signature = self._in_flight.pop(future)
+            self._running.discard(path)
+            try:
+                results, errors = future.result()
+            except BrokenProcessPool:
+                crashed.append((path, signature))
+                continue
+            except Exception as e:
+                results, errors = [], [str(e)]
+            self._finish(path, signature, results, errors)
+
+        if crashed:
+            # El pool queda inutilizable: los demás archivos en curso se reintentan en uno nuevo
+            crashed.extend(self._in_flight.values())
+            self._in_flight.clear()
+            self._running.clear()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+            if len(crashed) == 1:
+                [(path, signature)] = crashed
+                self._retry_or_fail(path, signature, "El proceso de análisis terminó de forma anormal")
+            else:
+                # Solo uno tumbó el proceso, pero no se sabe cuál: sin contar intento
+                for path, signature in crashed:
+                    self._suspects.add(path)
+                    self._enqueue(path, signature)
+
+    def _retry_or_fail(self, path, signature, message):
+        attempts = self._attempts.get(path, 0) + 1
+        self._attempts[path] = attempts
+        if attempts < self.config["max_attempts"]:
+            self._enqueue(path, signature)
+        else:
+            self._finish(path, signature, [], [message])
+
+    def _finish(self, path, signature, results, errors):
+        self._attempts.pop(path, None)
+        self._suspects.discard(path)
+        name = relative_name(path, self.folder)
+        try:
+            if file_signature(path) != signature:
+                # Cambió mientras se analizaba: se cotizará de nuevo cuando se estabilice
+                self._observed.pop(path, None)
+                return
+            self.write_quote(path, signature, results, errors)
+        except OSError as e:
+            self.log(f"Error al escribir la cotización de {name}: {e}")
+            return
+        self._done[path] = signature
+        self._observed.pop(path, None)
+        if results:
+            total = sum(result.cost for result in results)
+            self.log(f"✅ {name}: {len(results)} página(s), ${total:,.0f}"
+                     + (f" ({len(errors)} error(es))" if errors else ""))
+        else:
+            self.log(f"❌ {name}: {'; '.join(errors) or 'sin páginas'}")
+
+    def write_quote(self, path, signature, results, errors):
+        """Escribe el JSON y, si hay páginas cotizadas, el reporte PDF de path."""
+        json_path, report_path = quote_paths(path)
+        pages = [quote_record(result) for result in results]
+        payload = {
+            'source': {'name': os.path.basename(path), 'size': signature[0], 'mtime_ns': signature[1]},
+            'status': "ok" if results else "error",
+            'canvas': self.canvas,
+            'dpi': self.dpi,
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'total_pages': len(pages),
+            'total_cost': sum(page['cost'] for page in pages),
+            'pages': pages,
+            'errors': errors
+        }
+        if results:
+            quote = build_quote(result.to_dict() for result in results)
+            write_atomic(report_path, lambda temp_path: write_quotes_report([quote], temp_path))
+
+        def write_json(temp_path):
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+        # El JSON va al final: su presencia indica que la cotización está completa
+        write_atomic(json_path, write_json)
+
+    def run_once(self, now=None, timeout=0):
+        """Un ciclo: recorre la carpeta, envía trabajos y recoge los terminados."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        self.scan(now)
+        self._submit_ready()
+        self._collect(timeout)
+        self._submit_ready()
+
+    def run(self, stop_event=None):
+        """Vigila la carpeta hasta que se active stop_event (o Ctrl+C)."""
+        self.log(f"👀 Vigilando '{self.folder}' con {self.jobs} proceso(s)...")
+        try:
+            while stop_event is None or not stop_event.is_set():
+                started = time.monotonic()
+                self.run_once(timeout=self.config["poll_interval_s"])
+                elapsed = time.monotonic() - started
+                if not self._in_flight and elapsed < self.config["poll_interval_s"]:
+                    if stop_event is not None:
+                        stop_event.wait(self.config["poll_interval_s"] - elapsed)
+                    else:
+                        time.sleep(self.config["poll_interval_s"] - elapsed)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
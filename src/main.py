@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import (QApplication, QMainWindow, QTabWidget,
                                QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QGraphicsOpacityEffect, QSplashScreen, QLabel, QMessageBox, QFileDialog)
@@ -209,4 +210,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos del analizador en el ejecutable empaquetado
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+# metrics.py - tiempos por etapa y contadores del análisis, exportables a JSON y Prometheus
+import json
+import os
+import time
+from time import perf_counter
+
+# Etapas medidas, en el orden del recorrido de una página
+STAGES = (
+    "open",       # fitz.open del documento
+    "cache",      # hash del archivo y lectura de la caché de mediciones
+    "classify",   # preanálisis vectorial y sonda de páginas vacías
+    "sample",     # estimación de cobertura por muestreo (modo estimación)
+    "render",     # get_pixmap (por bandas si la página es grande)
+    "convert",    # pixmap -> arreglo NumPy o imagen PIL; decodificación de la imagen de un escaneo
+    "count",      # conteo de píxeles y tipo de línea (compute_pixel_stats_and_line_type)
+    "price",      # PRINT_COSTS / LINE_COSTS
+    "ui",         # actualización de la tabla de resultados
+)
+
+
+def add_time(timings, stage, started):
+    """Suma a timings[stage] el tiempo transcurrido desde started (perf_counter)."""
+    timings[stage] = timings.get(stage, 0.0) + perf_counter() - started
+
+
+class PipelineMetrics:
+    """
+    Tiempos acumulados por etapa y contadores de una ejecución del análisis.
+
+    Las mediciones de cada página viajan en PageStats.timings (también desde
+    los procesos del pool) y se suman aquí al recibir el resultado. Sin un
+    PipelineMetrics el análisis no toma tiempos.
+    """
+
+    def __init__(self):
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.calls = {stage: 0 for stage in STAGES}
+        self.counters = {
+            'pages': 0,
+            'errors': 0,
+            'rasterized_bytes': 0,
+            'measured_pages': 0,
+            'reused_pages': 0,
+            'fast_path_pages': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+        }
+        self.wall_seconds = 0.0
+
+    def add(self, stage, seconds, calls=1):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_page(self, result):
+        """Suma un PageResult: sus tiempos por etapa, si se midió ahora, y los contadores."""
+        self.count('pages')
+        stats = result.stats
+        timings = stats.timings if stats is not None else None
+        if timings is None:
+            # Medición de la caché o de una página idéntica ya medida
+            self.count('reused_pages')
+            return
+        self.count('measured_pages')
+        if stats.method != "raster":
+            self.count('fast_path_pages')
+        for key, value in timings.items():
+            if key == 'rasterized_bytes':
+                self.count(key, value)
+            else:
+                self.add(key, value)
+
+    def observe(self, outcomes, cache=None):
+        """Recorre los resultados de analyze_documents sumándolos; los devuelve sin cambios."""
+        started = perf_counter()
+        cache_start = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        try:
+            for outcome in outcomes:
+                if hasattr(outcome, "stats"):
+                    self.add_page(outcome)
+                else:
+                    self.count('errors')
+                yield outcome
+        finally:
+            self.wall_seconds += perf_counter() - started
+            if cache is not None:
+                self.count('cache_hits', cache.hits - cache_start[0])
+                self.count('cache_misses', cache.misses - cache_start[1])
+
+    # --- Exportación ---
+
+    def to_dict(self):
+        stages = {
+            stage: {
+                'seconds': round(self.seconds[stage], 6),
+                'calls': self.calls[stage],
+                'share': round(self.seconds[stage] / self.wall_seconds, 4) if self.wall_seconds else None
+            }
+            for stage in self.seconds
+        }
+        pages = self.counters['pages']
+        return {
+            'wall_seconds': round(self.wall_seconds, 6),
+            'pages_per_s': round(pages / self.wall_seconds, 3) if self.wall_seconds else None,
+            'stages': stages,
+            'counters': dict(self.counters),
+        }
+
+    def summary_lines(self):
+        """Texto para el panel de la aplicación: etapas de mayor a menor tiempo."""
+        data = self.to_dict()
+        lines = [f"Tiempo total: {data['wall_seconds']:.2f} s | {self.counters['pages']} página(s)"
+                 + (f" | {data['pages_per_s']} pág/s" if data['pages_per_s'] else "")]
+        for stage, values in sorted(data['stages'].items(), key=lambda item: -item[1]['seconds']):
+            if values['calls']:
+                share = f" ({values['share'] * 100:.1f}%)" if values['share'] is not None else ""
+                lines.append(f"  {stage:<9} {values['seconds'] * 1000:10.1f} ms{share}  {values['calls']} llamada(s)")
+        counters = self.counters
+        lines.append(f"  Rasterizado: {counters['rasterized_bytes'] / (1024 * 1024):.1f} MB | "
+                     f"medidas: {counters['measured_pages']} | reutilizadas: {counters['reused_pages']} | "
+                     f"caché: {counters['cache_hits']} acierto(s), {counters['cache_misses']} fallo(s)")
+        return lines
+
+    def prometheus_text(self, prefix="cotizador"):
+        """Formato de texto de Prometheus (p. ej. para el textfile collector de node_exporter)."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Tiempo acumulado por etapa del análisis.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+                  for stage, seconds in self.seconds.items()]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Veces que se ejecutó cada etapa.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {calls}' for stage, calls in self.calls.items()]
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        lines.append(f"# TYPE {prefix}_run_seconds gauge")
+        lines.append(f"{prefix}_run_seconds {self.wall_seconds:.6f}")
+        lines.append(f"# TYPE {prefix}_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write_text(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        _write_text(path, self.prometheus_text())
+
+
+def _write_text(path, text):
+    # Reemplazo atómico: el colector nunca lee un archivo a medio escribir
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
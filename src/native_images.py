@@ -0,0 +1,252 @@
+# native_images.py - medición de páginas escaneadas sobre la imagen embebida, sin rasterizar la página
+import io
+import math
+import re
+from time import perf_counter
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    _HAS_NUMPY = False
+
+from coverage_sampling import settles_price
+from metrics import add_time
+from utils import LINE_DETECTION_CONFIG, KERNEL_BLOCK_PIXELS, pixmap_to_array
+
+# Tolerancia (en puntos) al comparar el rectángulo de la imagen con la página
+# y con lo que get_bboxlog registra como pintado
+PLACEMENT_TOLERANCE_PT = 1.0
+# Ampliación (píxeles de render por píxel decodificado) a partir de la cual
+# MuPDF, salvo con /Interpolate, repite cada píxel de la imagen y el conteo
+# nativo coincide con el render; por debajo interpola o reduce, mezcla
+# vecinos, y el render se simula con una media móvil
+NEAREST_MAGNIFICATION = 2.0
+# Tolerancia relativa de la ampliación por el redondeo de los tamaños en
+# píxeles (2551 px de imagen para 2552 de render); en el límite se acota con
+# ambos conteos
+MAGNIFICATION_TOLERANCE = 0.01
+# Tamaño pedido a draft() respecto al de render: si la imagen reducida queda
+# apenas por debajo (2551 px para 2552 de render) basta y se decodifica la mitad
+DRAFT_TOLERANCE = 0.9
+# Lado máximo de la media móvil: con más la suma no cabe en uint16
+MAX_WINDOW = 16
+# Operadores de recorte (W, W*) y de estado gráfico (gs: transparencia,
+# modos de fusión): con ellos lo pintado no es la imagen tal cual
+_CLIP_OR_STATE_RE = re.compile(rb"(?<!\S)(?:W\*?|gs)(?!\S)")
+
+
+def _is_axis_aligned(matrix):
+    return (matrix.b == 0 and matrix.c == 0) or (matrix.a == 0 and matrix.d == 0)
+
+
+def _contains(outer, inner, tolerance=PLACEMENT_TOLERANCE_PT):
+    return (inner.x0 >= outer.x0 - tolerance and inner.y0 >= outer.y0 - tolerance
+            and inner.x1 <= outer.x1 + tolerance and inner.y1 <= outer.y1 + tolerance)
+
+
+def single_image_placement(page, content):
+    """
+    Si la página es un escaneo (content.kind "images") con una sola imagen
+    dibujada una sola vez, sin girar en ángulo, sin máscaras ni /Decode,
+    completa dentro de la página y sin recortes ni transparencia, devuelve
+    (entrada de page.get_images(full=True), rectángulo en coordenadas de
+    page.rect, matriz de la imagen). Si no, None y la página se rasteriza.
+    """
+    if content is None or content.kind != "images" or content.ink_rect is None:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    image = images[0]
+    xref, smask, referencer = image[0], image[1], image[9]
+    # Con máscara suave o dentro de un Form XObject (con su propio recorte y estado)
+    if smask or referencer:
+        return None
+    doc = page.parent
+    for key in ("ImageMask", "Mask", "Decode"):
+        kind, value = doc.xref_get_key(xref, key)
+        if kind != "null" and value != "false":
+            return None
+    # get_image_info sin huellas no decodifica las imágenes (get_image_rects sí);
+    # con una sola imagen en la página, su única entrada es la de xref
+    placements = page.get_image_info()
+    if len(placements) != 1:
+        return None
+    rect = fitz.Rect(placements[0]["bbox"])
+    matrix = fitz.Matrix(placements[0]["transform"])
+    if not _is_axis_aligned(matrix):
+        return None
+    # get_image_info da coordenadas de la página sin rotar
+    if page.rotation:
+        rect = rect * page.rotation_matrix
+    # Fuera de la página o recortada: lo visible no es la imagen completa
+    if rect.is_empty or not _contains(page.rect, rect) or not _contains(content.ink_rect, rect):
+        return None
+    if _CLIP_OR_STATE_RE.search(page.read_contents()):
+        return None
+    return image, rect, matrix
+
+
+def decode_image(doc, image, target_size, max_bytes):
+    """
+    Decodifica una imagen (entrada de page.get_images(full=True)) en escala
+    de grises o RGB, como arreglo NumPy (alto x ancho o alto x ancho x 3).
+
+    Los JPEG en escala de grises se abren con PIL y draft() los decodifica
+    ya reducidos (1/2, 1/4 o 1/8) mientras no queden por debajo de
+    target_size (ancho, alto en píxeles de render, con DRAFT_TOLERANCE). El
+    resto lo decodifica MuPDF a resolución nativa, como al rasterizar: en los
+    JPEG a color PIL interpola la crominancia de otra forma y los bordes del
+    texto cambian más de un punto de cobertura. Los espacios de color que no
+    son gris ni RGB se convierten a RGB.
+    Devuelve None si el resultado ocuparía más de max_bytes.
+    """
+    xref, width, height, image_filter = image[0], image[2], image[3], image[8]
+    if image_filter == "DCTDecode":
+        pil_image = Image.open(io.BytesIO(doc.extract_image(xref)["image"]))
+        if pil_image.mode == "L":
+            # draft() solo lee la cabecera; la decodificación ocurre en asarray
+            pil_image.draft(pil_image.mode, tuple(int(side * DRAFT_TOLERANCE) for side in target_size))
+            if pil_image.width * pil_image.height > max_bytes:
+                return None
+            return np.asarray(pil_image)
+        pil_image.close()
+
+    if width * height * 3 > max_bytes:
+        return None
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha or pix.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+    arr = pixmap_to_array(pix)
+    # Copia: la vista no sobrevive al Pixmap
+    return np.array(arr[:, :, 0] if pix.n == 1 else arr)
+
+
+def _channel_min(block):
+    if block.ndim == 2:
+        return block
+    mn = np.minimum(block[:, :, 0], block[:, :, 1])
+    return np.minimum(mn, block[:, :, 2], out=mn)
+
+
+def count_native(pixels, white_threshold, window=1):
+    """
+    Fracción de píxeles no blancos (canal mínimo bajo white_threshold, como
+    en utils._pixel_counts_numpy) de la imagen decodificada y, con window > 1,
+    la de su media móvil de window x window píxeles, que aproxima lo que
+    queda tras interpolarla o reducirla al dibujarla. Recorre la
+    imagen por bloques de filas. Devuelve (fracción, fracción suavizada o None).
+    """
+    h, w = pixels.shape[0], pixels.shape[1]
+    if h == 0 or w == 0:
+        return 0.0, None
+    if window > 1 and (h < window or w < window):
+        window = 1
+    rows_per_block = max(window, KERNEL_BLOCK_PIXELS // w)
+    limit = white_threshold * window * window
+    non_white = 0
+    smoothed = 0
+    for y0 in range(0, h, rows_per_block):
+        # Las últimas window - 1 filas se repiten en el bloque siguiente para la media
+        mn = _channel_min(pixels[y0:y0 + rows_per_block + window - 1])
+        non_white += int(np.count_nonzero(mn[:rows_per_block] < white_threshold))
+        if window > 1 and mn.shape[0] >= window:
+            rows = mn.shape[0] - window + 1
+            sums = np.zeros((rows, w - window + 1), dtype=np.uint16)
+            for dy in range(window):
+                for dx in range(window):
+                    sums += mn[dy:dy + rows, dx:dx + w - window + 1]
+            smoothed += int(np.count_nonzero(sums < limit))
+    if window == 1:
+        return non_white / (h * w), None
+    return non_white / (h * w), smoothed / ((h - window + 1) * (w - window + 1))
+
+
+def _resampling_window(doc, xref, matrix, mat, shape):
+    """
+    Lado de la media móvil que simula cómo dibuja MuPDF la imagen decodificada
+    (alto x ancho = shape[:2]) con su matriz y la del render: 1 si repite los
+    píxeles (ampliación mayor que NEAREST_MAGNIFICATION sin /Interpolate), 2
+    si interpola entre vecinos y más si la reduce.
+    """
+    zoom = math.hypot(mat.a, mat.b)
+    magnification = (math.hypot(matrix.a, matrix.b) * zoom / shape[1],
+                     math.hypot(matrix.c, matrix.d) * zoom / shape[0])
+    interpolate = doc.xref_get_key(xref, "Interpolate")[1] == "true"
+    if not interpolate and max(magnification) > NEAREST_MAGNIFICATION * (1 + MAGNIFICATION_TOLERANCE):
+        return 1
+    reduction = 1 / min(magnification)
+    return max(1, math.ceil(reduction * (1 - MAGNIFICATION_TOLERANCE))) + 1
+
+
+def measure_native_image(page, mat, pixel_rect, config, content, timings=None):
+    """
+    Cobertura de una página escaneada contada sobre su imagen embebida
+    (single_image_placement), sin rasterizar la página. Devuelve el
+    diccionario de combine_pixel_stats sin tipo de línea (como el conteo en
+    gris) o None si la página no es un escaneo simple o no se puede cotizar así.
+
+    El conteo nativo no coincide píxel a píxel con el render: al ampliar
+    mucho la imagen MuPDF repite sus píxeles, pero con poca ampliación o al
+    reducirla mezcla vecinos, y el papel con ruido se oscurece o aclara y
+    los bordes del texto se ensanchan (_resampling_window). La cobertura se
+    acota entre el conteo nativo y el de la media móvil del tamaño de un
+    píxel de render, más config['native_margin'] puntos. Si ese intervalo
+    cruza un límite de precio o llega al rango de línea (0-9%), la página se
+    rasteriza; si no, se usa el centro del intervalo, que puede diferir en
+    un punto de la cobertura del render pero no en el precio.
+
+    Con timings, la decodificación se suma a la etapa "convert" y el conteo a "count".
+    """
+    if not _HAS_NUMPY:
+        return None
+    placement = single_image_placement(page, content)
+    if placement is None:
+        return None
+    image, rect, matrix = placement
+    image_rect = (rect * mat).irect & pixel_rect
+    if image_rect.is_empty:
+        return None
+
+    started = perf_counter() if timings is not None else None
+    pixels = decode_image(page.parent, image, (image_rect.width, image_rect.height),
+                          config["band_budget_bytes"])
+    if timings is not None:
+        add_time(timings, "convert", started)
+        started = perf_counter()
+    if pixels is None:
+        return None
+    window = _resampling_window(page.parent, image[0], matrix, mat, pixels.shape)
+    if window > MAX_WINDOW:
+        return None
+
+    white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    point, smoothed = count_native(pixels, white_threshold, window)
+    del pixels
+    if timings is not None:
+        add_time(timings, "count", started)
+    if smoothed is None:
+        smoothed = point
+
+    image_pixels = image_rect.width * image_rect.height
+    total_pixels = pixel_rect.width * pixel_rect.height
+    scale = image_pixels / total_pixels * 100
+    margin = config["native_margin"]
+    low = min(point, smoothed) * scale - margin
+    high = max(point, smoothed) * scale + margin
+    if not settles_price(low, high):
+        return None
+
+    non_white_count = min(total_pixels, int(round((point + smoothed) / 2 * image_pixels)))
+    return {
+        'total_pixels': total_pixels,
+        'white_count': total_pixels - non_white_count,
+        'non_white_count': non_white_count,
+        'black_count': 0,
+        'non_white_percentage': non_white_count / total_pixels * 100,
+        'line_type': None
+    }
@@ -0,0 +1,83 @@
+# page_fingerprint.py - huella de contenido de páginas PDF para detectar páginas repetidas
+import hashlib
+import re
+
+# Referencia indirecta "12 0 R"
+_REFERENCE = re.compile(r"(\d+)\s+(\d+)\s+R\b")
+# Referencias hacia la página o el árbol de páginas: no forman parte del dibujo
+_BACK_REFERENCE = re.compile(r"/(?:Parent|P|Pg)\s+\d+\s+\d+\s+R\b")
+# Claves de la página que se heredan del árbol de páginas
+_INHERITED_KEYS = ("Resources", "MediaBox", "CropBox", "Rotate")
+
+
+def _inherited_value(doc, xref, key):
+    """Valor de key en la página o, si falta, en sus nodos /Parent."""
+    visited = set()
+    while xref and xref not in visited:
+        visited.add(xref)
+        kind, value = doc.xref_get_key(xref, key)
+        if kind != "null":
+            return kind, value
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            break
+        xref = int(parent.split()[0])
+    return "null", "null"
+
+
+class PageFingerprinter:
+    """
+    Calcula huellas SHA-256 de páginas de un documento.
+
+    La huella cubre los flujos de contenido, los recursos resueltos
+    recursivamente (fuentes, imágenes, formularios) y la geometría de la
+    página, no los números de objeto: dos páginas que dibujan lo mismo
+    tienen la misma huella aunque estén en documentos distintos. Las huellas
+    de cada objeto se memorizan, así los recursos compartidos se leen una vez.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self._memo = {}
+        self._active = set()
+
+    def _resolve(self, source):
+        source = _BACK_REFERENCE.sub("", source)
+        return _REFERENCE.sub(lambda m: self._object_digest(int(m.group(1))), source)
+
+    def _object_digest(self, xref):
+        if xref in self._memo:
+            return self._memo[xref]
+        if xref in self._active:
+            # Referencia circular: se marca sin recorrerla de nuevo
+            return "<ciclo>"
+        self._active.add(xref)
+        try:
+            digest = hashlib.sha256()
+            digest.update(self._resolve(self.doc.xref_object(xref, compressed=True)).encode())
+            if self.doc.xref_is_stream(xref):
+                digest.update(self.doc.xref_stream_raw(xref) or b"")
+            value = digest.hexdigest()
+        finally:
+            self._active.discard(xref)
+        self._memo[xref] = value
+        return value
+
+    def fingerprint(self, page):
+        """
+        Huella de la página, o None si no se puede comparar con seguridad
+        (páginas con anotaciones o formularios, que se dibujan aparte).
+        """
+        if page.first_annot is not None or page.first_widget is not None:
+            return None
+
+        digest = hashlib.sha256()
+        for key in _INHERITED_KEYS:
+            kind, value = _inherited_value(self.doc, page.xref, key)
+            digest.update(f"/{key} {kind} ".encode())
+            digest.update(self._resolve(value).encode())
+        kind, value = self.doc.xref_get_key(page.xref, "Group")
+        digest.update(f"/Group {kind} {self._resolve(value)}".encode())
+        for xref in page.get_contents():
+            digest.update(self._object_digest(xref).encode())
+        return digest.hexdigest()
@@ -1,19 +1,24 @@
-# pdf_analyzer.py - archivo actualizado para usar compute_image_pixel_stats (NumPy acelerado)
+# pdf_analyzer.py - pestaña del analizador; el análisis por página vive en analysis_engine.py
 import os
-import fitz  # PyMuPDF
-from PIL import Image
+import threading
+import time
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
     QFileDialog, QGroupBox, QTextEdit, QComboBox,
-    QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView,
-    QSizePolicy, QProgressDialog, QApplication
+    QMessageBox, QTableView, QAbstractItemView, QHeaderView,
+    QSizePolicy, QProgressDialog, QSpinBox, QLineEdit, QCheckBox
 )
-from PySide6.QtCore import Qt, QTimer, QUrl
+from PySide6.QtCore import Qt, QUrl, QObject, QThread, Signal
 from PySide6.QtGui import QFont, QDragEnterEvent, QDropEvent
-from utils import (
-    cm_to_pixels, pixels_to_cm, DEFAULT_DPI, calculate_print_cost,
-    PRINT_COSTS, LINE_COSTS, detect_line_type, compute_image_pixel_stats
-)
+from utils import DEFAULT_DPI, PRINT_COSTS
+from analysis_engine import analyze_documents, determine_print_type, PageError, DEFAULT_WORKERS
+from analysis_cache import AnalysisCache
+from document_registry import DocumentRegistry
+from folder_discovery import iter_pdf_files, parse_filter_text, relative_name, display_names, PathFeed
+from metrics import PipelineMetrics
+from result_store import ResultStore
+from table_models import ResultsTableModel, QuotesTableModel
+from quote_report import write_quotes_report
 from styles import get_stylesheet, get_theme_colors
 from datetime import datetime
 
@@ -80,18 +85,148 @@ class FolderDropButton(QPushButton):
             event.ignore()
 
 
+class AnalysisWorker(QObject):
+    """Ejecuta el motor de análisis en un QThread y entrega resultados por lotes."""
+    results_ready = Signal(list)
+    progress_changed = Signal(int, str)
+    finished = Signal(bool)
+
+    # Frecuencia máxima de señales hacia la interfaz (10 Hz)
+    EMIT_INTERVAL_S = 0.1
+
+    def __init__(self, paths, canvas, workers, total_pages, page_counts, cache=None, metrics=None, config=None,
+                 names=None):
+        super().__init__()
+        self.paths = paths
+        # {ruta: nombre} de los documentos (pdf_name de los resultados); page_counts usa esos nombres
+        self.names = names if names is not None else {}
+        self.canvas = canvas
+        self.workers = workers
+        self.cache = cache
+        self.metrics = metrics
+        self.config = config
+        self.total_pages = total_pages
+        self.page_counts = page_counts
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        batch = []
+        processed_pages = 0
+        label = ""
+        last_emit = time.monotonic()
+
+        outcomes = analyze_documents(
+            self.paths,
+            canvas=self.canvas,
+            workers=self.workers,
+            cancel_event=self.cancel_event,
+            config=self.config,
+            cache=self.cache,
+            metrics=self.metrics,
+            names=self.names
+        )
+        try:
+            for outcome in outcomes:
+                processed_pages += 1
+                batch.append(outcome)
+                if outcome.page_num is not None:
+                    page_count = self.page_counts.get(outcome.pdf_name, outcome.page_num)
+                    label = f"Procesando: {outcome.pdf_name} (página {outcome.page_num}/{page_count})"
+
+                now = time.monotonic()
+                if now - last_emit >= self.EMIT_INTERVAL_S:
+                    self.results_ready.emit(batch)
+                    self.progress_changed.emit(min(int((processed_pages / self.total_pages) * 100), 100), label)
+                    batch = []
+                    last_emit = now
+        except Exception as e:
+            batch.append(PageError("", None, str(e)))
+        finally:
+            outcomes.close()
+
+        if batch:
+            self.results_ready.emit(batch)
+        self.finished.emit(self.cancel_event.is_set())
+
+
+class FolderDiscoveryWorker(QObject):
+    """Busca PDFs en una carpeta y sus subcarpetas en un QThread y entrega sus datos por lotes."""
+    documents_found = Signal(list)
+    document_failed = Signal(str, str)
+    finished = Signal(bool)
+
+    EMIT_INTERVAL_S = 0.1
+
+    def __init__(self, folder_path, registry, include, exclude):
+        super().__init__()
+        self.folder_path = folder_path
+        self.registry = registry
+        self.include = include
+        self.exclude = exclude
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        batch = []
+        first_emitted = False
+        last_emit = time.monotonic()
+        for path in iter_pdf_files(self.folder_path, self.include, self.exclude, self.cancel_event):
+            # Ruta relativa a la carpeta: dos "plano.pdf" en subcarpetas distintas no se confunden
+            name = relative_name(path, self.folder_path)
+            try:
+                info = self.registry.info(path).to_dict()
+                info['name'] = name
+                batch.append(info)
+            except Exception as e:
+                self.document_failed.emit(name, str(e))
+            now = time.monotonic()
+            # El primer archivo se entrega de inmediato para poder empezar a analizar
+            if batch and (now - last_emit >= self.EMIT_INTERVAL_S or not first_emitted):
+                self.documents_found.emit(batch)
+                batch = []
+                first_emitted = True
+                last_emit = now
+        if batch:
+            self.documents_found.emit(batch)
+        self.finished.emit(self.cancel_event.is_set())
+
+
 class PDFAnalyzerTab(QWidget):
     def __init__(self, initial_theme="light"):
         super().__init__()
         self.current_theme = initial_theme
         self.pdf_documents = []
-        self.analysis_results = []
+        # Datos de los PDFs cargados; los documentos completos se abren solo al necesitarlos
+        self.document_registry = DocumentRegistry()
+        # Búsqueda de PDFs en carpeta en curso; path_feed recibe las rutas a medida que aparecen
+        self.discovery_thread = None
+        self.discovery_worker = None
+        self.path_feed = None
+        # Resultados en columnas compactas; analysis_results es la vista con el lienzo elegido
+        self.result_store = ResultStore()
+        self.analysis_results = self.result_store.view()
         self.selected_canvas = None
         self.quotes_history = []
+        self.analysis_thread = None
+        self.analysis_worker = None
+        self.analysis_cache = None
+        self._cache_counts_at_start = (0, 0)
+        # Tiempos por etapa del último análisis con "Medir etapas" activado
+        self.analysis_metrics = None
 
         self.init_ui()
         self.apply_stylesheet(self.current_theme)
 
+        try:
+            self.analysis_cache = AnalysisCache()
+        except Exception as e:
+            self.log_message(f"⚠️ Caché de análisis no disponible: {str(e)}")
+
     def apply_theme(self, theme):
         """Aplica el tema al PDFAnalyzerTab."""
         self.current_theme = theme
@@ -120,6 +255,15 @@ class PDFAnalyzerTab(QWidget):
         self.load_folder_btn.clicked.connect(self.load_folder_dialog)
         buttons_row1.addWidget(self.load_folder_btn)
 
+        self.folder_filter = QLineEdit()
+        self.folder_filter.setPlaceholderText("Filtro de carpeta: *.pdf; !*borrador*")
+        self.folder_filter.setToolTip(
+            "Patrones de archivos a incluir al cargar una carpeta (se recorren las subcarpetas).\n"
+            "Separe los patrones con \";\"; los que empiezan con \"!\" excluyen archivos o carpetas.\n"
+            "Un patrón con \"/\" se compara con la ruta relativa, p. ej. !*/anulados/*"
+        )
+        buttons_row1.addWidget(self.folder_filter)
+
         controls_layout.addLayout(buttons_row1)
 
         # Segunda fila de controles
@@ -142,6 +286,41 @@ class PDFAnalyzerTab(QWidget):
 
         controls_row2.addLayout(canvas_container)
 
+        workers_container = QHBoxLayout()
+        workers_label = QLabel("Procesos:")
+        workers_container.addWidget(workers_label)
+
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(DEFAULT_WORKERS, 1))
+        self.workers_spin.setValue(DEFAULT_WORKERS)
+        self.workers_spin.setToolTip("Número de procesos usados para analizar páginas en paralelo")
+        workers_container.addWidget(self.workers_spin)
+
+        controls_row2.addLayout(workers_container)
+
+        metrics_container = QHBoxLayout()
+        self.estimate_check = QCheckBox("🎯 Estimación rápida")
+        self.estimate_check.setToolTip(
+            "Estima la cobertura por muestreo con un intervalo de confianza.\n"
+            "Solo se cuenta la página completa si el intervalo cruza un límite de precio"
+        )
+        metrics_container.addWidget(self.estimate_check)
+
+        self.metrics_check = QCheckBox("⏱️ Medir etapas")
+        self.metrics_check.setToolTip(
+            "Mide el tiempo de cada etapa del análisis (apertura, caché, clasificación,\n"
+            "rasterizado, conversión, conteo, precio e interfaz) y lo muestra al terminar"
+        )
+        metrics_container.addWidget(self.metrics_check)
+
+        self.export_metrics_btn = QPushButton("📊 Exportar métricas")
+        self.export_metrics_btn.setToolTip("Guarda los tiempos del último análisis en JSON o en formato Prometheus")
+        self.export_metrics_btn.clicked.connect(self.export_metrics)
+        self.export_metrics_btn.setEnabled(False)
+        metrics_container.addWidget(self.export_metrics_btn)
+
+        controls_row2.addLayout(metrics_container)
+
         actions_container = QHBoxLayout()
         self.analyze_btn = QPushButton("🔍 Analizar PDF(s)")
         self.analyze_btn.setObjectName("analyze_btn")
@@ -191,23 +370,31 @@ class PDFAnalyzerTab(QWidget):
         self.results_group = QGroupBox("Resultado del Análisis")
         results_layout = QVBoxLayout()
 
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(7)
-        self.results_table.setHorizontalHeaderLabels([
-            "PDF", "Página", "Dimensiones",
-            "% Área Sólido", "Tipo Pliego", "Costo", "Lienzo"
-        ])
-
+        self.results_filter = QLineEdit()
+        self.results_filter.setPlaceholderText("🔎 Filtrar por PDF o tipo de pliego (o costo: >10000)")
+        self.results_filter.setClearButtonEnabled(True)
+        self.results_filter.textChanged.connect(self.filter_results)
+        results_layout.addWidget(self.results_filter)
+
+        # Tabla virtual: solo se dibujan las filas visibles
+        self.results_model = ResultsTableModel(self.analysis_results, self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        # Sin orden inicial: se muestran en orden de llegada hasta que se pulse un encabezado
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.results_table.setSortingEnabled(True)
+        self.results_table.verticalHeader().setDefaultSectionSize(24)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+
+        # Anchos fijos (ajustables): ResizeToContents recorrería todas las filas en cada lote
         header = self.results_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
         header.setSectionResizeMode(0, QHeaderView.Stretch)
-        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
-
-        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for column, width in enumerate((0, 60, 130, 100, 300, 90, 110, 150)):
+            if width:
+                header.resizeSection(column, width)
+
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.results_table.setAlternatingRowColors(True)
 
         results_layout.addWidget(self.results_table)
@@ -242,14 +429,19 @@ class PDFAnalyzerTab(QWidget):
         console_right_layout.addWidget(history_label)
 
         # Tabla de historial
-        self.quotes_table = QTableWidget()
-        self.quotes_table.setColumnCount(4)
-        self.quotes_table.setHorizontalHeaderLabels(["PDF", "Páginas", "Tipo", "Costo"])
+        self.quotes_model = QuotesTableModel(self.quotes_history, self)
+        self.quotes_table = QTableView()
+        self.quotes_table.setModel(self.quotes_model)
+        # Sin orden inicial: se muestran en orden de llegada hasta que se pulse un encabezado
+        self.quotes_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.quotes_table.setSortingEnabled(True)
+        self.quotes_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.quotes_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
         self.quotes_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.quotes_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.quotes_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.quotes_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        self.quotes_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for column, width in enumerate((0, 70, 300, 100)):
+            if width:
+                self.quotes_table.horizontalHeader().resizeSection(column, width)
+        self.quotes_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.quotes_table.setAlternatingRowColors(True)
         self.quotes_table.setMaximumHeight(200)
         console_right_layout.addWidget(self.quotes_table)
@@ -323,7 +515,7 @@ class PDFAnalyzerTab(QWidget):
             padding: 2px;
         }}
         
-        QTextEdit, QTableWidget {{
+        QTextEdit, QTableView {{
             background-color: {theme_colors['color_panel']};
             border: 1px solid {theme_colors['color_border']};
             border-radius: 6px;
@@ -342,7 +534,7 @@ class PDFAnalyzerTab(QWidget):
             font-size: 13px;
         }}
         
-        QTableWidget::item {{
+        QTableView::item {{
             padding: 6px;
         }}
         """
@@ -466,27 +658,27 @@ class PDFAnalyzerTab(QWidget):
         """
 
         table_style = """
-        QTableWidget {
+        QTableView {
             gridline-color: #e0e0e0;
         }
-        QTableWidget::item {
+        QTableView::item {
             border-bottom: 1px solid #e0e0e0;
         }
         """
 
         if theme == "light":
             table_style += """
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #f5f5f5;
             }
             """
         else:
             table_style += """
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #2d2d2d;
                 gridline-color: #3d3d3d;
             }
-            QTableWidget::item {
+            QTableView::item {
                 border-bottom: 1px solid #3d3d3d;
             }
             """
@@ -502,8 +694,8 @@ class PDFAnalyzerTab(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            self.quotes_table.setRowCount(0)
             self.quotes_history = []
+            self.quotes_model.set_records(self.quotes_history)
             self.log_message("🔄 Historial de cotizaciones refrescado")
 
     def add_current_to_quotes(self):
@@ -512,41 +704,29 @@ class PDFAnalyzerTab(QWidget):
             self.log_message("⚠️ No hay resultados para agregar al historial")
             return
 
-        pdf_names = ", ".join(set(result['pdf_name']
-                            for result in self.analysis_results))
+        pdf_names = ", ".join(self.analysis_results.pdf_names())
         total_pages = len(self.analysis_results)
         print_type = self.analysis_results[0]['print_type']
-        total_cost = sum(result['cost'] for result in self.analysis_results)
-
-        row_position = self.quotes_table.rowCount()
-        self.quotes_table.insertRow(row_position)
-        self.quotes_table.setItem(row_position, 0, QTableWidgetItem(pdf_names))
-        self.quotes_table.setItem(
-            row_position, 1, QTableWidgetItem(str(total_pages)))
-        self.quotes_table.setItem(row_position, 2, QTableWidgetItem(print_type))
-        cost_item = QTableWidgetItem(f"${total_cost:,.0f}")
-        cost_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        self.quotes_table.setItem(row_position, 3, cost_item)
-
-        self.quotes_history.append({
+        total_cost = self.analysis_results.total_cost()
+
+        self.quotes_model.append_records([{
             'pdf_names': pdf_names,
             'total_pages': total_pages,
             'print_type': print_type,
             'total_cost': total_cost,
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'detailed_results': self.analysis_results.copy()  # ✅ Aquí se agregan los detalles
-        })
+            # Instantánea que comparte el almacén de resultados, sin copiar las filas
+            'detailed_results': self.analysis_results.snapshot()
+        }])
 
         self.log_message("✅ Cotización agregada al historial")
 
 
     def remove_selected_quote(self):
         """Elimina la cotización seleccionada del historial"""
-        selected_row = self.quotes_table.currentRow()
+        selected_row = self.quotes_table.currentIndex().row()
         if selected_row >= 0:
-            self.quotes_table.removeRow(selected_row)
-            if selected_row < len(self.quotes_history):
-                self.quotes_history.pop(selected_row)
+            self.quotes_model.remove_source_row(self.quotes_model.source_row(selected_row))
             self.log_message("🗑️ Cotización eliminada del historial")
         else:
             self.log_message("⚠️ Seleccione una cotización para eliminar")
@@ -558,6 +738,14 @@ class PDFAnalyzerTab(QWidget):
 
         if self.pdf_documents:
             self.update_pdf_info()
+        if self.analysis_thread is None and self.analysis_results:
+            self.reprice_results()
+
+    def reprice_results(self):
+        """Recotiza los resultados con el lienzo seleccionado a partir de la matriz de precios, sin rasterizar."""
+        self.analysis_results = self.result_store.view(self.selected_canvas)
+        self.results_model.set_records(self.analysis_results)
+        self.update_summary(self.analysis_results.total_cost())
 
     def load_pdfs(self, file_paths=None):
         if file_paths is None:
@@ -571,21 +759,20 @@ class PDFAnalyzerTab(QWidget):
                 return
 
         if file_paths:
+            self.stop_folder_discovery()
             self.pdf_documents = []
             loaded_count = 0
             for file_path in file_paths:
                 try:
-                    doc = fitz.open(file_path)
-                    self.pdf_documents.append({
-                        'path': file_path,
-                        'name': os.path.basename(file_path),
-                        'document': doc,
-                        'page_count': doc.page_count
-                    })
+                    self.pdf_documents.append(self.document_registry.info(file_path).to_dict())
                     loaded_count += 1
                 except Exception as e:
                     self.log_message(f"Error al cargar {os.path.basename(file_path)}: {str(e)}")
 
+            names = display_names([pdf['path'] for pdf in self.pdf_documents])
+            for pdf in self.pdf_documents:
+                pdf['name'] = names[pdf['path']]
+
             if self.pdf_documents:
                 self.update_pdf_info()
                 self.analyze_btn.setEnabled(True)
@@ -600,20 +787,75 @@ class PDFAnalyzerTab(QWidget):
             self._load_pdfs_from_folder(folder_path)
 
     def _load_pdfs_from_folder(self, folder_path):
+        """
+        Busca PDFs en la carpeta y sus subcarpetas en segundo plano. Los
+        archivos se agregan a la lista a medida que aparecen y el análisis
+        puede empezar antes de que termine la búsqueda.
+        """
+        self.stop_folder_discovery()
         self.pdf_documents = []
-        found_pdfs = []
-        for file_name in os.listdir(folder_path):
-            if file_name.lower().endswith('.pdf'):
-                file_path = os.path.join(folder_path, file_name)
-                found_pdfs.append(file_path)
-
-        if found_pdfs:
-            self.load_pdfs(found_pdfs)
-            self.log_message(f"{len(found_pdfs)} PDF(s) cargado(s) desde la carpeta '{os.path.basename(folder_path)}'.")
+        self.update_pdf_info()
+        self.analyze_btn.setEnabled(False)
+
+        include, exclude = parse_filter_text(self.folder_filter.text())
+        self.path_feed = PathFeed()
+        self.discovery_thread = QThread(self)
+        self.discovery_worker = FolderDiscoveryWorker(folder_path, self.document_registry, include, exclude)
+        self.discovery_worker.moveToThread(self.discovery_thread)
+
+        # Las señales ya encoladas de una búsqueda anterior se descartan comparando el worker
+        worker = self.discovery_worker
+        self.discovery_thread.started.connect(worker.run)
+        worker.documents_found.connect(lambda documents: self.on_documents_found(worker, documents))
+        worker.document_failed.connect(
+            lambda name, message: self.log_message(f"Error al cargar {name}: {message}"))
+        worker.finished.connect(lambda canceled: self.on_discovery_finished(worker, folder_path, canceled))
+        worker.finished.connect(self.discovery_thread.quit)
+
+        self.log_message(f"🔎 Buscando PDFs en '{os.path.basename(folder_path)}' y sus subcarpetas...")
+        self.discovery_thread.start()
+
+    def stop_folder_discovery(self):
+        """Cancela la búsqueda de carpeta en curso y espera a que termine su hilo."""
+        if self.discovery_worker is not None:
+            self.discovery_worker.cancel()
+            self.discovery_thread.quit()
+            self.discovery_thread.wait()
+            self.discovery_thread = None
+            self.discovery_worker = None
+        if self.path_feed is not None:
+            self.path_feed.close()
+            self.path_feed = None
+
+    def on_documents_found(self, worker, documents):
+        if worker is not self.discovery_worker:
+            return
+        self.pdf_documents.extend(documents)
+        if self.analysis_worker is not None:
+            # El análisis ya empezó con esta búsqueda: crecen el total, los nombres y los
+            # conteos de páginas, antes de que el análisis reciba las rutas
+            self.analysis_worker.total_pages += sum(pdf['page_count'] for pdf in documents)
+            self.analysis_worker.names.update({pdf['path']: pdf['name'] for pdf in documents})
+            self.analysis_worker.page_counts.update({pdf['name']: pdf['page_count'] for pdf in documents})
         else:
-            self.log_message(f"No se encontraron PDFs en la carpeta '{os.path.basename(folder_path)}'.")
-            if not self.pdf_documents:
-                self.analyze_btn.setEnabled(False)
+            self.analyze_btn.setEnabled(True)
+        self.path_feed.extend(pdf['path'] for pdf in documents)
+        self.update_pdf_info()
+
+    def on_discovery_finished(self, worker, folder_path, canceled):
+        if canceled or worker is not self.discovery_worker:
+            return
+        self.discovery_thread = None
+        self.discovery_worker = None
+        self.path_feed.close()
+        self.path_feed = None
+
+        folder_name = os.path.basename(folder_path)
+        if self.pdf_documents:
+            self.log_message(f"{len(self.pdf_documents)} PDF(s) cargado(s) desde la carpeta '{folder_name}'.")
+        else:
+            self.log_message(f"No se encontraron PDFs en la carpeta '{folder_name}'.")
+            self.analyze_btn.setEnabled(False)
 
 
     def update_pdf_info(self):
@@ -660,11 +902,8 @@ class PDFAnalyzerTab(QWidget):
 
             # Obtener dimensiones del primer PDF
             first_pdf = self.pdf_documents[0]
-            page = first_pdf['document'].load_page(0)
-            width_pt = page.rect.width
-            height_pt = page.rect.height
-            width_cm = round(width_pt * 2.54 / 72, 2)
-            height_cm = round(height_pt * 2.54 / 72, 2)
+            width_cm = round((first_pdf['width_pt'] or 0) * 2.54 / 72, 2)
+            height_cm = round((first_pdf['height_pt'] or 0) * 2.54 / 72, 2)
 
             # Mostrar dimensiones según si hay lienzo seleccionado
             if self.selected_canvas:
@@ -679,7 +918,7 @@ class PDFAnalyzerTab(QWidget):
                 f"Dimensiones originales:\n"
                 f"Ancho: {width_cm} cm\n"
                 f"Alto: {height_cm} cm\n"
-                f"Resolución: {DEFAULT_DPI} DPI"
+                f"Resolución: hasta {DEFAULT_DPI} DPI (menor en escaneos de formato grande)"
             )
 
         else:
@@ -696,216 +935,153 @@ class PDFAnalyzerTab(QWidget):
         if not self.pdf_documents:
             self.log_message("No hay PDFs cargados para analizar.")
             return
+        if self.analysis_thread is not None:
+            return
 
         self.progress = QProgressDialog("Analizando archivos PDF...", "Cancelar", 0, 100, self)
         self.progress.setWindowTitle("Procesando")
-        self.progress.setWindowModality(Qt.WindowModal)
-        self.progress.setAutoClose(True)
-        self.progress.setAutoReset(True)
+        # No modal: la tabla de resultados sigue siendo navegable mientras se llena
+        self.progress.setWindowModality(Qt.NonModal)
+        self.progress.setAutoClose(False)
+        self.progress.setAutoReset(False)
         self.progress.setMinimumDuration(0)
 
         self.set_ui_enabled(False)
 
-        self.progress.show()
-        QApplication.processEvents()
-
-        QTimer.singleShot(100, self.start_analysis)
-
-    def start_analysis(self):
-        try:
-            self.analysis_results = []
-            self.results_table.setRowCount(0)
-
-            total_pages = sum(pdf['page_count'] for pdf in self.pdf_documents)
-            processed_pages = 0
-
-            for pdf_idx, pdf in enumerate(self.pdf_documents):
-                doc = pdf['document']
-                for page_num in range(doc.page_count):
-                    if self.progress.wasCanceled():
-                        break
-
-                    processed_pages += 1
-                    progress = int((processed_pages / total_pages) * 100)
-                    self.progress.setValue(progress)
-                    self.progress.setLabelText(f"Procesando: {pdf['name']} (página {page_num + 1}/{doc.page_count})")
-
-                    QApplication.processEvents()
-
-                    try:
-                        page = doc.load_page(page_num)
-
-                        mat = fitz.Matrix(DEFAULT_DPI / 72.0, DEFAULT_DPI / 72.0)
-                        pix = page.get_pixmap(matrix=mat)
-
-                        if pix.alpha:
-                            pil_image = Image.frombytes("RGBA", [pix.width, pix.height], pix.samples)
-                        else:
-                            pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples).convert("RGBA")
-
-                        width_px = pil_image.width
-                        height_px = pil_image.height
-                        width_cm_original = pixels_to_cm(max(width_px, height_px))
-                        height_cm_original = pixels_to_cm(min(width_px, height_px))
-
-                        if self.selected_canvas:
-                            canvas_dims = PRINT_COSTS[self.selected_canvas]["dimensions_cm"]
-                            width_cm = max(canvas_dims)
-                            height_cm = min(canvas_dims)
-                            canvas_name = PRINT_COSTS[self.selected_canvas]["display_name"]
-                        else:
-                            width_cm = width_cm_original
-                            height_cm = height_cm_original
-                            canvas_name = "Original"
-
-                        # --- OPTIMIZACIÓN: uso de compute_image_pixel_stats (NumPy) ---
-                        try:
-                            stats = compute_image_pixel_stats(pil_image)
-                            non_white_percentage = int(round(stats.get('non_white_percentage', 0)))
-                        except Exception as e:
-                            # Fallback al método antiguo si algo falla
-                            gray_image = pil_image.convert("L")
-                            histogram = gray_image.histogram()
-                            non_white_pixels_count = sum(histogram[:254])
-                            total_pixels = width_px * height_px
-                            non_white_percentage = round((non_white_pixels_count / total_pixels) * 100) if total_pixels > 0 else 0
-
-                        # determinar print_type_key igual que antes
-                        if self.selected_canvas:
-                            print_type_key = self.selected_canvas
-                        else:
-                            print_type_key = self.determine_print_type(width_cm_original, height_cm_original)
-
-                        # --- LÓGICA: Si está en 0% - 9% siempre aplicar LINE_COSTS/detect_line_type ---
-                        if 0 <= non_white_percentage <= 9 and print_type_key in LINE_COSTS:
-                            try:
-                                line_type = detect_line_type(pil_image)
-                            except Exception as e:
-                                # En caso de error, asumimos color para no bajar precio inesperadamente
-                                self.log_message(f"Warning detect_line_type failed: {e}")
-                                line_type = "color"
-
-                            cost = LINE_COSTS[print_type_key].get(line_type, 0)
-                            tipo_texto = f"{PRINT_COSTS.get(print_type_key, {}).get('display_name', print_type_key)} línea {line_type}"
-
-                            # Aplicar redondeos según tipo para mantener consistencia
-                            if print_type_key == "cuarto_pliego":
-                                cost = round(cost / 500) * 500
-                            elif print_type_key in ["pliego", "extra_90", "extra_100", "large_format"]:
-                                cost = round(cost / 1000) * 1000
-
-                            result = {
-                                'pdf_name': pdf['name'],
-                                'page_num': page_num + 1,
-                                'dimensions': f"{width_cm:.2f} x {height_cm:.2f} cm",
-                                'non_white_percentage': non_white_percentage,
-                                'print_type': tipo_texto,
-                                'cost': cost,
-                                'canvas': canvas_name,
-                                'original_dimensions': f"{width_cm_original:.2f} x {height_cm_original:.2f} cm"
-                            }
-                            self.analysis_results.append(result)
-                            self.add_result_row(result)
-                            continue
-                        # --- FIN LÓGICA LÍNEA ---
-
-                        # Si no es caso "línea", usar la lógica normal
-                        cost = calculate_print_cost(print_type_key, non_white_percentage, width_cm)
-
-                        result = {
-                            'pdf_name': pdf['name'],
-                            'page_num': page_num + 1,
-                            'dimensions': f"{width_cm:.2f} x {height_cm:.2f} cm",
-                            'non_white_percentage': non_white_percentage,
-                            'print_type': PRINT_COSTS[print_type_key]['display_name'],
-                            'cost': cost,
-                            'canvas': canvas_name,
-                            'original_dimensions': f"{width_cm_original:.2f} x {height_cm_original:.2f} cm"
-                        }
-                        self.analysis_results.append(result)
-                        self.add_result_row(result)
-
-                    except Exception as e:
-                        self.log_message(f"Error al analizar página {page_num+1} de {pdf['name']}: {str(e)}")
-
-                if self.progress.wasCanceled():
-                    break
-
-            if not self.progress.wasCanceled():
-                self.progress.setValue(100)
-                QApplication.processEvents()
-
-                total_cost = sum(result['cost'] for result in self.analysis_results)
-                self.update_summary(total_cost)
-
-                self.export_btn.setEnabled(True)
-                self.log_message("✅ Análisis completado.")
-            else:
-                self.log_message("⚠️ Análisis cancelado por el usuario")
-
-        finally:
-            self.set_ui_enabled(True)
-            self.progress.close()
-
-    def add_result_row(self, result):
-        row_position = self.results_table.rowCount()
-        self.results_table.insertRow(row_position)
-
-        self.results_table.setItem(row_position, 0, QTableWidgetItem(result['pdf_name']))
-        self.results_table.setItem(row_position, 1, QTableWidgetItem(str(result['page_num'])))
-        self.results_table.setItem(row_position, 2, QTableWidgetItem(result['dimensions']))
-        self.results_table.setItem(row_position, 3, QTableWidgetItem(f"{result['non_white_percentage']}%"))
-        self.results_table.setItem(row_position, 4, QTableWidgetItem(result['print_type']))
-
-        cost_item = QTableWidgetItem(f"${result['cost']:,.0f}")
-        cost_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        self.results_table.setItem(row_position, 5, cost_item)
+        self.result_store = ResultStore(canvas=self.selected_canvas, dpi=DEFAULT_DPI)
+        self.analysis_results = self.result_store.view(self.selected_canvas)
+        self.results_model.set_records(self.analysis_results)
 
-        self.results_table.setItem(row_position, 6, QTableWidgetItem(result['canvas']))
+        first_pdf = self.pdf_documents[0]
+        self.progress.setLabelText(f"Procesando: {first_pdf['name']} (página 1/{first_pdf['page_count']})")
+        self.progress.show()
 
+        if self.path_feed is not None:
+            # La búsqueda de carpeta sigue: el análisis toma las rutas a medida que aparecen
+            paths = self.path_feed
+        else:
+            paths = [pdf['path'] for pdf in self.pdf_documents]
+
+        self.analysis_metrics = PipelineMetrics() if self.metrics_check.isChecked() else None
+        self.export_metrics_btn.setEnabled(False)
+
+        self.analysis_thread = QThread(self)
+        self.analysis_worker = AnalysisWorker(
+            paths,
+            self.selected_canvas,
+            self.workers_spin.value(),
+            max(sum(pdf['page_count'] for pdf in self.pdf_documents), 1),
+            {pdf['name']: pdf['page_count'] for pdf in self.pdf_documents},
+            cache=self.analysis_cache,
+            metrics=self.analysis_metrics,
+            config={"coverage_estimate": True} if self.estimate_check.isChecked() else None,
+            names={pdf['path']: pdf['name'] for pdf in self.pdf_documents}
+        )
+        if self.path_feed is not None:
+            self.path_feed.cancel_event = self.analysis_worker.cancel_event
+        if self.analysis_cache is not None:
+            self._cache_counts_at_start = (self.analysis_cache.hits, self.analysis_cache.misses)
+        self.analysis_worker.moveToThread(self.analysis_thread)
+
+        self.analysis_thread.started.connect(self.analysis_worker.run)
+        self.analysis_worker.results_ready.connect(self.on_results_ready)
+        self.analysis_worker.progress_changed.connect(self.on_analysis_progress)
+        self.analysis_worker.finished.connect(self.on_analysis_finished)
+        self.analysis_worker.finished.connect(self.analysis_thread.quit)
+        self.analysis_thread.finished.connect(self.analysis_worker.deleteLater)
+        self.analysis_thread.finished.connect(self.analysis_thread.deleteLater)
+        # Conexión al propio tab: el hilo del worker está ocupado y no procesaría una señal encolada
+        self.progress.canceled.connect(self.cancel_analysis)
+
+        self.analysis_thread.start()
+
+    def cancel_analysis(self):
+        if self.analysis_worker is not None:
+            self.analysis_worker.cancel()
+
+    def on_results_ready(self, outcomes):
+        started = time.perf_counter()
+        batch = []
+        for outcome in outcomes:
+            if isinstance(outcome, PageError):
+                if outcome.page_num is None:
+                    self.log_message(f"Error al abrir {outcome.pdf_name}: {outcome.message}")
+                else:
+                    self.log_message(f"Error al analizar página {outcome.page_num} de {outcome.pdf_name}: {outcome.message}")
+                continue
+
+            if outcome.warning:
+                self.log_message(outcome.warning)
+            batch.append(outcome)
+        # Una sola inserción por lote; la vista del modelo crece con el almacén
+        start = len(self.analysis_results)
+        self.result_store.append(batch)
+        self.results_model.records_appended(start)
         self.results_table.scrollToBottom()
+        if self.analysis_metrics is not None:
+            self.analysis_metrics.add("ui", time.perf_counter() - started)
+
+    def on_analysis_progress(self, value, label):
+        self.progress.setValue(value)
+        if label:
+            self.progress.setLabelText(label)
+
+    def on_analysis_finished(self, canceled):
+        self.analysis_thread = None
+        self.analysis_worker = None
+
+        if not canceled:
+            self.progress.setValue(100)
+
+            self.update_summary(self.analysis_results.total_cost())
+
+            self.export_btn.setEnabled(True)
+            self.log_message("✅ Análisis completado.")
+            fast_pages = self.analysis_results.fast_path_count()
+            if fast_pages:
+                self.log_message(f"⚡ {fast_pages} página(s) resuelta(s) sin rasterizar completa(s) "
+                                 f"(vacías, vectoriales o estimadas)")
+            if self.analysis_cache is not None:
+                hits = self.analysis_cache.hits - self._cache_counts_at_start[0]
+                misses = self.analysis_cache.misses - self._cache_counts_at_start[1]
+                self.log_message(f"🗃️ Caché: {hits} página(s) reutilizada(s), {misses} medida(s)")
+            if self.analysis_metrics is not None:
+                self.log_message("⏱️ Tiempos por etapa:")
+                for line in self.analysis_metrics.summary_lines():
+                    self.log_message(line)
+                self.export_metrics_btn.setEnabled(True)
+        else:
+            self.log_message("⚠️ Análisis cancelado por el usuario")
+
+        self.set_ui_enabled(True)
+        self.progress.close()
 
     def update_summary(self, total_cost):
-        self.summary_label.setText(
+        summary = (
             f"🟰 Resumen: {len(self.analysis_results)} páginas analizadas | "
             f"Costo total estimado: ${total_cost:,.0f}"
         )
+        duplicated = self.analysis_results.duplicate_count()
+        if duplicated:
+            summary += f" | {duplicated} página(s) repetida(s) sin reanalizar"
+        self.summary_label.setText(summary)
+
+    def filter_results(self, text):
+        self.results_model.set_filter_text(text)
 
     def set_ui_enabled(self, enabled):
         self.load_pdf_btn.setEnabled(enabled)
         self.load_folder_btn.setEnabled(enabled)
         self.canvas_combo.setEnabled(enabled)
+        self.workers_spin.setEnabled(enabled)
+        self.metrics_check.setEnabled(enabled)
+        self.estimate_check.setEnabled(enabled)
         self.analyze_btn.setEnabled(enabled and len(self.pdf_documents) > 0)
         self.reset_btn.setEnabled(enabled)
         self.export_btn.setEnabled(enabled and len(self.analysis_results) > 0)
 
     def determine_print_type(self, width_cm, height_cm):
-        def fits(dimensions, ref_width, ref_height):
-            return (dimensions[0] <= ref_width and dimensions[1] <= ref_height)
-
-        short_side = round(min(width_cm, height_cm))
-        long_side = round(max(width_cm, height_cm))
-
-        # Primero comprobar cuarto pliego (el más pequeño)
-        cuarto_dims = PRINT_COSTS["cuarto_pliego"]["dimensions_cm"]
-        if fits((width_cm, height_cm), cuarto_dims[0], cuarto_dims[1]) or fits((height_cm, width_cm), cuarto_dims[0], cuarto_dims[1]):
-            return "cuarto_pliego"
-
-        # Luego medio pliego
-        medio_dims = PRINT_COSTS["medio_pliego"]["dimensions_cm"]
-        if fits((width_cm, height_cm), medio_dims[0], medio_dims[1]) or fits((height_cm, width_cm), medio_dims[0], medio_dims[1]):
-            return "medio_pliego"
-
-        # Luego pliego estándar con margen flexible en altura
-        if short_side <= 74:
-            return "pliego"
-
-        # Finalmente tamaños extra
-        if 75 <= short_side <= 92:
-            return "extra_90"
-        elif 93 <= short_side <= 105:
-
-            return "large_format"
+        return determine_print_type(width_cm, height_cm)
 
 
     def export_report(self):
@@ -924,302 +1100,7 @@ class PDFAnalyzerTab(QWidget):
             return
 
         try:
-            doc = fitz.open()
-            # Configuración del documento
-            margin = 40
-            page_width = 612  # Letter size (8.5 x 11 inches)
-            page_height = 792
-            content_width = page_width - 2 * margin
-            # Configuración de fuentes y colores
-            title_font_size = 20
-            subtitle_font_size = 16
-            section_font_size = 14
-            text_font_size = 11
-            table_header_font_size = 10
-            table_content_font_size = 9
-            footer_font_size = 8
-            header_color = (0.2, 0.4, 0.6)  # Azul oscuro
-            border_color = (0.7, 0.7, 0.7)  # Gris claro
-            row_color = (0.95, 0.95, 0.95)  # Gris muy claro
-            alternate_row_color = (1, 1, 1)  # Blanco
-            accent_color = (0.0, 0.4, 0.7)  # Azul medio
-
-            def add_footer(page_obj, page_number_display):
-                footer_text = f"Página {page_number_display}"
-                footer_rect = fitz.Rect(
-                    margin, page_height - margin + 10,
-                    page_width - margin, page_height - margin + 10 + footer_font_size * 1.5
-                )
-                page_obj.insert_textbox(
-                    footer_rect,
-                    footer_text,
-                    fontname="Helvetica",
-                    fontsize=footer_font_size,
-                    color=(0.5, 0.5, 0.5),
-                    align=fitz.TEXT_ALIGN_CENTER
-                )
-                page_obj.draw_line(
-                    fitz.Point(margin, page_height - margin + 5),
-                    fitz.Point(page_width - margin, page_height - margin + 5),
-                    color=(0.8, 0.8, 0.8),
-                    width=0.5
-                )
-
-            page = doc.new_page(width=page_width, height=page_height)
-            y_pos = margin
-
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            logo_path = os.path.join(script_dir, "resource", "LOGO_VIRTUA.png")
-            if os.path.exists(logo_path):
-                logo_rect = fitz.Rect(margin, y_pos, margin + 150, y_pos + 50)
-                page.insert_image(logo_rect, filename=logo_path)
-                y_pos += 60
-            else:
-                y_pos += 20
-
-            title_rect = fitz.Rect(margin, y_pos, margin +
-                                content_width, y_pos + 30)
-            page.insert_textbox(
-                title_rect,
-                "REPORTE DE COTIZACIONES",
-                fontname="Helvetica-Bold",
-                fontsize=title_font_size,
-                color=(0, 0, 0.5),
-                align=fitz.TEXT_ALIGN_CENTER
-            )
-            y_pos += 40
-
-            date_str = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            page.insert_text(
-                fitz.Point(margin, y_pos),
-                f"Generado el: {date_str}",
-                fontname="Helvetica",
-                fontsize=text_font_size,
-                color=(0.5, 0.5, 0.5)
-            )
-            y_pos += 30
-
-            page.insert_text(
-                fitz.Point(margin, y_pos),
-                "RESUMEN GENERAL",
-                fontname="Helvetica-Bold",
-                fontsize=section_font_size,
-                color=accent_color
-            )
-            y_pos += 25
-
-            total_cotizaciones = len(self.quotes_history)
-            total_paginas_global = sum(quote['total_pages']
-                                    for quote in self.quotes_history)
-            total_costo_global = sum(quote['total_cost']
-                                    for quote in self.quotes_history)
-            summary_lines = [
-                f"• Total de cotizaciones registradas: {total_cotizaciones}",
-                f"• Total de páginas analizadas en todas las cotizaciones: {total_paginas_global}",
-                f"• Costo total estimado global: ${total_costo_global:,.0f}"
-            ]
-
-            for line in summary_lines:
-                page.insert_text(
-                    fitz.Point(margin + 20, y_pos),
-                    line,
-                    fontname="Helvetica",
-                    fontsize=text_font_size,
-                    color=(0, 0, 0))
-                y_pos += 20
-
-            y_pos += 30
-            add_footer(page, 1)  # Footer para la página de resumen
-
-            current_page_number = 1  # Empezamos desde la página 1 (resumen)
-
-            for idx, quote_data in enumerate(self.quotes_history):
-                if y_pos > page_height - 200:
-                    page = doc.new_page(width=page_width, height=page_height)
-                    current_page_number += 1
-                    y_pos = margin
-                    page.insert_text(
-                        fitz.Point(margin, y_pos),
-                        "REPORTE DE COTIZACIONES (Continuación)",
-                        fontname="Helvetica-Bold",
-                        fontsize=subtitle_font_size,
-                        color=accent_color
-                    )
-                    y_pos += 30
-
-                page.insert_text(
-                    fitz.Point(margin, y_pos),
-                    f"COTIZACIÓN {idx + 1}",
-                    fontname="Helvetica-Bold",
-                    fontsize=section_font_size,
-                    color=accent_color
-                )
-                y_pos += 25
-
-                quote_summary_lines = [
-                    f"Archivo(s): {quote_data['pdf_names']}",
-                    f"Páginas totales: {quote_data['total_pages']}",
-                    f"Tipo de impresión: {quote_data['print_type']}",
-                    f"Costo Total de Cotización: ${quote_data['total_cost']:,.0f}",
-                    f"Fecha y Hora: {quote_data['timestamp']}"
-                ]
-
-                for line in quote_summary_lines:
-                    if y_pos + 20 > page_height - margin:
-                        add_footer(page, current_page_number)
-                        page = doc.new_page(width=page_width, height=page_height)
-                        current_page_number += 1
-                        y_pos = margin
-
-                    page.insert_text(
-                        fitz.Point(margin + 20, y_pos),
-                        line,
-                        fontname="Helvetica",
-                        fontsize=text_font_size,
-                        color=(0, 0, 0)
-                    )
-                    y_pos += 18
-
-                y_pos += 15
-
-                if 'detailed_results' in quote_data and quote_data['detailed_results']:
-                    if y_pos + 40 > page_height - margin:
-                        add_footer(page, current_page_number)
-                        page = doc.new_page(width=page_width, height=page_height)
-                        current_page_number += 1
-                        y_pos = margin
-
-                    page.insert_text(
-                        fitz.Point(margin, y_pos),
-                        "Detalle de Análisis de PDF(s):",
-                        fontname="Helvetica-Bold",
-                        fontsize=text_font_size + 1,
-                        color=(0.2, 0.2, 0.2)
-                    )
-                    y_pos += 20
-
-                    table_headers = ["PDF", "Pág.", "Dimensiones",
-                                    "% Sólido", "Tipo Pliego", "Costo", "Lienzo"]
-                    col_widths_analysis = [100, 30, 80, 50, 80, 60, 80]
-                    total_table_width = sum(col_widths_analysis)
-                    cell_height = 20
-
-                    if y_pos + cell_height > page_height - margin:
-                        add_footer(page, current_page_number)
-                        page = doc.new_page(width=page_width, height=page_height)
-                        current_page_number += 1
-                        y_pos = margin
-
-                    x_start_table = margin
-                    page.draw_rect(
-                        fitz.Rect(x_start_table, y_pos, x_start_table +
-                                total_table_width, y_pos + cell_height),
-                        color=header_color,
-                        fill=header_color,
-                        width=1
-                    )
-
-                    current_x = x_start_table
-                    for i, header in enumerate(table_headers):
-                        header_rect = fitz.Rect(
-                            current_x, y_pos, current_x + col_widths_analysis[i], y_pos + cell_height)
-                        page.insert_textbox(
-                            header_rect,
-                            header,
-                            fontname="Helvetica",
-                            fontsize=table_header_font_size,
-                            color=(1, 1, 1),
-                            align=fitz.TEXT_ALIGN_CENTER
-                        )
-                        current_x += col_widths_analysis[i]
-
-                    y_pos += cell_height
-
-                    for i, result in enumerate(quote_data['detailed_results']):
-                        if y_pos + cell_height > page_height - margin:
-                            add_footer(page, current_page_number)
-                            page = doc.new_page(width=page_width, height=page_height)
-                            current_page_number += 1
-                            y_pos = margin
-                            x_start_table = margin
-                            page.draw_rect(
-                                fitz.Rect(x_start_table, y_pos, x_start_table +
-                                        total_table_width, y_pos + cell_height),
-                                color=header_color,
-                                fill=header_color,
-                                width=1
-                            )
-                            current_x = x_start_table
-                            for j, header in enumerate(table_headers):
-                                header_rect = fitz.Rect(
-                                    current_x, y_pos, current_x + col_widths_analysis[j], y_pos + cell_height)
-                                page.insert_textbox(
-                                    header_rect,
-                                    header,
-                                    fontname="Helvetica",
-                                    fontsize=table_header_font_size,
-                                    color=(1, 1, 1),
-                                    align=fitz.TEXT_ALIGN_CENTER
-                                )
-                                current_x += col_widths_analysis[j]
-                            y_pos += cell_height
-
-                        fill_color = row_color if i % 2 == 0 else alternate_row_color
-                        current_x = x_start_table
-
-                        pdf_name_display = result['pdf_name']
-                        if len(pdf_name_display) > 18:
-                            pdf_name_display = pdf_name_display[:15] + "..."
-
-                        cells = [
-                            pdf_name_display,
-                            str(result['page_num']),
-                            result['dimensions'],
-                            f"{result['non_white_percentage']}%",
-                            result['print_type'],
-                            f"${result['cost']:,.0f}",
-                            result['canvas']
-                        ]
-
-                        for j, cell_content in enumerate(cells):
-                            cell_rect = fitz.Rect(
-                                current_x, y_pos, current_x + col_widths_analysis[j], y_pos + cell_height)
-                            page.draw_rect(
-                                cell_rect,
-                                color=border_color,
-                                fill=fill_color,
-                                width=0.5
-                            )
-                            align = fitz.TEXT_ALIGN_LEFT if j == 0 else fitz.TEXT_ALIGN_CENTER
-                            if j == 5:  # Columna de costo
-                                align = fitz.TEXT_ALIGN_RIGHT
-                            page.insert_textbox(
-                                cell_rect,
-                                cell_content,
-                                fontname="Helvetica",
-                                fontsize=table_content_font_size,
-                                color=(0, 0, 0),
-                                align=align
-                            )
-                            current_x += col_widths_analysis[j]
-
-                        y_pos += cell_height
-
-                    y_pos += 20  # Espacio después de la tabla
-
-                if idx < len(self.quotes_history) - 1 and y_pos + 20 < page_height - margin:
-                    page.draw_line(
-                        fitz.Point(margin, y_pos),
-                        fitz.Point(page_width - margin, y_pos),
-                        color=(0.8, 0.8, 0.8),
-                        width=1
-                    )
-                    y_pos += 15
-
-            add_footer(page, current_page_number)
-
-            doc.save(file_path)
-            doc.close()
+            write_quotes_report(self.quotes_history, file_path)
             self.log_message(
                 f"✅ Reporte de cotizaciones exportado correctamente a: {file_path}")
             QMessageBox.information(
@@ -1231,6 +1112,28 @@ class PDFAnalyzerTab(QWidget):
                 self, "Error", f"No se pudo exportar el reporte:\n{str(e)}")
 
 
+    def export_metrics(self):
+        if self.analysis_metrics is None:
+            return
+
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Guardar Métricas",
+            f"Metricas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            "JSON (*.json);;Prometheus (*.prom)"
+        )
+        if not file_path:
+            return
+
+        try:
+            if file_path.endswith(".prom") or "prom" in selected_filter:
+                self.analysis_metrics.write_prometheus(file_path)
+            else:
+                self.analysis_metrics.write_json(file_path)
+            self.log_message(f"✅ Métricas exportadas a: {file_path}")
+        except Exception as e:
+            self.log_message(f"Error al exportar métricas: {str(e)}")
+            QMessageBox.critical(self, "Error", f"No se pudieron exportar las métricas:\n{str(e)}")
+
     def reset_analysis(self):
         reply = QMessageBox.question(
             self, "Confirmar Reinicio",
@@ -1239,8 +1142,10 @@ class PDFAnalyzerTab(QWidget):
         )
 
         if reply == QMessageBox.Yes:
+            self.stop_folder_discovery()
             self.pdf_documents = []
-            self.analysis_results = []
+            self.result_store = ResultStore()
+            self.analysis_results = self.result_store.view()
             self.selected_canvas = None
             self.canvas_combo.setCurrentIndex(0)
 
@@ -1250,8 +1155,10 @@ class PDFAnalyzerTab(QWidget):
             self.pdf_canvas_label.setText("🖼️ Lienzo aplicado: Ninguno")
             self.analyze_btn.setEnabled(False)
             self.export_btn.setEnabled(False)
+            self.analysis_metrics = None
+            self.export_metrics_btn.setEnabled(False)
 
-            self.results_table.setRowCount(0)
+            self.results_model.set_records(self.analysis_results)
             self.summary_label.setText("🟰 Resumen: No hay datos analizados")
             self.console.clear()
 
@@ -1263,7 +1170,12 @@ class PDFAnalyzerTab(QWidget):
             self.console.verticalScrollBar().maximum())
 
     def closeEvent(self, event):
-        for pdf in self.pdf_documents:
-            if 'document' in pdf and pdf['document']:
-                pdf['document'].close()
+        if self.analysis_thread is not None:
+            self.cancel_analysis()
+            self.analysis_thread.quit()
+            self.analysis_thread.wait()
+        self.stop_folder_discovery()
+        if self.analysis_cache is not None:
+            self.analysis_cache.close()
+        self.document_registry.close()
         event.accept()
@@ -0,0 +1,138 @@
+# price_matrix.py - costos de todas las páginas medidas para cada lienzo, calculados en bloque
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    _HAS_NUMPY = False
+
+from analysis_engine import PageStats, determine_print_type, page_size_pt, price_page
+from utils import (
+    DEFAULT_DPI, PRINT_COSTS, LINE_COSTS, COVERAGE_BANDS, LENGTH_SCALED_TYPES, LINE_PRICING_MAX_PERCENTAGE,
+    points_to_cm
+)
+
+# Códigos de tipo de línea en los arreglos
+LINE_TYPES = (None, "negra", "color")
+
+
+def line_type_code(line_type):
+    return LINE_TYPES.index(line_type) if line_type in LINE_TYPES else 0
+
+
+def _round_costs(print_type_key, costs):
+    if print_type_key == "cuarto_pliego":
+        return np.round(costs / 500) * 500
+    if print_type_key in LENGTH_SCALED_TYPES:
+        return np.round(costs / 1000) * 1000
+    return costs
+
+
+def price_vector(print_type_key, percentages, line_codes, width_cm):
+    """
+    Versión vectorizada de price_page para un tipo de impresión.
+
+    Args:
+        percentages: Porcentajes de cobertura (enteros) por página.
+        line_codes: Índices en LINE_TYPES por página.
+        width_cm: Lado mayor (cm) de cada página o del lienzo.
+    """
+    data = PRINT_COSTS[print_type_key]
+    clamped = np.clip(percentages, 0, 100)
+    factor = np.searchsorted(COVERAGE_BANDS, clamped, side="right") / 10
+    costs = data["base_cost"] + (data["full_cost"] - data["base_cost"]) * factor
+    if print_type_key in LENGTH_SCALED_TYPES:
+        costs = costs * (width_cm / data["dimensions_cm"][1])
+    costs = _round_costs(print_type_key, costs)
+
+    if print_type_key in LINE_COSTS:
+        rates = np.array([float(LINE_COSTS[print_type_key].get(line_type, 0)) for line_type in LINE_TYPES])
+        line_costs = _round_costs(print_type_key, rates[line_codes])
+        in_line_range = (percentages >= 0) & (percentages <= LINE_PRICING_MAX_PERCENTAGE)
+        costs = np.where(in_line_range, line_costs, costs)
+    return costs
+
+
+class PriceMatrix:
+    """
+    Costos de un conjunto de páginas medidas para el tamaño original (None) y
+    para cada lienzo de PRINT_COSTS.
+
+    Se calcula una sola vez a partir de las columnas de medición (cobertura,
+    tipo de línea y tamaño de la página en puntos); cambiar de lienzo es
+    tomar otra columna, sin volver a rasterizar ni a cotizar página por página.
+    """
+
+    def __init__(self, percentages, line_codes, width_pt, height_pt, original_keys=None):
+        self.percentages = percentages
+        self.line_codes = line_codes
+        self.width_pt = width_pt
+        self.height_pt = height_pt
+        if _HAS_NUMPY:
+            self.width_cm_original = points_to_cm(np.maximum(np.asarray(width_pt), np.asarray(height_pt)))
+        else:
+            self.width_cm_original = [points_to_cm(max(w, h)) for w, h in zip(width_pt, height_pt)]
+        # El tipo por tamaño original no depende del lienzo
+        if original_keys is None:
+            height_cm_original = [points_to_cm(min(w, h)) for w, h in zip(width_pt, height_pt)]
+            original_keys = [
+                determine_print_type(w, h) for w, h in zip(self.width_cm_original, height_cm_original)
+            ]
+        self.original_keys = original_keys
+        self._columns = {}
+        for canvas in (None, *PRINT_COSTS):
+            self._columns[canvas] = self._price_column(canvas)
+
+    @classmethod
+    def from_stats(cls, stats, dpi=DEFAULT_DPI):
+        """dpi solo se usa con mediciones que no guardan su tamaño ni su dpi (page_size_pt)."""
+        stats = list(stats)
+        sizes = [page_size_pt(s, dpi) for s in stats]
+        return cls(
+            [s.non_white_percentage for s in stats],
+            [line_type_code(s.line_type) for s in stats],
+            [width for width, _ in sizes],
+            [height for _, height in sizes]
+        )
+
+    def __len__(self):
+        return len(self.percentages)
+
+    def _price_column(self, canvas):
+        if not _HAS_NUMPY:
+            return [self._price_scalar(i, canvas) for i in range(len(self))]
+
+        percentages = np.asarray(self.percentages, dtype=np.int64)
+        line_codes = np.asarray(self.line_codes, dtype=np.intp)
+        if canvas:
+            return price_vector(canvas, percentages, line_codes, float(max(PRINT_COSTS[canvas]["dimensions_cm"])))
+
+        # Tamaño original: cada página con su tipo, agrupadas por tipo
+        costs = np.zeros(len(self))
+        keys = np.array(self.original_keys, dtype=object)
+        width_cm = np.array(self.width_cm_original, dtype=float)
+        for key in PRINT_COSTS:
+            rows = np.flatnonzero(keys == key)
+            if rows.size:
+                costs[rows] = price_vector(key, percentages[rows], line_codes[rows], width_cm[rows])
+        return costs
+
+    def _price_scalar(self, index, canvas):
+        stats = PageStats(
+            width_px=0,
+            height_px=0,
+            non_white_percentage=self.percentages[index],
+            line_type=LINE_TYPES[self.line_codes[index]],
+            width_pt=float(self.width_pt[index]),
+            height_pt=float(self.height_pt[index])
+        )
+        try:
+            return price_page(stats, "", index + 1, canvas=canvas).cost
+        except Exception:
+            return 0
+
+    def costs(self, canvas=None):
+        """Costos por página con el lienzo indicado (None: tamaño original)."""
+        return self._columns[canvas]
+
+    def total(self, canvas=None):
+        return float(sum(self._columns[canvas]))
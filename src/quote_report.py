@@ -0,0 +1,335 @@
+# quote_report.py - reporte PDF de cotizaciones y registros por página, sin dependencias de Qt
+import os
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+# Campos de cada página en las salidas de máquina (línea de comandos, carpeta vigilada)
+QUOTE_FIELDS = (
+    'pdf_name', 'page_num', 'width_cm', 'height_cm', 'non_white_percentage',
+    'print_type_key', 'print_type', 'line_type', 'cost', 'canvas', 'method',
+    'duplicate_of', 'warning', 'coverage_interval', 'dpi'
+)
+
+
+def quote_record(result):
+    """Registro plano de un PageResult con los campos de QUOTE_FIELDS."""
+    record = {key: getattr(result, key) for key in QUOTE_FIELDS}
+    record['width_cm'] = round(result.width_cm, 2)
+    record['height_cm'] = round(result.height_cm, 2)
+    return record
+
+
+def build_quote(results):
+    """
+    Cotización del historial (el formato de quotes_history) a partir de una
+    secuencia de filas con la interfaz de PageResult.to_dict().
+    """
+    results = list(results)
+    return {
+        'pdf_names': ", ".join(dict.fromkeys(result['pdf_name'] for result in results)),
+        'total_pages': len(results),
+        'print_type': results[0]['print_type'] if results else "",
+        'total_cost': sum(result['cost'] for result in results),
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'detailed_results': results
+    }
+
+
+def write_quotes_report(quotes, file_path):
+    """Escribe el reporte PDF de cotizaciones (resumen y detalle por página) en file_path."""
+    doc = fitz.open()
+    # Configuración del documento
+    margin = 40
+    page_width = 612  # Letter size (8.5 x 11 inches)
+    page_height = 792
+    content_width = page_width - 2 * margin
+    # Configuración de fuentes y colores
+    title_font_size = 20
+    subtitle_font_size = 16
+    section_font_size = 14
+    text_font_size = 11
+    table_header_font_size = 10
+    table_content_font_size = 9
+    footer_font_size = 8
+    header_color = (0.2, 0.4, 0.6)  # Azul oscuro
+    border_color = (0.7, 0.7, 0.7)  # Gris claro
+    row_color = (0.95, 0.95, 0.95)  # Gris muy claro
+    alternate_row_color = (1, 1, 1)  # Blanco
+    accent_color = (0.0, 0.4, 0.7)  # Azul medio
+
+    def add_footer(page_obj, page_number_display):
+        footer_text = f"Página {page_number_display}"
+        footer_rect = fitz.Rect(
+            margin, page_height - margin + 10,
+            page_width - margin, page_height - margin + 10 + footer_font_size * 1.5
+        )
+        page_obj.insert_textbox(
+            footer_rect,
+            footer_text,
+            fontname="Helvetica",
+            fontsize=footer_font_size,
+            color=(0.5, 0.5, 0.5),
+            align=fitz.TEXT_ALIGN_CENTER
+        )
+        page_obj.draw_line(
+            fitz.Point(margin, page_height - margin + 5),
+            fitz.Point(page_width - margin, page_height - margin + 5),
+            color=(0.8, 0.8, 0.8),
+            width=0.5
+        )
+
+    page = doc.new_page(width=page_width, height=page_height)
+    y_pos = margin
+
+    logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource", "LOGO_VIRTUA.png")
+    if os.path.exists(logo_path):
+        logo_rect = fitz.Rect(margin, y_pos, margin + 150, y_pos + 50)
+        page.insert_image(logo_rect, filename=logo_path)
+        y_pos += 60
+    else:
+        y_pos += 20
+
+    title_rect = fitz.Rect(margin, y_pos, margin +
+                        content_width, y_pos + 30)
+    page.insert_textbox(
+        title_rect,
+        "REPORTE DE COTIZACIONES",
+        fontname="Helvetica-Bold",
+        fontsize=title_font_size,
+        color=(0, 0, 0.5),
+        align=fitz.TEXT_ALIGN_CENTER
+    )
+    y_pos += 40
+
+    date_str = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    page.insert_text(
+        fitz.Point(margin, y_pos),
+        f"Generado el: {date_str}",
+        fontname="Helvetica",
+        fontsize=text_font_size,
+        color=(0.5, 0.5, 0.5)
+    )
+    y_pos += 30
+
+    page.insert_text(
+        fitz.Point(margin, y_pos),
+        "RESUMEN GENERAL",
+        fontname="Helvetica-Bold",
+        fontsize=section_font_size,
+        color=accent_color
+    )
+    y_pos += 25
+
+    total_cotizaciones = len(quotes)
+    total_paginas_global = sum(quote['total_pages']
+                            for quote in quotes)
+    total_costo_global = sum(quote['total_cost']
+                            for quote in quotes)
+    summary_lines = [
+        f"• Total de cotizaciones registradas: {total_cotizaciones}",
+        f"• Total de páginas analizadas en todas las cotizaciones: {total_paginas_global}",
+        f"• Costo total estimado global: ${total_costo_global:,.0f}"
+    ]
+
+    for line in summary_lines:
+        page.insert_text(
+            fitz.Point(margin + 20, y_pos),
+            line,
+            fontname="Helvetica",
+            fontsize=text_font_size,
+            color=(0, 0, 0))
+        y_pos += 20
+
+    y_pos += 30
+    add_footer(page, 1)  # Footer para la página de resumen
+
+    current_page_number = 1  # Empezamos desde la página 1 (resumen)
+
+    for idx, quote_data in enumerate(quotes):
+        if y_pos > page_height - 200:
+            page = doc.new_page(width=page_width, height=page_height)
+            current_page_number += 1
+            y_pos = margin
+            page.insert_text(
+                fitz.Point(margin, y_pos),
+                "REPORTE DE COTIZACIONES (Continuación)",
+                fontname="Helvetica-Bold",
+                fontsize=subtitle_font_size,
+                color=accent_color
+            )
+            y_pos += 30
+
+        page.insert_text(
+            fitz.Point(margin, y_pos),
+            f"COTIZACIÓN {idx + 1}",
+            fontname="Helvetica-Bold",
+            fontsize=section_font_size,
+            color=accent_color
+        )
+        y_pos += 25
+
+        quote_summary_lines = [
+            f"Archivo(s): {quote_data['pdf_names']}",
+            f"Páginas totales: {quote_data['total_pages']}",
+            f"Tipo de impresión: {quote_data['print_type']}",
+            f"Costo Total de Cotización: ${quote_data['total_cost']:,.0f}",
+            f"Fecha y Hora: {quote_data['timestamp']}"
+        ]
+
+        for line in quote_summary_lines:
+            if y_pos + 20 > page_height - margin:
+                add_footer(page, current_page_number)
+                page = doc.new_page(width=page_width, height=page_height)
+                current_page_number += 1
+                y_pos = margin
+
+            page.insert_text(
+                fitz.Point(margin + 20, y_pos),
+                line,
+                fontname="Helvetica",
+                fontsize=text_font_size,
+                color=(0, 0, 0)
+            )
+            y_pos += 18
+
+        y_pos += 15
+
+        if 'detailed_results' in quote_data and quote_data['detailed_results']:
+            if y_pos + 40 > page_height - margin:
+                add_footer(page, current_page_number)
+                page = doc.new_page(width=page_width, height=page_height)
+                current_page_number += 1
+                y_pos = margin
+
+            page.insert_text(
+                fitz.Point(margin, y_pos),
+                "Detalle de Análisis de PDF(s):",
+                fontname="Helvetica-Bold",
+                fontsize=text_font_size + 1,
+                color=(0.2, 0.2, 0.2)
+            )
+            y_pos += 20
+
+            table_headers = ["PDF", "Pág.", "Dimensiones",
+                            "% Sólido", "Tipo Pliego", "Costo", "Lienzo"]
+            col_widths_analysis = [100, 30, 80, 50, 80, 60, 80]
+            total_table_width = sum(col_widths_analysis)
+            cell_height = 20
+
+            if y_pos + cell_height > page_height - margin:
+                add_footer(page, current_page_number)
+                page = doc.new_page(width=page_width, height=page_height)
+                current_page_number += 1
+                y_pos = margin
+
+            x_start_table = margin
+            page.draw_rect(
+                fitz.Rect(x_start_table, y_pos, x_start_table +
+                        total_table_width, y_pos + cell_height),
+                color=header_color,
+                fill=header_color,
+                width=1
+            )
+
+            current_x = x_start_table
+            for i, header in enumerate(table_headers):
+                header_rect = fitz.Rect(
+                    current_x, y_pos, current_x + col_widths_analysis[i], y_pos + cell_height)
+                page.insert_textbox(
+                    header_rect,
+                    header,
+                    fontname="Helvetica",
+                    fontsize=table_header_font_size,
+                    color=(1, 1, 1),
+                    align=fitz.TEXT_ALIGN_CENTER
+                )
+                current_x += col_widths_analysis[i]
+
+            y_pos += cell_height
+
+            for i, result in enumerate(quote_data['detailed_results']):
+                if y_pos + cell_height > page_height - margin:
+                    add_footer(page, current_page_number)
+                    page = doc.new_page(width=page_width, height=page_height)
+                    current_page_number += 1
+                    y_pos = margin
+                    x_start_table = margin
+                    page.draw_rect(
+                        fitz.Rect(x_start_table, y_pos, x_start_table +
+                                total_table_width, y_pos + cell_height),
+                        color=header_color,
+                        fill=header_color,
+                        width=1
+                    )
+                    current_x = x_start_table
+                    for j, header in enumerate(table_headers):
+                        header_rect = fitz.Rect(
+                            current_x, y_pos, current_x + col_widths_analysis[j], y_pos + cell_height)
+                        page.insert_textbox(
+                            header_rect,
+                            header,
+                            fontname="Helvetica",
+                            fontsize=table_header_font_size,
+                            color=(1, 1, 1),
+                            align=fitz.TEXT_ALIGN_CENTER
+                        )
+                        current_x += col_widths_analysis[j]
+                    y_pos += cell_height
+
+                fill_color = row_color if i % 2 == 0 else alternate_row_color
+                current_x = x_start_table
+
+                pdf_name_display = result['pdf_name']
+                if len(pdf_name_display) > 18:
+                    pdf_name_display = pdf_name_display[:15] + "..."
+
+                cells = [
+                    pdf_name_display,
+                    str(result['page_num']),
+                    result['dimensions'],
+                    f"{result['non_white_percentage']}%",
+                    result['print_type'],
+                    f"${result['cost']:,.0f}",
+                    result['canvas']
+                ]
+
+                for j, cell_content in enumerate(cells):
+                    cell_rect = fitz.Rect(
+                        current_x, y_pos, current_x + col_widths_analysis[j], y_pos + cell_height)
+                    page.draw_rect(
+                        cell_rect,
+                        color=border_color,
+                        fill=fill_color,
+                        width=0.5
+                    )
+                    align = fitz.TEXT_ALIGN_LEFT if j == 0 else fitz.TEXT_ALIGN_CENTER
+                    if j == 5:  # Columna de costo
+                        align = fitz.TEXT_ALIGN_RIGHT
+                    page.insert_textbox(
+                        cell_rect,
+                        cell_content,
+                        fontname="Helvetica",
+                        fontsize=table_content_font_size,
+                        color=(0, 0, 0),
+                        align=align
+                    )
+                    current_x += col_widths_analysis[j]
+
+                y_pos += cell_height
+
+            y_pos += 20  # Espacio después de la tabla
+
+        if idx < len(quotes) - 1 and y_pos + 20 < page_height - margin:
+            page.draw_line(
+                fitz.Point(margin, y_pos),
+                fitz.Point(page_width - margin, y_pos),
+                color=(0.8, 0.8, 0.8),
+                width=1
+            )
+            y_pos += 15
+
+    add_footer(page, current_page_number)
+
+    doc.save(file_path)
+    doc.close()
@@ -0,0 +1,379 @@
+# quote_server.py - servicio HTTP local (asyncio) de cotización con cola de trabajos acotada
+#
+#   POST /jobs                 Cuerpo application/pdf (archivo subido) o JSON {"path": "...", "canvas": "pliego"}.
+#                              El lienzo también puede ir en la URL: /jobs?canvas=pliego.
+#                              202 {"job_id": ...}; 429 si la cola está llena.
+#   GET  /jobs/<id>            Estado y páginas cotizadas (?since=N devuelve desde la página N).
+#   GET  /jobs/<id>/stream     Páginas en NDJSON a medida que se cotizan y, al final, el total.
+#   GET  /health               Trabajos en cola y en curso.
+import asyncio
+import functools
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from analysis_engine import measure_page_range, price_page, resolve_config, DEFAULT_WORKERS, PAGES_PER_TASK
+from document_registry import read_document_info
+from quote_report import quote_record
+from utils import DEFAULT_DPI, PRINT_COSTS
+
+# Opciones del servicio; QuoteServer puede sobrescribirlas con config={...}
+SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    # Trabajos aceptados que aún no terminan (en cola o en curso); al llenarse se responde 429
+    "max_pending_jobs": 16,
+    # Trabajos analizados a la vez; comparten el pool de procesos
+    "concurrent_jobs": 2,
+    # Tamaño máximo de un PDF subido
+    "max_upload_bytes": 256 * 1024 * 1024,
+    # Trabajos terminados que se conservan para consultarlos
+    "max_finished_jobs": 256,
+}
+
+REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+
+def _write_upload(path, body):
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Job:
+    """Cotización de un PDF: sus páginas se agregan a records a medida que se terminan."""
+
+    def __init__(self, job_id, path, pdf_name, canvas, temporary=False):
+        self.id = job_id
+        self.path = path
+        self.pdf_name = pdf_name
+        self.canvas = canvas
+        # El archivo se subió y se borra al terminar
+        self.temporary = temporary
+        self.status = "queued"
+        self.page_count = None
+        self.records = []
+        self.errors = []
+        self.total_cost = 0.0
+        self.changed = asyncio.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def summary(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'pdf_name': self.pdf_name,
+            'canvas': self.canvas,
+            'page_count': self.page_count,
+            'total_pages': len(self.records),
+            'total_cost': self.total_cost,
+            'errors': self.errors
+        }
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+
+class QuoteServer:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio.start_server, sin dependencias
+    externas. Las páginas se miden en un ProcessPoolExecutor con
+    analysis_engine.measure_page_range (el mismo trabajo del pool del
+    analizador) y se cotizan con price_page en el proceso del servidor.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, dpi=DEFAULT_DPI, config=None, analysis_config=None):
+        self.workers = max(1, workers)
+        self.dpi = dpi
+        self.config = {**SERVER_CONFIG, **(config or {})}
+        self.analysis_config = resolve_config(analysis_config)
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._pending = 0
+        self._executor = None
+        self._server = None
+        self._consumers = []
+        self._upload_dir = None
+        self._job_ids = itertools.count(1)
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Crear los procesos del pool antes de abrir el socket: con fork, los
+        # creados en el primer trabajo heredarían el socket de escucha y las
+        # conexiones abiertas, y el cliente no vería el cierre de la suya
+        await asyncio.get_running_loop().run_in_executor(self._executor, os.getpid)
+        self._queue = asyncio.Queue()
+        self._upload_dir = tempfile.mkdtemp(prefix="cotizador-")
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.config["concurrent_jobs"])]
+        self._server = await asyncio.start_server(self._handle, self.config["host"], self.config["port"])
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._upload_dir is not None:
+            shutil.rmtree(self._upload_dir, ignore_errors=True)
+
+    async def serve_forever(self):
+        host, port = await self.start()
+        print(f"Servicio de cotización en http://{host}:{port}", flush=True)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    # --- Trabajos ---
+
+    def submit(self, path, pdf_name, canvas, temporary=False):
+        """Acepta un trabajo o lanza HttpError 429 si hay max_pending_jobs sin terminar."""
+        if self._pending >= self.config["max_pending_jobs"]:
+            raise HttpError(429, "Cola de trabajos llena; intente de nuevo más tarde")
+        job = Job(f"{next(self._job_ids)}-{uuid.uuid4().hex[:8]}", path, pdf_name, canvas, temporary)
+        self.jobs[job.id] = job
+        self._pending += 1
+        self._queue.put_nowait(job)
+        self._forget_finished_jobs()
+        return job
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.config["max_finished_jobs"])]:
+            del self.jobs[job_id]
+
+    async def _consume(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                job.errors.append(str(e))
+                job.status = "error"
+            finally:
+                self._pending -= 1
+                if job.temporary:
+                    try:
+                        os.remove(job.path)
+                    except OSError:
+                        pass
+                await job.notify()
+
+    async def _run_job(self, job):
+        loop = asyncio.get_running_loop()
+        job.status = "running"
+        try:
+            info = await loop.run_in_executor(None, read_document_info, job.path)
+        except Exception as e:
+            job.errors.append(str(e))
+            job.status = "error"
+            return
+        job.page_count = info.page_count
+        await job.notify()
+
+        # Rangos en vuelo limitados: los demás trabajos también usan el pool.
+        # Cada proceso cierra el documento al terminar su rango: el archivo
+        # subido se borra al acabar el trabajo y el de una ruta puede reemplazarse
+        measure_range = functools.partial(measure_page_range, keep_open=False)
+        ranges = [list(range(start, min(start + PAGES_PER_TASK, info.page_count)))
+                  for start in range(0, info.page_count, PAGES_PER_TASK)]
+        in_flight = []
+        next_range = 0
+        while next_range < len(ranges) or in_flight:
+            while next_range < len(ranges) and len(in_flight) < self.workers:
+                in_flight.append(loop.run_in_executor(
+                    self._executor, measure_range, job.path, ranges[next_range], self.dpi, self.analysis_config))
+                next_range += 1
+            measured = await in_flight.pop(0)
+            for page_index, stats in measured:
+                if isinstance(stats, str):
+                    job.errors.append(f"p. {page_index + 1}: {stats}")
+                    job.records.append({'pdf_name': job.pdf_name, 'page_num': page_index + 1, 'error': stats})
+                    continue
+                try:
+                    result = price_page(stats, job.pdf_name, page_index + 1, canvas=job.canvas, dpi=self.dpi)
+                except Exception as e:
+                    job.errors.append(f"p. {page_index + 1}: {e}")
+                    continue
+                job.total_cost += result.cost
+                job.records.append(quote_record(result))
+            await job.notify()
+        job.status = "done" if info.page_count == 0 or len(job.errors) < info.page_count else "error"
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target, headers, body = await self._read_request(reader)
+                await self._route(method, target, headers, body, writer)
+            except HttpError as e:
+                await self._send_json(writer, e.status, {'error': e.message},
+                                      {'Retry-After': "5"} if e.status == 429 else None)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            except Exception as e:
+                await self._send_json(writer, 500, {'error': str(e)})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HttpError(400, "Solicitud HTTP inválida")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise HttpError(411, "Falta Content-Length")
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HttpError(400, "Content-Length inválido")
+            if length > self.config["max_upload_bytes"]:
+                raise HttpError(413, "Archivo demasiado grande")
+            body = await reader.readexactly(length)
+        return method, target, headers, body
+
+    async def _route(self, method, target, headers, body, writer):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        segments = [segment for segment in url.path.split("/") if segment]
+
+        if segments == ["health"] and method == "GET":
+            await self._send_json(writer, 200, {'pending_jobs': self._pending, 'workers': self.workers})
+            return
+        if segments == ["jobs"]:
+            if method != "POST":
+                raise HttpError(405, "Use POST para crear trabajos")
+            job = await self._create_job(headers, body, query)
+            await self._send_json(writer, 202, {
+                'job_id': job.id,
+                'status_url': f"/jobs/{job.id}",
+                'stream_url': f"/jobs/{job.id}/stream"
+            })
+            return
+        if len(segments) in (2, 3) and segments[0] == "jobs" and method == "GET":
+            job = self.jobs.get(segments[1])
+            if job is None:
+                raise HttpError(404, "Trabajo no encontrado")
+            if len(segments) == 2:
+                try:
+                    since = max(0, int(query.get("since", 0)))
+                except ValueError:
+                    raise HttpError(400, "'since' debe ser un número de página")
+                await self._send_json(writer, 200, {**job.summary(), 'pages': job.records[since:]})
+                return
+            if segments[2] == "stream":
+                await self._stream(job, writer)
+                return
+        raise HttpError(404, "Ruta no encontrada")
+
+    async def _create_job(self, headers, body, query):
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        canvas = query.get("canvas") or None
+        if content_type == "application/json":
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "JSON inválido")
+            path = request.get("path")
+            canvas = request.get("canvas", canvas)
+            if not path or not os.path.isfile(path):
+                raise HttpError(400, "Indique en 'path' un archivo PDF existente")
+            pdf_name, temporary = os.path.basename(path), False
+        else:
+            if not body.startswith(b"%PDF"):
+                raise HttpError(400, "El cuerpo debe ser un PDF (application/pdf) o JSON con 'path'")
+            pdf_name = os.path.basename(query.get("name", "documento.pdf"))
+            path = os.path.join(self._upload_dir, f"{uuid.uuid4().hex}.pdf")
+            temporary = True
+        if canvas is not None and canvas not in PRINT_COSTS:
+            raise HttpError(400, f"Lienzo desconocido: {canvas}")
+
+        if not temporary:
+            return self.submit(path, pdf_name, canvas)
+
+        # Se comprueba la cola antes de escribir el archivo subido
+        if self._pending >= self.config["max_pending_jobs"]:
+            raise HttpError(429, "Cola de trabajos llena; intente de nuevo más tarde")
+        # Escribir cientos de MB bloquearía el bucle: se hace en un hilo
+        await asyncio.get_running_loop().run_in_executor(None, _write_upload, path, body)
+        try:
+            # Mientras se escribía pudieron llegar otros trabajos
+            return self.submit(path, pdf_name, canvas, temporary=True)
+        except HttpError:
+            os.remove(path)
+            raise
+
+    async def _stream(self, job, writer):
+        writer.write(self._head(200, {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"}))
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: len(job.records) > sent or job.finished)
+                records = job.records[sent:]
+                finished = job.finished
+            sent += len(records)
+            if records:
+                self._write_chunk(writer, "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            if finished and sent >= len(job.records):
+                summary = job.summary()
+                self._write_chunk(writer, json.dumps({key: summary[key] for key in (
+                    'status', 'total_pages', 'total_cost', 'errors')}, ensure_ascii=False) + "\n")
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+                return
+            await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status, payload, extra_headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8", "Content-Length": str(len(data))}
+        headers.update(extra_headers or {})
+        writer.write(self._head(status, headers) + data)
+        await writer.drain()
@@ -0,0 +1,242 @@
+# result_store.py - resultados del análisis en columnas compactas; los textos se arman al mostrarlos
+import sys
+from array import array
+
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except Exception:
+    _HAS_NUMPY = False
+
+from analysis_engine import determine_print_type, page_size_pt
+from price_matrix import PriceMatrix, LINE_TYPES, LINE_PRICING_MAX_PERCENTAGE, line_type_code
+from utils import DEFAULT_DPI, PRINT_COSTS, LINE_COSTS, points_to_cm
+
+# Códigos de tipo de impresión por tamaño original (-1: no encaja en ninguno)
+PRINT_TYPE_KEYS = tuple(PRINT_COSTS)
+# Códigos de PageStats.method
+METHODS = ("raster", "blank", "probe", "vector", "sampled", "native", "gray")
+# Claves del diccionario de PageResult.to_dict() que ofrece cada fila
+RESULT_FIELDS = (
+    'pdf_name', 'page_num', 'dimensions', 'non_white_percentage', 'print_type',
+    'cost', 'canvas', 'original_dimensions', 'method', 'duplicate_of', 'coverage_interval', 'dpi'
+)
+
+
+class ResultStore:
+    """
+    Resultados por página de un análisis en columnas tipadas (array), en
+    lugar de un diccionario de textos por página.
+
+    Solo se agregan filas y las ya guardadas no cambian: las vistas
+    (ResultView) y las cotizaciones del historial comparten el almacén sin
+    copiarlo. Los nombres de PDF se guardan una vez (internados) y cada fila
+    lleva su código; advertencias, duplicados e intervalos de las coberturas
+    estimadas, poco frecuentes, van aparte.
+    """
+
+    def __init__(self, canvas=None, dpi=DEFAULT_DPI):
+        # Lienzo con el que se cotizó durante el análisis (columna cost)
+        self.canvas = canvas
+        # DPI del análisis; el de cada página (resolution_policy) va en page_dpi
+        self.dpi = dpi
+        self.pdf_names = []
+        self._name_codes = {}
+        self.pdf_code = array('i')
+        self.page_num = array('i')
+        # Tamaño de la página en puntos, del que salen las medidas y el precio
+        self.width_pt = array('d')
+        self.height_pt = array('d')
+        self.page_dpi = array('f')
+        self.percentage = array('h')
+        self.line_code = array('b')
+        self.method_code = array('b')
+        self.original_type = array('b')
+        self.cost = array('d')
+        self.warnings = {}
+        self.duplicates = {}
+        self.intervals = {}
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.page_num)
+
+    def _name_code(self, pdf_name):
+        code = self._name_codes.get(pdf_name)
+        if code is None:
+            code = len(self.pdf_names)
+            self.pdf_names.append(sys.intern(pdf_name))
+            self._name_codes[pdf_name] = code
+        return code
+
+    def append(self, results):
+        """Agrega un lote de PageResult (cada uno con su medición en result.stats)."""
+        for result in results:
+            stats = result.stats
+            row = len(self.page_num)
+            self.pdf_code.append(self._name_code(result.pdf_name))
+            self.page_num.append(result.page_num)
+            width_pt, height_pt = page_size_pt(stats, self.dpi)
+            self.width_pt.append(width_pt)
+            self.height_pt.append(height_pt)
+            self.page_dpi.append(stats.dpi or self.dpi)
+            self.percentage.append(stats.non_white_percentage)
+            self.line_code.append(line_type_code(stats.line_type))
+            self.method_code.append(METHODS.index(stats.method) if stats.method in METHODS else 0)
+            original_key = determine_print_type(result.width_cm_original, result.height_cm_original)
+            self.original_type.append(PRINT_TYPE_KEYS.index(original_key) if original_key in PRINT_TYPE_KEYS else -1)
+            self.cost.append(result.cost)
+            if result.warning:
+                self.warnings[row] = result.warning
+            if result.duplicate_of:
+                self.duplicates[row] = result.duplicate_of
+            if stats.coverage_interval:
+                self.intervals[row] = stats.coverage_interval
+
+    def price_matrix(self):
+        """PriceMatrix de las filas actuales; se recalcula solo si llegaron filas nuevas."""
+        if self._matrix is None or len(self._matrix) != len(self):
+            columns = (self.percentage, self.line_code, self.width_pt, self.height_pt)
+            if _HAS_NUMPY:
+                # Vistas sin copia sobre los buffers de array
+                columns = tuple(np.frombuffer(column, dtype=column.typecode) for column in columns)
+            original_keys = [PRINT_TYPE_KEYS[code] if code >= 0 else None for code in self.original_type]
+            self._matrix = PriceMatrix(*columns, original_keys=original_keys)
+        return self._matrix
+
+    def view(self, canvas=None):
+        """Vista viva (crece con el almacén) cotizada con el lienzo indicado."""
+        return ResultView(self, canvas)
+
+
+class ResultView:
+    """
+    Filas de un ResultStore cotizadas con un lienzo. No copia datos: cada
+    fila (ResultRow) arma sus textos al pedirlos.
+    """
+
+    def __init__(self, store, canvas=None, length=None):
+        self.store = store
+        self.canvas = canvas
+        # None: la vista sigue al almacén; un número: instantánea de las primeras filas
+        self._length = length
+
+    def __len__(self):
+        return len(self.store) if self._length is None else self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return ResultRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ResultRow(self, index)
+
+    def snapshot(self):
+        """Vista fija de las filas actuales, p. ej. para el historial de cotizaciones."""
+        return ResultView(self.store, self.canvas, len(self))
+
+    def costs(self):
+        if self.canvas == self.store.canvas:
+            return self.store.cost
+        return self.store.price_matrix().costs(self.canvas)
+
+    def cost(self, index):
+        return float(self.costs()[index])
+
+    def total_cost(self):
+        costs = self.costs()
+        if _HAS_NUMPY and isinstance(costs, np.ndarray):
+            return float(costs[:len(self)].sum())
+        return float(sum(costs[:len(self)]))
+
+    def pdf_names(self):
+        """Nombres de PDF presentes en la vista, en orden de aparición."""
+        codes = self.store.pdf_code[:len(self)]
+        return [self.store.pdf_names[code] for code in dict.fromkeys(codes)]
+
+    def duplicate_count(self):
+        return sum(1 for row in self.store.duplicates if row < len(self))
+
+    def fast_path_count(self):
+        return sum(1 for code in self.store.method_code[:len(self)] if code != 0)
+
+    # --- Campos de cada fila ---
+
+    def print_type_key(self, index):
+        if self.canvas:
+            return self.canvas
+        code = self.store.original_type[index]
+        return PRINT_TYPE_KEYS[code] if code >= 0 else None
+
+    def _original_cm(self, index):
+        width_pt = self.store.width_pt[index]
+        height_pt = self.store.height_pt[index]
+        return points_to_cm(max(width_pt, height_pt)), points_to_cm(min(width_pt, height_pt))
+
+    def field(self, index, key):
+        store = self.store
+        if key == 'pdf_name':
+            return store.pdf_names[store.pdf_code[index]]
+        if key == 'page_num':
+            return store.page_num[index]
+        if key == 'non_white_percentage':
+            return store.percentage[index]
+        if key == 'cost':
+            return self.cost(index)
+        if key == 'dimensions':
+            if self.canvas:
+                canvas_dims = PRINT_COSTS[self.canvas]["dimensions_cm"]
+                width_cm, height_cm = max(canvas_dims), min(canvas_dims)
+            else:
+                width_cm, height_cm = self._original_cm(index)
+            return f"{width_cm:.2f} x {height_cm:.2f} cm"
+        if key == 'original_dimensions':
+            width_cm, height_cm = self._original_cm(index)
+            return f"{width_cm:.2f} x {height_cm:.2f} cm"
+        if key == 'print_type':
+            print_type_key = self.print_type_key(index)
+            display_name = PRINT_COSTS.get(print_type_key, {}).get('display_name', print_type_key)
+            if 0 <= store.percentage[index] <= LINE_PRICING_MAX_PERCENTAGE and print_type_key in LINE_COSTS:
+                return f"{display_name} línea {LINE_TYPES[store.line_code[index]]}"
+            return display_name
+        if key == 'canvas':
+            return PRINT_COSTS[self.canvas]["display_name"] if self.canvas else "Original"
+        if key == 'method':
+            return METHODS[store.method_code[index]]
+        if key == 'duplicate_of':
+            return store.duplicates.get(index)
+        if key == 'warning':
+            return store.warnings.get(index)
+        if key == 'coverage_interval':
+            return store.intervals.get(index)
+        if key == 'dpi':
+            return store.page_dpi[index]
+        raise KeyError(key)
+
+
+class ResultRow:
+    """Fila de una ResultView con la interfaz de diccionario de PageResult.to_dict()."""
+    __slots__ = ("_view", "_index")
+
+    def __init__(self, view, index):
+        self._view = view
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._view.field(self._index, key)
+
+    def get(self, key, default=None):
+        try:
+            return self._view.field(self._index, key)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return RESULT_FIELDS
+
+    def to_dict(self):
+        return {key: self[key] for key in RESULT_FIELDS}
@@ -126,7 +126,7 @@ def get_stylesheet(theme):
         padding: 2px;
     }}
     
-    QTextEdit, QTableWidget, QLineEdit {{
+    QTextEdit, QTableView, QLineEdit {{
         background-color: {colors['color_panel']};
         border: 1px solid {colors['color_border']};
         border-radius: 6px;
@@ -149,12 +149,12 @@ def get_stylesheet(theme):
         font-size: 13px;
     }}
     
-    QTableWidget::item {{
+    QTableView::item {{
         padding: 6px;
         border-bottom: 1px solid {colors['table_border']};
     }}
     
-    QTableWidget {{
+    QTableView {{
         gridline-color: {colors['table_border']};
     }}
     """
@@ -0,0 +1,269 @@
+# table_models.py - modelos de tabla virtuales para resultados y cotizaciones
+import re
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+# Filtro por costo escrito en la caja de búsqueda: ">10000", "<= 5000", ...
+_COST_FILTER = re.compile(r"^\s*(<=|>=|<|>|=)\s*\$?\s*([\d.,]+)\s*$")
+_COST_COMPARISONS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "=": lambda a, b: a == b,
+}
+
+# Roles en constantes: el acceso a Qt.<Rol> en PySide6 es lento y data() se llama por celda
+_DISPLAY_ROLE = Qt.DisplayRole
+_ALIGNMENT_ROLE = Qt.TextAlignmentRole
+_TOOLTIP_ROLE = Qt.ToolTipRole
+_RIGHT_ALIGNMENT = int(Qt.AlignRight | Qt.AlignVCenter)
+
+
+class RecordTableModel(QAbstractTableModel):
+    """
+    Tabla de solo lectura sobre una secuencia de registros.
+
+    La vista solo pide los datos de las filas visibles, así que la memoria y
+    el tiempo de interfaz no crecen con el total de filas. El orden y el
+    filtro se aplican sobre una lista de índices, sin recrear celdas.
+
+    Las subclases definen COLUMNS: (título, texto(registro), clave de orden(registro)).
+    """
+    COLUMNS = ()
+    # Columnas alineadas a la derecha (importes)
+    RIGHT_ALIGNED = ()
+
+    def __init__(self, records=None, parent=None):
+        super().__init__(parent)
+        self._records = records if records is not None else []
+        self._order = list(range(len(self._records)))
+        self._sort_column = None
+        self._sort_order = Qt.AscendingOrder
+        self._filter_text = ""
+
+    # --- Interfaz de QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=_DISPLAY_ROLE):
+        if role == _DISPLAY_ROLE and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=_DISPLAY_ROLE):
+        if not index.isValid():
+            return None
+        record = self._records[self._order[index.row()]]
+        if role == _DISPLAY_ROLE:
+            return self.COLUMNS[index.column()][1](record)
+        if role == _ALIGNMENT_ROLE and index.column() in self.RIGHT_ALIGNED:
+            return _RIGHT_ALIGNMENT
+        if role == _TOOLTIP_ROLE:
+            return self.tooltip(record, index.column())
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Columna negativa: sin orden, las filas quedan en orden de llegada
+        self._sort_column = column if 0 <= column < len(self.COLUMNS) else None
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        if self._sort_column is None:
+            self._order.sort()
+        else:
+            self._apply_sort()
+        self.layoutChanged.emit()
+
+    # --- Registros ---
+
+    def tooltip(self, record, column):
+        return None
+
+    def record_at(self, row):
+        """Registro mostrado en la fila row de la vista."""
+        return self._records[self._order[row]]
+
+    def source_row(self, row):
+        """Índice en la secuencia de registros de la fila row de la vista."""
+        return self._order[row]
+
+    def set_records(self, records):
+        """Reemplaza los registros conservando el orden y el filtro activos."""
+        self.beginResetModel()
+        self._records = records
+        self._rebuild_order()
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._records = []
+        self._order = []
+        self._sort_column = None
+        self.endResetModel()
+
+    def append_records(self, records):
+        """Agrega un lote de registros con una sola notificación a la vista."""
+        if not records:
+            return
+        start = len(self._records)
+        self._records.extend(records)
+        self.records_appended(start)
+
+    def records_appended(self, start):
+        """Avisa que la secuencia de registros creció desde start (p. ej. una ResultView viva)."""
+        new_rows = self._matching_rows(start)
+        if not new_rows:
+            return
+        if self._sort_column is not None:
+            self.layoutAboutToBeChanged.emit()
+            self._order.extend(new_rows)
+            self._apply_sort()
+            self.layoutChanged.emit()
+            return
+        first = len(self._order)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+        self._order.extend(new_rows)
+        self.endInsertRows()
+
+    def remove_source_row(self, source_index):
+        self.beginResetModel()
+        del self._records[source_index]
+        self._rebuild_order()
+        self.endResetModel()
+
+    def set_filter_text(self, text):
+        self.beginResetModel()
+        self._filter_text = text.strip()
+        self._rebuild_order()
+        self.endResetModel()
+
+    def refresh(self):
+        """Avisa a la vista que cambiaron los valores (p. ej. tras recotizar)."""
+        if self._sort_column is not None:
+            self.layoutAboutToBeChanged.emit()
+            self._apply_sort()
+            self.layoutChanged.emit()
+        if self._order:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._order) - 1, len(self.COLUMNS) - 1))
+
+    # --- Orden y filtro ---
+
+    def filter_fields(self, record):
+        """Textos en los que busca el filtro."""
+        return ()
+
+    def filter_cost(self, record):
+        """Importe comparado por los filtros "<", ">", "=", o None si no aplica."""
+        return None
+
+    def _matches(self, record):
+        if not self._filter_text:
+            return True
+        cost_filter = _COST_FILTER.match(self._filter_text)
+        if cost_filter:
+            cost = self.filter_cost(record)
+            limit = float(cost_filter.group(2).replace(",", "").replace(".", ""))
+            return cost is not None and _COST_COMPARISONS[cost_filter.group(1)](cost, limit)
+        needle = self._filter_text.lower()
+        return any(needle in str(field).lower() for field in self.filter_fields(record))
+
+    def _matching_rows(self, start=0):
+        rows = range(start, len(self._records))
+        if not self._filter_text:
+            return list(rows)
+        return [i for i in rows if self._matches(self._records[i])]
+
+    def _rebuild_order(self):
+        self._order = self._matching_rows()
+        if self._sort_column is not None:
+            self._apply_sort()
+
+    def _apply_sort(self):
+        sort_key = self.COLUMNS[self._sort_column][2]
+        records = self._records
+        # sorted es estable: a igual clave se mantiene el orden de llegada
+        self._order.sort(key=lambda i: sort_key(records[i]),
+                         reverse=self._sort_order == Qt.DescendingOrder)
+
+
+def _text_key(value):
+    return (value or "").lower()
+
+
+class ResultsTableModel(RecordTableModel):
+    """Resultados del análisis por página (filas de ResultView o diccionarios de PageResult.to_dict())."""
+    COLUMNS = (
+        ("PDF", lambda r: r['pdf_name'], lambda r: (_text_key(r['pdf_name']), r['page_num'])),
+        ("Página", lambda r: str(r['page_num']), lambda r: r['page_num']),
+        ("Dimensiones", lambda r: r['dimensions'], lambda r: r['dimensions']),
+        ("% Área Sólido", lambda r: f"{r['non_white_percentage']}%", lambda r: r['non_white_percentage']),
+        ("Tipo Pliego", lambda r: r['print_type'], lambda r: _text_key(r['print_type'])),
+        ("Costo", lambda r: f"${r['cost']:,.0f}", lambda r: r['cost']),
+        ("Lienzo", lambda r: r['canvas'], lambda r: _text_key(r['canvas'])),
+        ("Método", lambda r: ResultsTableModel.method_text(r), lambda r: ResultsTableModel.method_text(r)),
+    )
+    RIGHT_ALIGNED = (5,)
+
+    # Texto de la columna "Método" según cómo se midió cada página
+    METHOD_LABELS = {
+        "raster": "Rasterizada",
+        "blank": "⚡ Vacía",
+        "probe": "⚡ Vacía (sonda)",
+        "vector": "⚡ Vectorial",
+        "sampled": "🎯 Estimada",
+        "native": "⚡ Escaneo (imagen)",
+        "gray": "⚡ Escala de grises",
+    }
+
+    @classmethod
+    def method_text(cls, result):
+        if result.get('duplicate_of'):
+            return f"♻️ Igual a {result['duplicate_of']}"
+        method = result.get('method', "raster")
+        return cls.METHOD_LABELS.get(method, method)
+
+    def tooltip(self, record, column):
+        if column != 7:
+            return None
+        if record.get('duplicate_of'):
+            return "Página idéntica a otra ya analizada; se reutilizó su medición"
+        interval = record.get('coverage_interval')
+        if interval:
+            return (f"Cobertura estimada por muestreo: entre {interval[0]:.1f}% y {interval[1]:.1f}%.\n"
+                    "Todo el intervalo da el mismo precio")
+        if record.get('method') == "native":
+            return "Página escaneada: se contó la imagen embebida sin rasterizar la página"
+        if record.get('method') == "gray":
+            return "Cobertura contada en escala de grises; todo su margen da el mismo precio"
+        if record.get('method', "raster") != "raster":
+            return "Página resuelta sin rasterizar a resolución completa"
+        if record.get('dpi'):
+            return f"Rasterizada a {record['dpi']:g} ppp"
+        return None
+
+    def filter_fields(self, record):
+        return (record['pdf_name'], record['print_type'])
+
+    def filter_cost(self, record):
+        return record['cost']
+
+
+class QuotesTableModel(RecordTableModel):
+    """Historial de cotizaciones (diccionarios de quotes_history)."""
+    COLUMNS = (
+        ("PDF", lambda q: q['pdf_names'], lambda q: _text_key(q['pdf_names'])),
+        ("Páginas", lambda q: str(q['total_pages']), lambda q: q['total_pages']),
+        ("Tipo", lambda q: q['print_type'], lambda q: _text_key(q['print_type'])),
+        ("Costo", lambda q: f"${q['total_cost']:,.0f}", lambda q: q['total_cost']),
+    )
+    RIGHT_ALIGNED = (3,)
+
+    def filter_fields(self, record):
+        return (record['pdf_names'], record['print_type'])
+
+    def filter_cost(self, record):
+        return record['total_cost']
@@ -70,48 +70,90 @@ def pixels_to_cm(pixels_value, dpi=DEFAULT_DPI):
     return pixels_value * 2.54 / dpi
 
 
-def _detect_line_type_numpy(arr, black_threshold, white_threshold, min_black_ratio):
-    white_mask = (arr[:, :, 0] >= white_threshold) & (arr[:, :, 1] >= white_threshold) & (arr[:, :, 2] >= white_threshold)
-    non_white_mask = ~white_mask
-    non_white_count = int(non_white_mask.sum())
+def points_to_cm(points_value):
+    return points_value * 2.54 / 72
 
-    if non_white_count == 0:
-        return "color"
 
-    black_mask = (arr[:, :, 0] <= black_threshold) & (arr[:, :, 1] <= black_threshold) & (arr[:, :, 2] <= black_threshold)
-    black_and_nonwhite = black_mask & non_white_mask
-    black_count = int(black_and_nonwhite.sum())
+# Píxeles por bloque de filas en el kernel: los temporales caben en caché
+KERNEL_BLOCK_PIXELS = 1 << 20
 
-    black_ratio = black_count / non_white_count if non_white_count > 0 else 0.0
 
+def _classify_line_type(non_white_count, black_count, min_black_ratio):
+    if non_white_count == 0:
+        return "color"
+    black_ratio = black_count / non_white_count
     return "negra" if black_ratio >= min_black_ratio else "color"
 
 
-def _detect_line_type_pillow(image_pil, black_threshold, white_threshold, min_black_ratio):
-    if not image_pil:
-        return "color"
+def _pixel_counts_numpy(arr, black_threshold, white_threshold):
+    """
+    Cuenta píxeles blancos y negros (no blancos) recorriendo el buffer por
+    bloques de filas. Acepta arreglos alto x ancho x canales (se usan los tres
+    primeros) o alto x ancho en escala de grises, incluso vistas con stride.
+    """
+    h, w = arr.shape[0], arr.shape[1]
+    if h == 0 or w == 0:
+        return 0, 0
+
+    # Un solo canal (escala de grises): mínimo y máximo coinciden con el valor
+    single_channel = arr.ndim == 2 or arr.shape[2] < 3
+    if arr.ndim == 3 and single_channel:
+        arr = arr[:, :, 0]
+
+    rows_per_block = max(1, KERNEL_BLOCK_PIXELS // w)
+    block_rows = min(rows_per_block, h)
+    if not single_channel:
+        channel_min = np.empty((block_rows, w), dtype=arr.dtype)
+        channel_max = np.empty((block_rows, w), dtype=arr.dtype)
+
+    # Un píxel es blanco si su canal mínimo supera el umbral blanco y
+    # negro si su canal máximo no supera el umbral negro.
+    white_count = 0
+    black_count = 0
+    for y0 in range(0, h, rows_per_block):
+        block = arr[y0:y0 + rows_per_block]
+        n = block.shape[0]
+        if single_channel:
+            mn = mx = block
+        else:
+            mn = channel_min[:n]
+            mx = channel_max[:n]
+            np.minimum(block[:, :, 0], block[:, :, 1], out=mn)
+            np.minimum(mn, block[:, :, 2], out=mn)
+            np.maximum(block[:, :, 0], block[:, :, 1], out=mx)
+            np.maximum(mx, block[:, :, 2], out=mx)
+
+        white_count += int(np.count_nonzero(mn >= white_threshold))
+        if black_threshold < white_threshold:
+            black_count += int(np.count_nonzero(mx <= black_threshold))
+        else:
+            black_count += int(np.count_nonzero((mx <= black_threshold) & (mn < white_threshold)))
 
-    rgb = image_pil.convert("RGB")
-    pixels = rgb.getdata()
+    return white_count, black_count
 
-    non_white_count = 0
-    black_count = 0
 
-    for r, g, b in pixels:
+def _pixel_counts_pillow(image_pil, black_threshold, white_threshold):
+    white_count = 0
+    black_count = 0
+    for r, g, b in image_pil.getdata():
         if r >= white_threshold and g >= white_threshold and b >= white_threshold:
-            continue
-        non_white_count += 1
-        if r <= black_threshold and g <= black_threshold and b <= black_threshold:
+            white_count += 1
+        elif r <= black_threshold and g <= black_threshold and b <= black_threshold:
             black_count += 1
+    return white_count, black_count
 
-    if non_white_count == 0:
-        return "color"
 
-    black_ratio = black_count / non_white_count
-    return "negra" if black_ratio >= min_black_ratio else "color"
+def compute_pixel_stats_and_line_type(image_pil, black_threshold=None, white_threshold=None, min_black_ratio=None):
+    """
+    Kernel de una sola pasada: cuenta píxeles blancos, no blancos y negros y
+    clasifica la línea (negra/color) con los umbrales de LINE_DETECTION_CONFIG.
 
+    Acepta una imagen PIL o un arreglo NumPy de píxeles (ver _pixel_counts_numpy),
+    por ejemplo una vista directa del buffer de un Pixmap de PyMuPDF.
 
-def detect_line_type(image_pil, black_threshold=None, white_threshold=None, min_black_ratio=None):
+    Devuelve el mismo diccionario que compute_image_pixel_stats más 'line_type',
+    con resultados idénticos a compute_image_pixel_stats + detect_line_type.
+    """
     if black_threshold is None:
         black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
     if white_threshold is None:
@@ -119,80 +161,90 @@ def detect_line_type(image_pil, black_threshold=None, white_threshold=None, min_
     if min_black_ratio is None:
         min_black_ratio = LINE_DETECTION_CONFIG["min_black_ratio"]
 
-    if image_pil is None:
-        return "color"
-
-    if _HAS_NUMPY:
-        try:
-            rgb_image = image_pil.convert("RGB")
-            arr = np.asarray(rgb_image)
-            return _detect_line_type_numpy(arr, black_threshold, white_threshold, min_black_ratio)
-        except Exception:
-            return _detect_line_type_pillow(image_pil, black_threshold, white_threshold, min_black_ratio)
-    else:
-        return _detect_line_type_pillow(image_pil, black_threshold, white_threshold, min_black_ratio)
-
-
-def compute_image_pixel_stats(image_pil, black_threshold=None, white_threshold=None):
-    if black_threshold is None:
-        black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
-    if white_threshold is None:
-        white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
-
     if image_pil is None:
         return {
             'total_pixels': 0,
             'white_count': 0,
             'non_white_count': 0,
             'black_count': 0,
-            'non_white_percentage': 0.0
+            'non_white_percentage': 0.0,
+            'line_type': "color"
         }
 
-    rgb_image = image_pil.convert("RGB")
+    if _HAS_NUMPY and isinstance(image_pil, np.ndarray):
+        total_pixels = image_pil.shape[0] * image_pil.shape[1]
+        white_count, black_count = _pixel_counts_numpy(image_pil, black_threshold, white_threshold)
+        return _pixel_stats_dict(total_pixels, white_count, black_count, min_black_ratio)
 
+    # RGBA se lee directamente (el alfa se ignora igual que en convert("RGB"))
+    if image_pil.mode not in ("RGB", "RGBA"):
+        image_pil = image_pil.convert("RGB")
+
+    total_pixels = image_pil.width * image_pil.height
+    counts = None
     if _HAS_NUMPY:
         try:
-            arr = np.asarray(rgb_image)
-            h, w = arr.shape[0], arr.shape[1]
-            total_pixels = h * w
-
-            white_mask = (arr[:, :, 0] >= white_threshold) & (arr[:, :, 1] >= white_threshold) & (arr[:, :, 2] >= white_threshold)
-            white_count = int(white_mask.sum())
-
-            non_white_mask = ~white_mask
-            non_white_count = int(non_white_mask.sum())
+            counts = _pixel_counts_numpy(np.asarray(image_pil), black_threshold, white_threshold)
+        except Exception:
+            counts = None
+    if counts is None:
+        if image_pil.mode != "RGB":
+            image_pil = image_pil.convert("RGB")
+        counts = _pixel_counts_pillow(image_pil, black_threshold, white_threshold)
 
-            black_mask = (arr[:, :, 0] <= black_threshold) & (arr[:, :, 1] <= black_threshold) & (arr[:, :, 2] <= black_threshold)
-            black_and_nonwhite = black_mask & non_white_mask
-            black_count = int(black_and_nonwhite.sum())
+    white_count, black_count = counts
+    return _pixel_stats_dict(total_pixels, white_count, black_count, min_black_ratio)
 
-            non_white_percentage = (non_white_count / total_pixels) * 100 if total_pixels > 0 else 0.0
 
-            return {
-                'total_pixels': total_pixels,
-                'white_count': white_count,
-                'non_white_count': non_white_count,
-                'black_count': black_count,
-                'non_white_percentage': non_white_percentage
-            }
-        except Exception:
-            pass
-
-    pixels = rgb_image.getdata()
-    total_pixels = 0
-    white_count = 0
-    non_white_count = 0
-    black_count = 0
+def pixmap_to_array(pix):
+    """
+    Vista NumPy sin copia del buffer de un Pixmap de PyMuPDF (alto x ancho x
+    canales de color).
 
-    for r, g, b in pixels:
-        total_pixels += 1
-        if r >= white_threshold and g >= white_threshold and b >= white_threshold:
-            white_count += 1
-            continue
-        non_white_count += 1
-        if r <= black_threshold and g <= black_threshold and b <= black_threshold:
-            black_count += 1
+    Respeta pix.stride y descarta el canal alfa si existe. La vista solo es
+    válida mientras el Pixmap siga vivo.
+    """
+    buffer = getattr(pix, "samples_mv", None)
+    if buffer is None:
+        buffer = pix.samples
+    arr = np.ndarray(
+        (pix.height, pix.width, pix.n),
+        dtype=np.uint8,
+        buffer=buffer,
+        strides=(pix.stride, pix.n, 1)
+    )
+    color_channels = pix.n - (1 if pix.alpha else 0)
+    return arr[:, :, :color_channels]
+
+
+def count_gray_below(pixels, thresholds):
+    """
+    Píxeles de un render en escala de grises con valor menor que cada umbral
+    de thresholds, en una sola lectura del buffer por bloques de filas.
 
+    Acepta un arreglo NumPy alto x ancho (o alto x ancho x 1, incluso una
+    vista con stride) o una imagen PIL en modo "L".
+    """
+    if _HAS_NUMPY and isinstance(pixels, np.ndarray):
+        if pixels.ndim == 3:
+            pixels = pixels[:, :, 0]
+        h, w = pixels.shape
+        counts = [0] * len(thresholds)
+        if h == 0 or w == 0:
+            return counts
+        rows_per_block = max(1, KERNEL_BLOCK_PIXELS // w)
+        for y0 in range(0, h, rows_per_block):
+            block = pixels[y0:y0 + rows_per_block]
+            for index, threshold in enumerate(thresholds):
+                counts[index] += int(np.count_nonzero(block < threshold))
+        return counts
+
+    histogram = pixels.histogram()
+    return [sum(histogram[:threshold]) for threshold in thresholds]
+
+
+def _pixel_stats_dict(total_pixels, white_count, black_count, min_black_ratio):
+    non_white_count = total_pixels - white_count
     non_white_percentage = (non_white_count / total_pixels) * 100 if total_pixels > 0 else 0.0
 
     return {
@@ -200,10 +252,43 @@ def compute_image_pixel_stats(image_pil, black_threshold=None, white_threshold=N
         'white_count': white_count,
         'non_white_count': non_white_count,
         'black_count': black_count,
-        'non_white_percentage': non_white_percentage
+        'non_white_percentage': non_white_percentage,
+        'line_type': _classify_line_type(non_white_count, black_count, min_black_ratio)
     }
 
 
+def combine_pixel_stats(partials, min_black_ratio=None):
+    """
+    Suma los conteos de varias regiones (bandas, recortes) de una misma página
+    y recalcula porcentaje y tipo de línea sobre el total.
+    """
+    if min_black_ratio is None:
+        min_black_ratio = LINE_DETECTION_CONFIG["min_black_ratio"]
+
+    total_pixels = 0
+    white_count = 0
+    black_count = 0
+    for partial in partials:
+        total_pixels += partial['total_pixels']
+        white_count += partial['white_count']
+        black_count += partial['black_count']
+    return _pixel_stats_dict(total_pixels, white_count, black_count, min_black_ratio)
+
+
+def detect_line_type(image_pil, black_threshold=None, white_threshold=None, min_black_ratio=None):
+    if image_pil is None:
+        return "color"
+
+    stats = compute_pixel_stats_and_line_type(image_pil, black_threshold, white_threshold, min_black_ratio)
+    return stats['line_type']
+
+
+def compute_image_pixel_stats(image_pil, black_threshold=None, white_threshold=None):
+    stats = compute_pixel_stats_and_line_type(image_pil, black_threshold, white_threshold)
+    del stats['line_type']
+    return stats
+
+
 def is_color_image(image: Image.Image, tolerance: int = 10) -> bool:
     """
     Determina si un objeto de imagen PIL es a color o en blanco y negro,
@@ -316,6 +401,15 @@ def coty_calculate_price_logic(print_type_key, non_white_percentage, largo_cm):
     return total_cost
 
 
+# Límites inferiores (%) de los rangos de cobertura de calculate_print_cost;
+# el factor de costo es la cantidad de límites alcanzados / 10
+COVERAGE_BANDS = (6, 15, 25, 35, 45, 55, 65, 75, 85, 95)
+# Rango de cobertura (%) en el que se cobra por tipo de línea (LINE_COSTS)
+LINE_PRICING_MAX_PERCENTAGE = 9
+# Tipos cuyo costo escala con el largo y se redondea a 1000
+LENGTH_SCALED_TYPES = ("pliego", "extra_90", "extra_100", "large_format")
+
+
 def calculate_print_cost(print_type_key, non_white_percentage, canvas_height_cm):
     try:
         data = PRINT_COSTS[print_type_key]
@@ -353,10 +447,7 @@ def calculate_print_cost(print_type_key, non_white_percentage, canvas_height_cm)
         ref_height = data["dimensions_cm"][1]
         if ref_height > 0:
             largo_factor = canvas_height_cm / ref_height
-    
-    print(largo_factor)
-    
-    
+
     total_cost = data["base_cost"] + (data["full_cost"] - data["base_cost"]) * factor
     total_cost *= largo_factor
 
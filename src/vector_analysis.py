@@ -0,0 +1,164 @@
+# vector_analysis.py - preanálisis vectorial de páginas PDF (sin rasterizar)
+from dataclasses import dataclass
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from utils import DEFAULT_DPI, LINE_DETECTION_CONFIG
+
+# Margen de antialiasing (en píxeles) alrededor de cada trazo
+ANTIALIAS_MARGIN_PX = 1.42
+# Factor para cubrir uniones en punta (miter) y remates de línea
+JOIN_AREA_FACTOR = 3
+
+
+@dataclass
+class PageContent:
+    """Clasificación del contenido de una página a partir de sus operaciones de dibujo."""
+    kind: str  # "blank", "lines", "images" (solo imágenes) o "mixed"
+    stroke_count: int = 0
+    # Cota superior del % de píxeles no blancos al rasterizar (solo para "lines")
+    max_coverage: float = 100.0
+    # Algún trazo tiene un color que puede quedar por debajo del umbral de negro
+    black_capable: bool = True
+    # Unión (en coordenadas de page.rect) de lo que deja tinta; fuera de ella
+    # la página es blanca. None si no se puede acotar (anotaciones, PyMuPDF antiguo)
+    ink_rect: Optional[fitz.Rect] = None
+
+
+def _has_annotations(page):
+    return page.first_annot is not None or page.first_widget is not None
+
+
+def _has_content_streams(page):
+    """False si la página no tiene flujos de contenido o todos están vacíos."""
+    doc = page.parent
+    for xref in page.get_contents():
+        if doc.xref_stream(xref).strip():
+            return True
+    return False
+
+
+# Operaciones de get_bboxlog que solo dibujan imágenes (p. ej. páginas escaneadas)
+IMAGE_OPERATIONS = {"fill-image", "fill-imgmask"}
+
+
+def _inking_operations(page):
+    """
+    Tipos de operaciones que dejan tinta en la página según get_bboxlog
+    ('fill-path', 'stroke-path', 'fill-text', 'fill-image', ...) y la unión
+    de sus rectángulos (None si no hay get_bboxlog). Los recortes y el texto
+    invisible no pintan.
+    """
+    try:
+        bboxlog = page.get_bboxlog()
+    except AttributeError:
+        # PyMuPDF antiguo: se aproxima con los metadatos de texto y dibujos
+        kinds = set()
+        for block in page.get_text("blocks"):
+            kinds.add("fill-image" if block[6] == 1 else "fill-text")
+        for drawing in page.get_drawings():
+            if "f" in drawing["type"]:
+                kinds.add("fill-path")
+            if "s" in drawing["type"]:
+                kinds.add("stroke-path")
+        return kinds, None
+    kinds = set()
+    ink_rect = fitz.Rect()
+    for kind, rect in bboxlog:
+        if kind.startswith(("fill-", "stroke-")):
+            kinds.add(kind)
+            ink_rect |= rect
+    # get_bboxlog da coordenadas de la página sin rotar
+    if page.rotation and not ink_rect.is_empty:
+        ink_rect = ink_rect * page.rotation_matrix
+    return kinds, ink_rect
+
+
+def _item_length(item):
+    """Longitud (en puntos) de un elemento de trazado; para curvas, la del polígono de control."""
+    op = item[0]
+    if op == "l":
+        return abs(item[2] - item[1])
+    if op == "c":
+        return abs(item[2] - item[1]) + abs(item[3] - item[2]) + abs(item[4] - item[3])
+    if op == "re":
+        rect = item[1]
+        return 2 * (abs(rect.width) + abs(rect.height))
+    if op == "qu":
+        quad = item[1]
+        return (abs(quad.ul - quad.ur) + abs(quad.ur - quad.lr)
+                + abs(quad.lr - quad.ll) + abs(quad.ll - quad.ul))
+    return 0.0
+
+
+def _is_black_capable(color, black_threshold):
+    # Mezclado con el blanco del papel un canal solo puede aclararse: si algún
+    # canal del color supera el umbral, el trazo no produce píxeles negros.
+    if not color:
+        return True
+    return all(channel * 255 <= black_threshold for channel in color)
+
+
+def estimate_stroke_coverage(drawings, zoom, total_pixels, black_threshold=None):
+    """
+    Cota superior del porcentaje de píxeles no blancos de trazos sin relleno.
+
+    Cada trazo ocupa como máximo su longitud por su grosor más el margen de
+    antialiasing en ambos lados, más un área fija por unión o remate. Los
+    solapamientos y guiones solo pueden reducir la cobertura real.
+
+    Returns:
+        (porcentaje máximo, algún trazo puede producir píxeles negros)
+    """
+    if black_threshold is None:
+        black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
+
+    ink_pixels = 0.0
+    black_capable = False
+    for drawing in drawings:
+        # Grosor 0 es una línea fina de un píxel
+        width_px = max((drawing.get("width") or 0) * zoom, 1.0)
+        reach_px = width_px + 2 * ANTIALIAS_MARGIN_PX
+        for item in drawing["items"]:
+            length_px = _item_length(item) * zoom
+            ink_pixels += (length_px + reach_px) * reach_px + JOIN_AREA_FACTOR * reach_px * reach_px
+        if _is_black_capable(drawing.get("color"), black_threshold):
+            black_capable = True
+
+    if total_pixels <= 0:
+        return 0.0, black_capable
+    return min(100.0, ink_pixels / total_pixels * 100), black_capable
+
+
+def classify_page(page, dpi=DEFAULT_DPI):
+    """
+    Clasifica una página como vacía ("blank"), solo trazos ("lines"), solo
+    imágenes ("images") o mixta ("mixed") usando sus flujos de contenido,
+    get_bboxlog y get_drawings, sin rasterizar.
+    """
+    if _has_annotations(page):
+        return PageContent(kind="mixed")
+
+    if not _has_content_streams(page):
+        return PageContent(kind="blank", max_coverage=0.0, black_capable=False, ink_rect=fitz.Rect())
+    kinds, ink_rect = _inking_operations(page)
+    if not kinds:
+        return PageContent(kind="blank", max_coverage=0.0, black_capable=False, ink_rect=fitz.Rect())
+    if kinds <= IMAGE_OPERATIONS:
+        return PageContent(kind="images", ink_rect=ink_rect)
+    if kinds != {"stroke-path"}:
+        return PageContent(kind="mixed", ink_rect=ink_rect)
+
+    drawings = [d for d in page.get_drawings() if d["type"] == "s"]
+    zoom = dpi / 72.0
+    pixel_rect = page.rect.transform(fitz.Matrix(zoom, zoom)).irect
+    max_coverage, black_capable = estimate_stroke_coverage(
+        drawings, zoom, pixel_rect.width * pixel_rect.height)
+    return PageContent(
+        kind="lines",
+        stroke_count=len(drawings),
+        max_coverage=max_coverage,
+        black_capable=black_capable,
+        ink_rect=ink_rect
+    )
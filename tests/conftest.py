@@ -0,0 +1,40 @@
+# conftest.py - acceso a los módulos de src/ y PDFs sintéticos para las pruebas
+import os
+import sys
+import warnings
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# PyMuPDF avisa de APIs obsoletas al importarse; no afecta a las pruebas
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+from pdf_samples import BASELINE_CONFIG, measure_pdf, write_pdf, write_sample_pdf  # noqa: E402
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Crea PDFs sintéticos (pdf_samples.write_pdf) en el directorio temporal de la prueba."""
+    def make(name, pages):
+        return write_pdf(tmp_path / name, pages)
+    return make
+
+
+@pytest.fixture(scope="session")
+def sample_pdf(tmp_path_factory):
+    """PDF de pdf_samples.write_sample_pdf, compartido por todas las pruebas."""
+    return write_sample_pdf(tmp_path_factory.mktemp("muestras") / "muestras.pdf")
+
+
+@pytest.fixture(scope="session")
+def baseline_stats(sample_pdf):
+    """Mediciones de sample_pdf sin vías rápidas (BASELINE_CONFIG): la referencia de precio."""
+    return measure_pdf(sample_pdf, BASELINE_CONFIG)
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    """QCoreApplication para los modelos y trabajadores de Qt (sin ventanas)."""
+    from PySide6.QtCore import QCoreApplication
+    return QCoreApplication.instance() or QCoreApplication([])
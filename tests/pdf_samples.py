@@ -0,0 +1,127 @@
+# pdf_samples.py - PDFs sintéticos con cobertura conocida y precios de referencia para las pruebas
+import random
+
+import fitz  # PyMuPDF
+
+from analysis_engine import EXACT_CONFIG, measure_page, price_page
+from utils import PRINT_COSTS
+
+POINTS_PER_CM = 72 / 2.54
+
+
+def cm_to_points(cm_value):
+    return cm_value * POINTS_PER_CM
+
+
+def write_pdf(path, pages):
+    """
+    Escribe un PDF con una página por entrada de pages: (ancho_cm, alto_cm,
+    cobertura) con cobertura la fracción de la altura pintada con un
+    rectángulo rojo (0 deja la página en blanco). Devuelve path.
+    """
+    doc = fitz.open()
+    for width_cm, height_cm, coverage in pages:
+        page = doc.new_page(width=cm_to_points(width_cm), height=cm_to_points(height_cm))
+        if coverage:
+            rect = fitz.Rect(0, 0, page.rect.width, page.rect.height * coverage)
+            page.draw_rect(rect, color=None, fill=(1, 0, 0))
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+# Lienzos con que se compara el precio: tamaño original y cada entrada de PRINT_COSTS
+CANVASES = (None, *PRINT_COSTS)
+# Resolución de las pruebas sobre write_sample_pdf (sus barras negras están alineadas a ella)
+SAMPLE_DPI = 100
+
+# Todas las vías rápidas desactivadas (EXACT_CONFIG): cada página se
+# rasteriza completa y se cuenta en color. Las pruebas comparan cada vía
+# rápida con esta referencia
+BASELINE_CONFIG = dict(EXACT_CONFIG)
+
+# Páginas de write_sample_pdf, en orden
+SAMPLE_PAGES = (
+    "cobertura",        # rectángulo rojo en el 30% superior
+    "barras_negras",    # barras negras de poca cobertura (rango de línea, negra)
+    "blanca",
+    "trazos",           # líneas finas de color (planos)
+    "amarillo_palido",  # relleno (255, 255, 240) y un rectángulo azul
+    "escaneo",          # una imagen en grises a toda la página
+    "escaneo_blanco",   # una imagen blanca a toda la página
+    "foto",             # imagen RGB en una esquina
+    "cobertura_repetida",
+)
+
+
+def _noise_pixmap(colorspace, width, height, seed, low=0, high=256):
+    rng = random.Random(seed)
+    samples = bytes(rng.randrange(low, high) for _ in range(width * height * colorspace.n))
+    return fitz.Pixmap(colorspace, width, height, samples, False)
+
+
+def write_sample_pdf(path, width_cm=21, height_cm=29.7):
+    """
+    Escribe un PDF con una página de cada tipo de SAMPLE_PAGES, pensado para
+    que cada vía rápida de analysis_engine tenga al menos una página que la
+    use. Devuelve path.
+    """
+    doc = fitz.open()
+    width, height = cm_to_points(width_cm), cm_to_points(height_cm)
+
+    def new_page():
+        return doc.new_page(width=width, height=height)
+
+    def coverage_page():
+        new_page().draw_rect(fitz.Rect(0, 0, width, height * 0.3), color=None, fill=(1, 0, 0))
+
+    coverage_page()
+
+    page = new_page()
+    # Bordes alineados a la rejilla de 100 dpi (0.72 pt): sin antialiasing, línea negra
+    for bar in range(4):
+        page.draw_rect(fitz.Rect(72, 72 + bar * 144, 216, 108 + bar * 144), color=None, fill=(0, 0, 0))
+
+    new_page()
+
+    page = new_page()
+    for step in range(0, int(width), 120):
+        page.draw_line((step, 0), (step, height), color=(0, 0.4, 0.8), width=0.5)
+    page.draw_line((0, height / 2), (width, height / 2), color=(0.8, 0.1, 0.1), width=0.5)
+
+    page = new_page()
+    page.draw_rect(fitz.Rect(0, 0, width, height * 0.4), color=None, fill=(1, 1, 240 / 255))
+    page.draw_rect(fitz.Rect(0, height * 0.6, width, height * 0.8), color=None, fill=(0, 0, 0.6))
+
+    new_page().insert_image(fitz.Rect(0, 0, width, height), pixmap=_noise_pixmap(fitz.csGRAY, 60, 85, 1, 96))
+    new_page().insert_image(fitz.Rect(0, 0, width, height), pixmap=_noise_pixmap(fitz.csGRAY, 60, 85, 2, 255))
+    new_page().insert_image(fitz.Rect(width / 2, 0, width, height / 3), pixmap=_noise_pixmap(fitz.csRGB, 40, 40, 3))
+
+    coverage_page()
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def write_scan_pdf(path, width_cm, height_cm, image_size, seed=0):
+    """
+    Escribe un escaneo de una página: una imagen en grises de ruido de
+    image_size (ancho, alto) píxeles que ocupa toda la página. Devuelve path.
+    """
+    doc = fitz.open()
+    page = doc.new_page(width=cm_to_points(width_cm), height=cm_to_points(height_cm))
+    page.insert_image(page.rect, pixmap=_noise_pixmap(fitz.csGRAY, *image_size, seed))
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def measure_pdf(path, config, dpi=SAMPLE_DPI):
+    """PageStats de cada página de path medidas con measure_page."""
+    with fitz.open(str(path)) as doc:
+        return [measure_page(page, dpi=dpi, config=config) for page in doc]
+
+
+def canvas_costs(stats):
+    """Costo de una medición con cada lienzo de CANVASES."""
+    return tuple(price_page(stats, "", 1, canvas=canvas).cost for canvas in CANVASES)
@@ -0,0 +1,91 @@
+import itertools
+import json
+import os
+
+import pytest
+
+import analysis_cache
+from analysis_cache import ROW_OVERHEAD_BYTES, AnalysisCache
+from analysis_engine import PageError, analyze_documents
+from pdf_samples import BASELINE_CONFIG, SAMPLE_DPI, SAMPLE_PAGES, canvas_costs, write_pdf
+
+
+def _analyze(paths, cache, workers=1):
+    outcomes = list(analyze_documents(paths, dpi=SAMPLE_DPI, workers=workers, config=BASELINE_CONFIG, cache=cache))
+    assert not [outcome for outcome in outcomes if isinstance(outcome, PageError)]
+    return outcomes
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cached_pages_keep_baseline_prices(tmp_path, sample_pdf, baseline_stats, workers):
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"))
+    try:
+        first = _analyze([sample_pdf], cache, workers)
+        assert cache.stats()['entries'] == len(SAMPLE_PAGES)
+        hits = cache.hits
+        second = _analyze([sample_pdf], cache, workers)
+        assert cache.hits - hits == len(SAMPLE_PAGES)
+    finally:
+        cache.close()
+
+    for name, expected, measured, cached in zip(SAMPLE_PAGES, baseline_stats, first, second):
+        assert canvas_costs(measured.stats) == canvas_costs(expected), name
+        assert canvas_costs(cached.stats) == canvas_costs(expected), name
+        assert cached.to_dict() == measured.to_dict(), name
+
+
+def test_changed_content_is_measured_again(tmp_path):
+    path = write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.3)])
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"))
+    try:
+        [first] = _analyze([path], cache)
+        os.remove(path)
+        write_pdf(path, [(21, 29.7, 0.6)])
+        [second] = _analyze([path], cache)
+        assert cache.hits == 0
+    finally:
+        cache.close()
+    assert (first.non_white_percentage, second.non_white_percentage) == (30, 60)
+
+
+def test_measurement_options_are_part_of_the_key(tmp_path, sample_pdf, baseline_stats):
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"))
+    budget = dict(BASELINE_CONFIG, pixel_budget=200_000, min_dpi=30, line_min_dpi=SAMPLE_DPI)
+    try:
+        reduced = list(analyze_documents([sample_pdf], dpi=SAMPLE_DPI, config=budget, cache=cache))
+        assert min(result.stats.dpi for result in reduced) < SAMPLE_DPI
+        # Sin presupuesto de píxeles no se reutilizan las mediciones a menos dpi
+        full = _analyze([sample_pdf], cache)
+        assert cache.hits == 0
+        assert all(result.stats.dpi == SAMPLE_DPI for result in full)
+        assert [canvas_costs(result.stats) for result in full] == [canvas_costs(s) for s in baseline_stats]
+
+        # Las mediciones en gris no se guardan
+        entries = cache.stats()['entries']
+        gray = list(analyze_documents([sample_pdf], dpi=SAMPLE_DPI, config=dict(BASELINE_CONFIG, gray_first=True),
+                                      cache=cache))
+        assert "gray" in {result.method for result in gray}
+        assert cache.stats()['entries'] == entries + sum(result.method == "raster" for result in gray)
+    finally:
+        cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # Reloj que avanza en cada llamada: el orden de acceso no depende de la resolución de time.time()
+    clock = itertools.count(1000)
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: next(clock))
+    stats = {'non_white_percentage': 30}
+    entry_bytes = len(json.dumps(stats)) + ROW_OVERHEAD_BYTES
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=4 * entry_bytes)
+    try:
+        for page_index in range(4):
+            cache.put("abc", page_index, SAMPLE_DPI, stats)
+        assert cache.stats()['entries'] == 4
+        # Leer la página 0 la vuelve la más reciente: las que salen son la 1 y la 2
+        assert cache.get("abc", 0, SAMPLE_DPI) == stats
+        cache.put("abc", 4, SAMPLE_DPI, stats)
+        cache.put("abc", 5, SAMPLE_DPI, stats)
+        assert sorted(cache.get_document("abc", SAMPLE_DPI)) == [0, 3, 4, 5]
+        assert cache.stats()['size_bytes'] == 4 * entry_bytes <= cache.max_bytes
+    finally:
+        cache.close()
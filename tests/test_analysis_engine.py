@@ -0,0 +1,253 @@
+import shutil
+from dataclasses import replace
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytest
+
+import analysis_engine
+from analysis_engine import (
+    ANALYSIS_CONFIG, PageError, _render_bands, analyze_documents, measure_page, page_pixel_rect, pixmap_to_image,
+    probe_is_blank
+)
+from coverage_sampling import settles_price
+from metrics import PipelineMetrics
+from pdf_samples import BASELINE_CONFIG, SAMPLE_DPI, SAMPLE_PAGES, canvas_costs, measure_pdf, write_scan_pdf
+from resolution_policy import budget_dpi
+from utils import compute_pixel_stats_and_line_type, pixmap_to_array
+
+
+def _methods(measured):
+    return {name: stats.method for name, stats in zip(SAMPLE_PAGES, measured)}
+
+
+def _coverage(stats):
+    """Cobertura sin redondear (%)."""
+    return stats.non_white_count / stats.total_pixels * 100
+
+
+def _rasterized(measured):
+    """Bytes rasterizados por página (necesita collect_metrics)."""
+    return {name: stats.timings.get("rasterized_bytes", 0) for name, stats in zip(SAMPLE_PAGES, measured)}
+
+
+@pytest.mark.parametrize("alpha", [False, True])
+@pytest.mark.parametrize("colorspace", [fitz.csRGB, fitz.csGRAY])
+def test_pixmap_view_matches_samples(make_pdf, alpha, colorspace):
+    # Ancho impar: en gris el stride no coincide con ancho x canales en todos los casos
+    path = make_pdf("plano.pdf", [(7.1, 5, 0.4)])
+    with fitz.open(path) as doc:
+        pix = doc.load_page(0).get_pixmap(matrix=fitz.Matrix(0.37, 0.37), colorspace=colorspace, alpha=alpha)
+        samples = np.frombuffer(pix.samples, dtype=np.uint8)
+        expected = samples.reshape(pix.height, pix.stride)[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+        view = pixmap_to_array(pix)
+        assert np.array_equal(view, expected[:, :, :colorspace.n])
+        # Sin copia: la vista lee el buffer del Pixmap
+        assert not view.flags.owndata
+        assert np.shares_memory(view, np.frombuffer(pix.samples_mv, dtype=np.uint8))
+        pix.set_pixel(pix.width - 1, pix.height - 1, (7,) * colorspace.n + ((255,) if alpha else ()))
+        assert view[-1, -1].tolist() == [7] * colorspace.n
+        if colorspace is fitz.csRGB:
+            assert compute_pixel_stats_and_line_type(view) == compute_pixel_stats_and_line_type(pixmap_to_image(pix))
+
+
+def test_measure_page_without_numpy_matches(make_pdf, monkeypatch):
+    path = make_pdf("plano.pdf", [(21, 29.7, 0.3)])
+    with fitz.open(path) as doc:
+        page = doc.load_page(0)
+        expected = measure_page(page, dpi=72)
+        monkeypatch.setattr(analysis_engine, "_HAS_NUMPY", False)
+        assert measure_page(page, dpi=72) == expected
+
+
+def test_band_rendering_matches_single_render(sample_pdf, baseline_stats):
+    # 64 KB: unas 26 filas por banda a 100 dpi
+    budget = 64 * 1024
+    with fitz.open(sample_pdf) as doc:
+        page = doc.load_page(0)
+        mat = fitz.Matrix(SAMPLE_DPI / 72, SAMPLE_DPI / 72)
+        pixel_rect = page_pixel_rect(page, mat)
+        bands = [(fitz.IRect(band.irect), len(band.samples_mv))
+                 for band in _render_bands(page, mat, pixel_rect, budget)]
+    # Memoria acotada: ninguna banda supera el presupuesto y juntas cubren la página sin huecos
+    assert len(bands) == -(-pixel_rect.height // (budget // (pixel_rect.width * 3)))
+    assert max(size for _, size in bands) <= budget
+    assert [rect.y0 for rect, _ in bands] == [pixel_rect.y0] + [rect.y1 for rect, _ in bands[:-1]]
+    assert bands[-1][0].y1 == pixel_rect.y1
+    assert all((rect.x0, rect.x1) == (pixel_rect.x0, pixel_rect.x1) for rect, _ in bands)
+
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, band_budget_bytes=budget))
+    assert [(s.non_white_percentage, s.line_type) for s in measured] == \
+        [(s.non_white_percentage, s.line_type) for s in baseline_stats]
+
+
+def test_vector_fast_path_bounds_coverage_without_rendering(sample_pdf, baseline_stats):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, vector_fast_path=True, collect_metrics=True))
+    pages = dict(zip(SAMPLE_PAGES, measured))
+    exact = dict(zip(SAMPLE_PAGES, baseline_stats))
+    assert {name: stats.method for name, stats in pages.items() if stats.method != "raster"} == \
+        {"blanca": "blank", "trazos": "vector"}
+    assert _rasterized(measured)["blanca"] == _rasterized(measured)["trazos"] == 0
+    assert (pages["blanca"].non_white_count, pages["blanca"].white_count) == (0, exact["blanca"].total_pixels)
+    # Cota superior de la cobertura de los trazos, por debajo de vector_max_coverage
+    vector = pages["trazos"]
+    assert _coverage(exact["trazos"]) <= _coverage(vector) < ANALYSIS_CONFIG["vector_max_coverage"]
+    assert (vector.line_type, vector.total_pixels) == ("color", exact["trazos"].total_pixels)
+
+
+def test_blank_probe_skips_only_blank_scans(sample_pdf):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, vector_fast_path=True, blank_probe_dpi=18,
+                                            collect_metrics=True))
+    pages = dict(zip(SAMPLE_PAGES, measured))
+    assert (pages["escaneo_blanco"].method, pages["escaneo_blanco"].non_white_count) == ("probe", 0)
+    assert _rasterized(measured)["escaneo_blanco"] == 0
+    # Un escaneo con tinta, aunque sea poca, no pasa por la sonda
+    assert pages["escaneo"].method == pages["foto"].method == "raster"
+    with fitz.open(sample_pdf) as doc:
+        assert probe_is_blank(doc.load_page(SAMPLE_PAGES.index("escaneo_blanco")), 18)
+        assert not probe_is_blank(doc.load_page(SAMPLE_PAGES.index("escaneo")), 18)
+    # blank_probe_dpi=0 desactiva la sonda
+    disabled = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, vector_fast_path=True))
+    assert _methods(disabled)["escaneo_blanco"] == "raster"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_duplicate_pages_are_measured_once(tmp_path, sample_pdf, workers):
+    copy = shutil.copy(sample_pdf, tmp_path / "copia.pdf")
+    config = dict(BASELINE_CONFIG, deduplicate_pages=True)
+    metrics = PipelineMetrics()
+    outcomes = list(analyze_documents([sample_pdf, copy], dpi=SAMPLE_DPI, workers=workers, config=config,
+                                      metrics=metrics))
+    assert not [outcome for outcome in outcomes if isinstance(outcome, PageError)]
+    original, repeated = outcomes[:len(SAMPLE_PAGES)], outcomes[len(SAMPLE_PAGES):]
+
+    duplicates = {name: result.duplicate_of for name, result in zip(SAMPLE_PAGES, original)}
+    assert {name: label for name, label in duplicates.items() if label} == {"cobertura_repetida": "muestras.pdf p. 1"}
+    # Todas las páginas de la copia reutilizan la primera medición de su contenido
+    assert [result.duplicate_of for result in repeated] == \
+        [duplicates[name] or f"muestras.pdf p. {result.page_num}" for name, result in zip(SAMPLE_PAGES, original)]
+    for first, again in zip(original, repeated):
+        assert replace(again.stats, duplicate_of=None) == replace(first.stats, duplicate_of=None)
+    # Solo se rasterizan las páginas distintas del original
+    assert metrics.counters['measured_pages'] == len(SAMPLE_PAGES) - 1
+    assert metrics.counters['reused_pages'] == len(SAMPLE_PAGES) + 1
+    assert metrics.calls["render"] == len(SAMPLE_PAGES) - 1
+
+
+def test_coverage_estimate_interval_contains_exact_coverage(sample_pdf, baseline_stats):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, coverage_estimate=True, collect_metrics=True))
+    methods = _methods(measured)
+    assert methods["cobertura"] == methods["escaneo"] == methods["foto"] == "sampled"
+    # En el rango de línea (0-9%) el muestreo no decide el precio: se cuenta exacto
+    assert methods["barras_negras"] == methods["trazos"] == "raster"
+    rasterized = _rasterized(measured)
+    for name, exact, stats in zip(SAMPLE_PAGES, baseline_stats, measured):
+        assert (stats.coverage_interval is not None) == (stats.method == "sampled"), name
+        if stats.method == "sampled":
+            low, high = stats.coverage_interval
+            # El intervalo se guarda redondeado a centésimas
+            assert low - 0.005 <= _coverage(exact) <= high + 0.005, name
+            assert settles_price(low, high), name
+            # Solo franjas de la página, nunca la página completa
+            assert rasterized[name] == 0, name
+
+
+def test_pixel_budget_lowers_dpi_of_image_pages(sample_pdf, baseline_stats):
+    budget = 200_000
+    config = dict(BASELINE_CONFIG, pixel_budget=budget, min_dpi=30, line_min_dpi=SAMPLE_DPI)
+    with fitz.open(sample_pdf) as doc:
+        page_dpi = budget_dpi(doc.load_page(0).rect, budget)
+    assert 30 < page_dpi < SAMPLE_DPI
+    image_pages = {"blanca", "escaneo", "escaneo_blanco", "foto"}
+
+    measured = measure_pdf(sample_pdf, config)
+    # Las páginas sin trazos ni texto caben en el presupuesto; las demás no bajan de line_min_dpi
+    assert {name: stats.dpi for name, stats in zip(SAMPLE_PAGES, measured)} == \
+        {name: page_dpi if name in image_pages else SAMPLE_DPI for name in SAMPLE_PAGES}
+    for name, exact, stats in zip(SAMPLE_PAGES, baseline_stats, measured):
+        if name in image_pages:
+            assert stats.total_pixels == stats.width_px * stats.height_px <= budget, name
+        # El tamaño de la página, del que sale el precio, no depende del dpi
+        assert (stats.width_pt, stats.height_pt) == (exact.width_pt, exact.height_pt), name
+
+    # min_dpi es el piso; sin presupuesto todas las páginas van al dpi del análisis
+    floored = measure_pdf(sample_pdf, dict(config, min_dpi=60))
+    assert {stats.dpi for name, stats in zip(SAMPLE_PAGES, floored) if name in image_pages} == {60}
+    assert {stats.dpi for stats in measure_pdf(sample_pdf, dict(config, pixel_budget=None))} == {SAMPLE_DPI}
+
+
+def test_gray_first_renders_one_byte_per_pixel(sample_pdf, baseline_stats):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, gray_first=True, collect_metrics=True))
+    pages = dict(zip(SAMPLE_PAGES, measured))
+    methods = _methods(measured)
+    rasterized = _rasterized(measured)
+    full_page = baseline_stats[0].width_px * baseline_stats[0].height_px
+    # Medidas solo en gris: un byte por píxel y sin tipo de línea
+    assert methods["cobertura"] == methods["escaneo"] == methods["foto"] == "gray"
+    for name, exact in zip(SAMPLE_PAGES, baseline_stats):
+        if methods[name] == "gray":
+            assert rasterized[name] == full_page, name
+            assert pages[name].line_type is None and pages[name].black_count == 0, name
+            assert pages[name].non_white_percentage == exact.non_white_percentage, name
+    # El amarillo pálido (gris 254) deja el intervalo sobre un límite de precio y
+    # las barras negras quedan en el rango de línea: se cuentan también en color
+    assert (methods["amarillo_palido"], pages["amarillo_palido"].line_type) == ("raster", "color")
+    assert (methods["barras_negras"], pages["barras_negras"].line_type) == ("raster", "negra")
+    assert rasterized["amarillo_palido"] == rasterized["barras_negras"] == 4 * full_page
+    # Las páginas de solo trazos van directamente a color
+    assert (methods["trazos"], rasterized["trazos"]) == ("raster", 3 * full_page)
+    # Desactivada por defecto
+    assert "gray" not in _methods(measure_pdf(sample_pdf, {}))
+
+
+def test_crop_to_content_renders_only_inked_region(sample_pdf, baseline_stats):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, crop_to_content=True, collect_metrics=True))
+    # Lo que queda fuera del recorte se cuenta como blanco: los conteos no cambian
+    assert [(s.non_white_count, s.black_count, s.total_pixels) for s in measured] == \
+        [(s.non_white_count, s.black_count, s.total_pixels) for s in baseline_stats]
+    rasterized = _rasterized(measured)
+    width, height = baseline_stats[0].width_px, baseline_stats[0].height_px
+    margin = ANALYSIS_CONFIG["crop_margin_px"]
+    # Rectángulo rojo en el 30% superior: solo esas filas, más el margen
+    assert rasterized["cobertura"] <= 3 * width * (round(0.3 * height) + margin + 1)
+    # Foto en una esquina: menos de la mitad de la página
+    assert rasterized["foto"] < 3 * width * height / 2
+    assert rasterized["blanca"] == 0
+
+
+def test_native_images_count_scans_without_rendering(sample_pdf, baseline_stats):
+    measured = measure_pdf(sample_pdf, dict(BASELINE_CONFIG, native_images=True, collect_metrics=True))
+    assert {name for name, method in _methods(measured).items() if method == "native"} == {"escaneo", "foto"}
+    for name, exact, stats in zip(SAMPLE_PAGES, baseline_stats, measured):
+        if stats.method == "native":
+            # Se decodifica la imagen embebida en lugar de rasterizar la página
+            assert "rasterized_bytes" not in stats.timings and stats.timings["convert"] > 0, name
+            assert stats.line_type is None and stats.total_pixels == exact.total_pixels, name
+            # El centro del intervalo puede diferir en un punto del render
+            assert abs(_coverage(stats) - _coverage(exact)) <= 1, name
+
+
+def test_downsampled_scan_is_counted_natively(tmp_path):
+    # 300 x 420 píxeles en 5 x 7 cm: a 100 dpi MuPDF reduce la imagen (media móvil)
+    path = write_scan_pdf(tmp_path / "escaneo.pdf", 5, 7, (300, 420), seed=4)
+    [expected] = measure_pdf(path, BASELINE_CONFIG)
+    [stats] = measure_pdf(path, dict(BASELINE_CONFIG, native_images=True, collect_metrics=True))
+    assert stats.method == "native" and "rasterized_bytes" not in stats.timings
+    assert (stats.width_px, stats.height_px) == (expected.width_px, expected.height_px)
+    assert abs(_coverage(stats) - _coverage(expected)) <= 1
+
+
+# Aproximaciones que hay que pedir (ver ANALYSIS_CONFIG)
+OPT_IN_APPROXIMATIONS = {"gray_first": True, "native_images": True, "coverage_estimate": True}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("config", [None, OPT_IN_APPROXIMATIONS], ids=["defecto", "aproximaciones"])
+def test_all_fast_paths_keep_baseline_prices(sample_pdf, baseline_stats, workers, config):
+    # ANALYSIS_CONFIG: todas las vías rápidas a la vez, con y sin las aproximaciones opcionales
+    outcomes = list(analyze_documents([sample_pdf], dpi=SAMPLE_DPI, workers=workers, config=config))
+    assert not [outcome for outcome in outcomes if isinstance(outcome, PageError)]
+    assert len(outcomes) == len(baseline_stats)
+    for name, expected, result in zip(SAMPLE_PAGES, baseline_stats, outcomes):
+        assert canvas_costs(result.stats) == canvas_costs(expected), name
+    assert {"blank", "probe", "vector"} <= {result.method for result in outcomes}
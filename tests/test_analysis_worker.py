@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+import pdf_analyzer
+from analysis_engine import PageError, PageResult
+from pdf_analyzer import AnalysisWorker
+from pdf_samples import SAMPLE_PAGES
+
+
+def _run(worker):
+    """Ejecuta worker.run() en este hilo y devuelve (lotes, progreso, cancelado)."""
+    batches, progress, finished = [], [], []
+    worker.results_ready.connect(batches.append)
+    worker.progress_changed.connect(lambda percent, label: progress.append((percent, label)))
+    worker.finished.connect(finished.append)
+    worker.run()
+    assert len(finished) == 1
+    return batches, progress, finished[0]
+
+
+@pytest.fixture
+def fake_analysis(monkeypatch):
+    """
+    Sustituye analyze_documents por páginas falsas de "plano.pdf" y time.monotonic
+    por un reloj que avanza step segundos por página. Devuelve la función que
+    configura (páginas, step, error tras n páginas).
+    """
+    clock = [0.0]
+    monkeypatch.setattr(pdf_analyzer.time, "monotonic", lambda: clock[0])
+
+    def configure(pages, step, fail_after=None):
+        def analyze(paths, **kwargs):
+            for page_num in range(1, pages + 1):
+                if page_num - 1 == fail_after:
+                    raise RuntimeError("documento dañado")
+                clock[0] += step
+                yield SimpleNamespace(pdf_name="plano.pdf", page_num=page_num)
+        monkeypatch.setattr(pdf_analyzer, "analyze_documents", analyze)
+    return configure
+
+
+def test_results_are_throttled_and_last_batch_flushed(qt_app, fake_analysis):
+    # Una página cada 40 ms: a 10 Hz sale un lote cada 3 páginas
+    fake_analysis(10, 0.04)
+    worker = AnalysisWorker(["plano.pdf"], None, 1, 10, {"plano.pdf": 10})
+    batches, progress, cancelled = _run(worker)
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert [page.page_num for batch in batches for page in batch] == list(range(1, 11))
+    assert progress == [(30, "Procesando: plano.pdf (página 3/10)"),
+                        (60, "Procesando: plano.pdf (página 6/10)"),
+                        (90, "Procesando: plano.pdf (página 9/10)")]
+    assert cancelled is False
+
+
+def test_fast_pages_arrive_in_one_batch(qt_app, fake_analysis):
+    fake_analysis(50, 0.001)
+    batches, progress, _ = _run(AnalysisWorker(["plano.pdf"], None, 1, 50, {"plano.pdf": 50}))
+    assert [len(batch) for batch in batches] == [50]
+    assert progress == []
+
+
+def test_engine_error_is_reported_in_last_batch(qt_app, fake_analysis):
+    fake_analysis(5, 0.001, fail_after=2)
+    [batch], _, cancelled = _run(AnalysisWorker(["plano.pdf"], None, 1, 5, {"plano.pdf": 5}))
+    assert [page.page_num for page in batch[:2]] == [1, 2]
+    assert isinstance(batch[2], PageError) and batch[2].message == "documento dañado"
+    assert cancelled is False
+
+
+def test_cancel_stops_before_next_page(qt_app, sample_pdf, monkeypatch):
+    monkeypatch.setattr(AnalysisWorker, "EMIT_INTERVAL_S", 0)
+    worker = AnalysisWorker([sample_pdf], None, 1, len(SAMPLE_PAGES), {"muestras.pdf": len(SAMPLE_PAGES)})
+    # Se cancela al recibir el primer lote, como el botón de la interfaz
+    worker.results_ready.connect(lambda batch: worker.cancel())
+    batches, _, cancelled = _run(worker)
+    assert cancelled is True
+    assert [len(batch) for batch in batches] == [1]
+    assert isinstance(batches[0][0], PageResult) and batches[0][0].page_num == 1
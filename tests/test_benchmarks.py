@@ -0,0 +1,88 @@
+import fitz  # PyMuPDF
+import pytest
+
+from analysis_engine import EXACT_CONFIG, analyze_documents
+from benchmarks import __main__ as benchmarks_main
+from benchmarks.corpus import PAGE_KINDS, SIZE_CLASSES, generate_corpus, generate_document
+from benchmarks.runner import check_pricing_decisions, compare, measure_class, percentile, run_benchmark
+from pdf_samples import cm_to_points
+
+# Resolución baja: las páginas del corpus son de 50 x 35 cm o más
+DPI = 36
+
+
+@pytest.fixture(scope="module")
+def corpus_pdf(tmp_path_factory):
+    return generate_document(str(tmp_path_factory.mktemp("corpus") / "cuarto.pdf"), "cuarto_pliego", 1)
+
+
+def test_corpus_is_deterministic(tmp_path, corpus_pdf):
+    again = generate_document(str(tmp_path / "otra.pdf"), "cuarto_pliego", 1)
+    with open(corpus_pdf, "rb") as first, open(again, "rb") as second:
+        assert first.read() == second.read()
+    other_seed = generate_document(str(tmp_path / "semilla.pdf"), "cuarto_pliego", 1, seed=1)
+    with open(corpus_pdf, "rb") as first, open(other_seed, "rb") as second:
+        assert first.read() != second.read()
+
+    width_cm, height_cm = SIZE_CLASSES["cuarto_pliego"]
+    with fitz.open(corpus_pdf) as doc:
+        assert doc.page_count == len(PAGE_KINDS)
+        for page in doc:
+            assert page.rect.width == pytest.approx(cm_to_points(width_cm))
+            assert page.rect.height == pytest.approx(cm_to_points(height_cm))
+        # Orden de PAGE_KINDS: líneas, foto, escaneo, vacía
+        assert [len(page.get_images()) for page in doc] == [0, 1, 1, 0]
+        assert doc.load_page(0).get_drawings() and not doc.load_page(3).get_contents()
+
+
+def test_exact_config_rasterizes_every_page(corpus_pdf):
+    result = measure_class(corpus_pdf, DPI, 1, EXACT_CONFIG, stages=True)
+    assert (result['pages'], result['errors']) == (len(PAGE_KINDS), 0)
+    assert result['methods'] == {"raster": len(PAGE_KINDS)}
+    assert result['p50_ms'] <= result['p95_ms']
+    assert result['stages'] and result['rasterized_mb'] > 0
+
+
+def test_estimate_mode_checks_prices(corpus_pdf):
+    result = measure_class(corpus_pdf, DPI, 1, {"coverage_estimate": True})
+    assert "sampled" in result['methods']
+    assert result['pricing_mismatches'] == []
+
+
+def test_pricing_check_reports_mismatches(corpus_pdf):
+    exact = {result.page_num: result for result in analyze_documents([corpus_pdf], dpi=DPI, config=EXACT_CONFIG)}
+    assert check_pricing_decisions(corpus_pdf, DPI, exact) == []
+    # La página de líneas medida como si fuera la foto: cambia su precio
+    wrong = {1: exact[2]}
+    mismatches = check_pricing_decisions(corpus_pdf, DPI, wrong)
+    assert mismatches and {mismatch['page'] for mismatch in mismatches} == {1}
+
+
+def test_no_fast_path_disables_every_fast_path(monkeypatch):
+    calls = []
+    monkeypatch.setattr(benchmarks_main, "run_benchmark", lambda **kwargs: calls.append(kwargs) or {'classes': {}})
+    benchmarks_main.main(["--no-fast-path", "--out", "/dev/null"])
+    benchmarks_main.main(["--no-fast-path", "--estimate", "--out", "/dev/null"])
+    assert calls[0]['config'] == EXACT_CONFIG
+    assert calls[1]['config'] == dict(EXACT_CONFIG, coverage_estimate=True)
+
+
+def test_run_benchmark_measures_each_class(tmp_path):
+    results = run_benchmark(corpus_dir=str(tmp_path), pages_per_kind=1, dpi=DPI, size_classes=["cuarto_pliego"],
+                            config=EXACT_CONFIG)
+    assert list(results['classes']) == ["cuarto_pliego"]
+    assert results['classes']['cuarto_pliego']['pages'] == len(PAGE_KINDS)
+    assert results['meta']['config'] == EXACT_CONFIG
+    # El corpus se reutiliza con el mismo nombre
+    assert generate_corpus(str(tmp_path), 1, size_classes=["cuarto_pliego"]) == \
+        {"cuarto_pliego": str(tmp_path / "cuarto_pliego_1x_2024.pdf")}
+
+    before = {'classes': {'cuarto_pliego': dict(results['classes']['cuarto_pliego'], pages_per_s=1.0)}}
+    [line] = compare(before, {'classes': {'cuarto_pliego': dict(before['classes']['cuarto_pliego'], pages_per_s=2.0)}})
+    assert line.startswith("cuarto_pliego: pages_per_s 1.0 -> 2.0 (+100.0%)")
+
+
+def test_percentile_interpolates():
+    assert percentile([], 0.5) is None
+    assert percentile([4, 1, 3, 2], 0.5) == 2.5
+    assert percentile([1, 2, 3], 0.95) == pytest.approx(2.9)
@@ -0,0 +1,40 @@
+import os
+
+from pdf_samples import write_pdf
+from document_registry import DocumentPool
+
+
+def test_pool_reopens_replaced_file(tmp_path):
+    path = write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.5)])
+    pool = DocumentPool(max_open=1)
+    try:
+        assert pool.get(path).page_count == 1
+        # Otro archivo en la misma ruta
+        os.remove(path)
+        write_pdf(path, [(21, 29.7, 0), (21, 29.7, 0)])
+        assert pool.get(path).page_count == 2
+        assert len(pool) == 1
+    finally:
+        pool.close_all()
+
+
+def test_pool_reuses_unchanged_file(tmp_path):
+    path = write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.5)])
+    pool = DocumentPool()
+    try:
+        assert pool.get(path) is pool.get(path)
+    finally:
+        pool.close_all()
+
+
+def test_pool_closes_least_recently_used(tmp_path):
+    first = write_pdf(tmp_path / "a.pdf", [(21, 29.7, 0)])
+    second = write_pdf(tmp_path / "b.pdf", [(21, 29.7, 0)])
+    pool = DocumentPool(max_open=1)
+    try:
+        doc = pool.get(first)
+        pool.get(second)
+        assert doc.is_closed
+        assert len(pool) == 1
+    finally:
+        pool.close_all()
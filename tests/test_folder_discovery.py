@@ -0,0 +1,56 @@
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from analysis_engine import analyze_documents, PageError
+from cotizador import run_quote
+from folder_discovery import display_names, iter_pdf_files, relative_name
+from pdf_samples import write_pdf
+from result_store import ResultStore
+
+
+@pytest.fixture
+def same_name_tree(tmp_path):
+    """a/plano.pdf y b/plano.pdf con coberturas distintas."""
+    for folder, coverage in (("a", 0.3), ("b", 0.6)):
+        os.mkdir(tmp_path / folder)
+        write_pdf(tmp_path / folder / "plano.pdf", [(21, 29.7, coverage)])
+    return str(tmp_path)
+
+
+def test_iter_pdf_files_is_recursive_and_sorted(same_name_tree):
+    found = [relative_name(path, same_name_tree) for path in iter_pdf_files(same_name_tree)]
+    assert found == ["a/plano.pdf", "b/plano.pdf"]
+
+
+def test_display_names_disambiguate_same_file_name(same_name_tree):
+    first = os.path.join(same_name_tree, "a", "plano.pdf")
+    second = os.path.join(same_name_tree, "b", "plano.pdf")
+    assert display_names([first]) == {first: "plano.pdf"}
+    assert display_names([first, second]) == {first: "a/plano.pdf", second: "b/plano.pdf"}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_are_named_by_relative_path(same_name_tree, workers):
+    paths = list(iter_pdf_files(same_name_tree))
+    names = {path: relative_name(path, same_name_tree) for path in paths}
+    outcomes = list(analyze_documents(paths, workers=workers, names=names))
+    assert not [outcome for outcome in outcomes if isinstance(outcome, PageError)]
+    assert {(o.pdf_name, o.non_white_percentage) for o in outcomes} == {("a/plano.pdf", 30), ("b/plano.pdf", 60)}
+
+    store = ResultStore()
+    store.append(outcomes)
+    assert store.view().pdf_names() == ["a/plano.pdf", "b/plano.pdf"]
+
+
+def test_cli_names_folder_files_by_relative_path(same_name_tree):
+    args = SimpleNamespace(paths=[same_name_tree], filter="*.pdf", no_cache=True, metrics_json=None,
+                           metrics_prom=None, estimate=False, gray_first=False,
+                           native_images=False, pixel_budget=None, format="jsonl",
+                           canvas=None, dpi=150, jobs=1)
+    stdout = io.StringIO()
+    assert run_quote(args, stdout=stdout, stderr=io.StringIO()) == 0
+    assert '"pdf_name": "a/plano.pdf"' in stdout.getvalue()
+    assert '"pdf_name": "b/plano.pdf"' in stdout.getvalue()
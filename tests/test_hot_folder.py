@@ -0,0 +1,172 @@
+import json
+import os
+import time
+
+import pytest
+
+import hot_folder
+from hot_folder import HotFolder, quote_paths, read_quote_signature, write_atomic
+from pdf_samples import write_pdf
+
+SETTLE_S = 5.0
+
+
+def _hot_folder(folder, log, **config):
+    return HotFolder(str(folder), jobs=1, dpi=50, config={"settle_s": SETTLE_S, **config}, log=log.append)
+
+
+def _run_until_quoted(folder, paths, now, deadline_s=60):
+    """Ciclos de run_once (siempre en el instante now) hasta que todos los paths tengan cotización."""
+    deadline = time.monotonic() + deadline_s
+    while not all(os.path.exists(quote_paths(path)[0]) for path in paths):
+        assert time.monotonic() < deadline, "la carpeta vigilada no cotizó a tiempo"
+        folder.run_once(now=now, timeout=0.5)
+
+
+def _read_quote(path):
+    with open(quote_paths(path)[0], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_files_are_quoted_after_settling(tmp_path):
+    path = str(write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.5)]))
+    log = []
+    folder = _hot_folder(tmp_path, log)
+    try:
+        # Primer recorrido: se observa; sin cambios durante menos de settle_s no se analiza
+        folder.run_once(now=0)
+        folder.run_once(now=SETTLE_S - 1)
+        assert not folder._in_flight and not os.path.exists(quote_paths(path)[0])
+        _run_until_quoted(folder, [path], now=SETTLE_S)
+    finally:
+        folder.close()
+
+    quote = _read_quote(path)
+    assert quote['status'] == "ok" and quote['total_pages'] == 1 and not quote['errors']
+    assert os.path.exists(quote_paths(path)[1])
+    assert read_quote_signature(path) == hot_folder.file_signature(path)
+    assert len(log) == 1 and log[0].startswith("✅ plano.pdf")
+
+
+def test_changing_file_restarts_settle_delay(tmp_path):
+    path = str(write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.5)]))
+    folder = _hot_folder(tmp_path, [])
+    try:
+        folder.scan(now=0)
+        # Sigue copiándose: la espera empieza de nuevo
+        with open(path, "ab") as f:
+            f.write(b"\n")
+        folder.scan(now=SETTLE_S)
+        assert not folder._queued
+        folder.scan(now=2 * SETTLE_S)
+        assert folder._queued == {path}
+    finally:
+        folder.close()
+
+
+def test_restart_skips_quoted_files(tmp_path):
+    path = str(write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.5)]))
+    folder = _hot_folder(tmp_path, [])
+    try:
+        folder.run_once(now=0)
+        _run_until_quoted(folder, [path], now=SETTLE_S)
+    finally:
+        folder.close()
+    written = os.stat(quote_paths(path)[0]).st_mtime_ns
+
+    log = []
+    restarted = _hot_folder(tmp_path, log)
+    try:
+        restarted.run_once(now=0)
+        restarted.run_once(now=SETTLE_S)
+        assert not restarted._queued and not restarted._in_flight
+        assert restarted._done == {path: hot_folder.file_signature(path)}
+    finally:
+        restarted.close()
+    assert os.stat(quote_paths(path)[0]).st_mtime_ns == written
+    assert not log
+
+
+def test_corrupt_pdf_gets_error_quote(tmp_path):
+    path = str(tmp_path / "dañado.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.7\nesto no es un PDF")
+    log = []
+    folder = _hot_folder(tmp_path, log)
+    try:
+        folder.run_once(now=0)
+        _run_until_quoted(folder, [path], now=SETTLE_S)
+        # No se reintenta mientras no cambie
+        folder.run_once(now=2 * SETTLE_S)
+        assert not folder._queued and not folder._in_flight
+    finally:
+        folder.close()
+
+    quote = _read_quote(path)
+    assert quote['status'] == "error" and quote['total_pages'] == 0 and quote['errors']
+    assert not os.path.exists(quote_paths(path)[1])
+    assert len(log) == 1 and log[0].startswith("❌ dañado.pdf")
+
+
+def test_full_queue_keeps_smallest_files(tmp_path):
+    paths = [str(write_pdf(tmp_path / f"plano{count}.pdf", [(21, 29.7, 0.5)] * count)) for count in (3, 1, 2)]
+    sizes = {path: os.path.getsize(path) for path in paths}
+    assert len(set(sizes.values())) == 3
+    folder = _hot_folder(tmp_path, [], max_queued=2)
+    folder.scan(now=0)
+    folder.scan(now=SETTLE_S)
+    assert folder._queued == set(sorted(paths, key=sizes.get)[:2])
+    assert len(folder._queue) == 2
+
+
+def test_write_atomic_keeps_previous_file_on_error(tmp_path):
+    path = str(tmp_path / "plano.cotizacion.json")
+
+    def write(text, error=None):
+        def write_file(temp_path):
+            with open(temp_path, "w") as f:
+                f.write(text)
+            if error is not None:
+                raise error
+        return write_file
+
+    write_atomic(path, write("anterior"))
+    with pytest.raises(OSError):
+        write_atomic(path, write("a medio", OSError("disco lleno")))
+    with open(path) as f:
+        assert f.read() == "anterior"
+    # Ni el temporal ni el archivo final a medio escribir
+    assert os.listdir(tmp_path) == ["plano.cotizacion.json"]
+
+
+_quote_document = hot_folder.quote_document
+
+
+def _crash_on_bad_file(path, canvas, dpi):
+    if os.path.basename(path) == "malo.pdf":
+        # Da tiempo a que el otro archivo esté en curso cuando se rompe el pool
+        time.sleep(0.5)
+        os._exit(1)
+    time.sleep(1)
+    return _quote_document(path, canvas, dpi)
+
+
+def test_worker_crash_charges_only_the_crashing_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(hot_folder, "quote_document", _crash_on_bad_file)
+    good = str(write_pdf(tmp_path / "bueno.pdf", [(21, 29.7, 0.5)]))
+    bad = str(write_pdf(tmp_path / "malo.pdf", [(21, 29.7, 0.5)]))
+    log = []
+    # Un solo intento: sin aislar los archivos, el bueno también terminaría en error
+    folder = HotFolder(str(tmp_path), jobs=2, dpi=50, config={"settle_s": SETTLE_S, "max_attempts": 1},
+                       log=log.append)
+    try:
+        folder.run_once(now=0)
+        folder.run_once(now=SETTLE_S)
+        assert len(folder._in_flight) == 2
+        _run_until_quoted(folder, [good, bad], now=SETTLE_S)
+    finally:
+        folder.close()
+
+    assert _read_quote(good)['status'] == "ok"
+    assert _read_quote(bad)['errors'] == ["El proceso de análisis terminó de forma anormal"]
+    assert not folder._suspects
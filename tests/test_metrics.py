@@ -0,0 +1,121 @@
+import json
+import re
+
+import pytest
+
+import metrics
+from analysis_cache import AnalysisCache
+from analysis_engine import PageError, analyze_documents
+from metrics import STAGES, PipelineMetrics, add_time
+from pdf_samples import SAMPLE_DPI, SAMPLE_PAGES
+
+# Línea de muestra del formato de texto de Prometheus: nombre{etiquetas} valor
+_SAMPLE_LINE = re.compile(r'^([a-z_]+)(\{stage="([a-z]+)"\})? (-?\d+(\.\d+)?)$')
+
+
+def test_add_and_add_time(monkeypatch):
+    clock = iter([10.25, 12.0])
+    monkeypatch.setattr(metrics, "perf_counter", lambda: next(clock))
+    timings = {}
+    add_time(timings, "render", 10.0)
+    add_time(timings, "render", 11.5)
+    assert timings == {"render": pytest.approx(0.75)}
+
+    pipeline = PipelineMetrics()
+    pipeline.add("count", 0.5)
+    pipeline.add("count", 0.25, calls=3)
+    assert (pipeline.seconds["count"], pipeline.calls["count"]) == (0.75, 4)
+    # Etapas fuera de STAGES también se acumulan
+    pipeline.add("otra", 1.0)
+    assert (pipeline.seconds["otra"], pipeline.calls["otra"]) == (1.0, 1)
+
+
+@pytest.fixture(scope="module")
+def observed(tmp_path_factory, sample_pdf):
+    cache = AnalysisCache(path=str(tmp_path_factory.mktemp("cache") / "cache.sqlite3"))
+    runs = []
+    try:
+        # Segunda pasada: todas las páginas salen de la caché
+        for _ in range(2):
+            pipeline = PipelineMetrics()
+            outcomes = list(analyze_documents([sample_pdf], dpi=SAMPLE_DPI, cache=cache, metrics=pipeline))
+            assert not [outcome for outcome in outcomes if isinstance(outcome, PageError)]
+            runs.append((pipeline, outcomes))
+    finally:
+        cache.close()
+    return runs
+
+
+def test_observe_sums_stages_and_counters(observed):
+    (pipeline, outcomes), (cached, _) = observed
+    counters = pipeline.counters
+    assert counters['pages'] == len(SAMPLE_PAGES) == counters['measured_pages'] + counters['reused_pages']
+    assert counters['fast_path_pages'] == sum(result.method != "raster" for result in outcomes)
+    # Solo las páginas repetidas se reutilizan la primera vez
+    assert counters['reused_pages'] == sum(bool(result.duplicate_of) for result in outcomes)
+    assert counters['rasterized_bytes'] > 0
+    assert counters['cache_misses'] > 0 and counters['cache_hits'] == 0
+    assert pipeline.calls["open"] == 1 and pipeline.calls["render"] > 0
+    assert 0 < sum(pipeline.seconds.values()) <= pipeline.wall_seconds
+
+    # Las vías rápidas no se guardan en caché: se resuelven de nuevo, sin rasterizar
+    assert cached.counters['fast_path_pages'] == counters['fast_path_pages']
+    assert cached.counters['reused_pages'] == len(SAMPLE_PAGES) - counters['fast_path_pages']
+    assert cached.counters['cache_hits'] > 0 and cached.counters['rasterized_bytes'] == 0
+    assert cached.calls["render"] == 0
+
+
+def test_json_output(observed, tmp_path):
+    pipeline, _ = observed[0]
+    path = tmp_path / "metricas.json"
+    pipeline.write_json(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert list(data['stages']) == list(STAGES)
+    assert data['counters'] == pipeline.counters
+    assert data['pages_per_s'] == pytest.approx(len(SAMPLE_PAGES) / pipeline.wall_seconds, rel=1e-3)
+    for stage, values in data['stages'].items():
+        assert values['seconds'] == round(pipeline.seconds[stage], 6)
+        assert values['calls'] == pipeline.calls[stage]
+        assert values['share'] == pytest.approx(pipeline.seconds[stage] / pipeline.wall_seconds, abs=1e-4)
+    # Sin tiempos no hay proporciones
+    assert PipelineMetrics().to_dict()['pages_per_s'] is None
+
+
+def test_prometheus_exposition(observed, tmp_path):
+    pipeline, _ = observed[0]
+    path = tmp_path / "cotizador.prom"
+    pipeline.write_prometheus(str(path))
+    text = path.read_text(encoding="utf-8")
+    assert text.endswith("\n")
+
+    types = {}
+    stage_seconds, stage_calls, values = {}, {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("counter", "gauge")
+            types[name] = kind
+            continue
+        if line.startswith("# HELP "):
+            continue
+        match = _SAMPLE_LINE.match(line)
+        assert match, line
+        name, _, stage, value = match.group(1, 2, 3, 4)
+        # Cada serie va después de su # TYPE
+        assert name in types, name
+        if name == "cotizador_stage_seconds_total":
+            stage_seconds[stage] = float(value)
+        elif name == "cotizador_stage_calls_total":
+            stage_calls[stage] = int(value)
+        else:
+            values[name] = float(value)
+
+    assert types["cotizador_stage_seconds_total"] == "counter"
+    assert stage_seconds == {stage: pytest.approx(seconds, abs=1e-6) for stage, seconds in pipeline.seconds.items()}
+    assert stage_calls == pipeline.calls
+    for name, value in pipeline.counters.items():
+        assert types[f"cotizador_{name}_total"] == "counter"
+        assert values[f"cotizador_{name}_total"] == value
+    assert types["cotizador_run_seconds"] == "gauge"
+    assert values["cotizador_run_seconds"] == pytest.approx(pipeline.wall_seconds, abs=1e-6)
+    assert not [name for name in tmp_path.iterdir() if ".tmp-" in name.name]
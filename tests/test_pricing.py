@@ -0,0 +1,78 @@
+import fitz  # PyMuPDF
+import pytest
+
+from analysis_engine import PageStats, measure_page, page_pixel_rect, price_page
+from pdf_samples import cm_to_points, write_pdf
+from price_matrix import PriceMatrix
+from result_store import ResultStore
+from utils import PRINT_COSTS
+
+CANVASES = (None, *PRINT_COSTS)
+
+
+def _stats_at(width_cm, height_cm, percentage, dpi, line_type="color"):
+    """PageStats como las deja measure_page para una página de ese tamaño medida a dpi."""
+    rect = fitz.Rect(0, 0, cm_to_points(width_cm), cm_to_points(height_cm))
+    pixel_rect = (rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    return PageStats(
+        width_px=pixel_rect.width,
+        height_px=pixel_rect.height,
+        non_white_percentage=percentage,
+        line_type=line_type,
+        dpi=dpi,
+        width_pt=rect.width,
+        height_pt=rect.height
+    )
+
+
+@pytest.mark.parametrize("size_cm", [(60, 206), (70, 100), (100, 120), (91.5, 250.3)])
+@pytest.mark.parametrize("percentage", [5, 30, 42, 97])
+def test_price_does_not_depend_on_dpi(size_cm, percentage):
+    for canvas in CANVASES:
+        costs = {dpi: price_page(_stats_at(*size_cm, percentage, dpi), "", 1, canvas=canvas).cost
+                 for dpi in (300, 242, 171, 150)}
+        assert len(set(costs.values())) == 1, (canvas, costs)
+
+
+def test_measure_page_records_page_size(tmp_path):
+    path = write_pdf(tmp_path / "plano.pdf", [(60, 206, 0.3)])
+    with fitz.open(path) as doc:
+        page = doc.load_page(0)
+        stats = measure_page(page, dpi=72)
+        assert (stats.width_pt, stats.height_pt) == (page.rect.width, page.rect.height)
+        pixel_rect = page_pixel_rect(page, fitz.Matrix(1, 1))
+        assert (stats.width_px, stats.height_px) == (pixel_rect.width, pixel_rect.height)
+
+
+def test_stats_without_page_size_use_pixels_and_dpi():
+    # Mediciones guardadas en caché antes de registrar el tamaño en puntos
+    stats = PageStats(width_px=2480, height_px=3508, non_white_percentage=30, line_type="color")
+    result = price_page(stats, "", 1, dpi=300)
+    assert round(result.width_cm_original, 2) == 29.7
+    assert round(result.height_cm_original, 2) == 21.0
+
+
+def test_matrix_and_store_match_price_page():
+    stats = [
+        _stats_at(width_cm, height_cm, percentage, dpi, line_type)
+        for width_cm, height_cm in [(21, 29.7), (50, 70), (60, 206), (95, 130), (100, 300)]
+        for percentage in (0, 5, 9, 10, 30, 55, 100)
+        for dpi in (300, 150)
+        for line_type in ("negra", "color", None)
+    ]
+    matrix = PriceMatrix.from_stats(stats)
+    for canvas in CANVASES:
+        expected = [price_page(s, "", 1, canvas=canvas).cost for s in stats]
+        assert list(matrix.costs(canvas)) == expected, canvas
+
+    store = ResultStore()
+    store.append([price_page(s, "plano.pdf", i + 1) for i, s in enumerate(stats)])
+    for canvas in CANVASES:
+        view = store.view(canvas)
+        for index, s in enumerate(stats):
+            result = price_page(s, "plano.pdf", index + 1, canvas=canvas)
+            row = result.to_dict()
+            assert view.cost(index) == result.cost
+            assert view[index]['dimensions'] == row['dimensions']
+            assert view[index]['original_dimensions'] == row['original_dimensions']
+            assert view[index]['print_type'] == row['print_type']
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+
+from pdf_samples import write_pdf
+from quote_server import QuoteServer
+
+JOB_TIMEOUT_S = 60
+
+
+async def _request(host, port, method, target, payload=None, body=None, content_type="application/json"):
+    reader, writer = await asyncio.open_connection(host, port)
+    if body is None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    head = f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n"
+    if method == "POST":
+        head += f"Content-Length: {len(body)}\r\n"
+    writer.write((head + "\r\n").encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    _, _, data = rest.partition(b"\r\n\r\n")
+    return int(status_line.split()[1]), json.loads(data)
+
+
+async def _wait_job(host, port, created):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + JOB_TIMEOUT_S
+    while True:
+        status, job = await _request(host, port, "GET", f"/jobs/{created['job_id']}")
+        assert status == 200
+        if job['status'] in ("done", "error"):
+            return job
+        assert loop.time() < deadline, "el trabajo no terminó"
+        await asyncio.sleep(0.05)
+
+
+async def _quote_path(host, port, path):
+    status, created = await _request(host, port, "POST", "/jobs", {'path': path})
+    assert status == 202
+    return await _wait_job(host, port, created)
+
+
+def test_replaced_file_is_quoted_from_new_content(tmp_path):
+    path = str(tmp_path / "plano.pdf")
+
+    async def scenario():
+        server = QuoteServer(workers=1, config={'port': 0})
+        host, port = await server.start()
+        try:
+            write_pdf(path, [(21, 29.7, 0.49)])
+            first = await _quote_path(host, port, path)
+            # Otro archivo en la misma ruta; el proceso del pool ya midió el anterior
+            os.remove(path)
+            write_pdf(path, [(29.7, 42, 0)])
+            second = await _quote_path(host, port, path)
+            return first, second
+        finally:
+            await server.close()
+
+    first, second = asyncio.run(scenario())
+    assert first['status'] == second['status'] == "done"
+    assert first['pages'][0]['non_white_percentage'] == 49
+    assert second['pages'][0]['non_white_percentage'] == 0
+    assert (second['pages'][0]['width_cm'], second['pages'][0]['height_cm']) == (42, 29.7)
+    assert second['total_cost'] != first['total_cost']
+
+
+def test_uploaded_pdf_is_quoted_and_removed(tmp_path):
+    with open(write_pdf(tmp_path / "subido.pdf", [(21, 29.7, 0.3)]), "rb") as f:
+        body = f.read()
+
+    async def scenario():
+        server = QuoteServer(workers=1, config={'port': 0})
+        host, port = await server.start()
+        try:
+            status, created = await _request(host, port, "POST", "/jobs?name=subido.pdf",
+                                             body=body, content_type="application/pdf")
+            assert status == 202
+            job = await _wait_job(host, port, created)
+            return job, os.listdir(server._upload_dir)
+        finally:
+            await server.close()
+
+    job, leftover = asyncio.run(scenario())
+    assert job['status'] == "done"
+    assert job['pdf_name'] == "subido.pdf"
+    assert job['pages'][0]['non_white_percentage'] == 30
+    assert leftover == []
+
+
+def _descriptor_inode(fd):
+    """Inodo de fd en el proceso que lo ejecuta, o None si no está abierto."""
+    try:
+        return os.fstat(fd).st_ino
+    except OSError:
+        return None
+
+
+def test_worker_processes_do_not_inherit_server_sockets(tmp_path):
+    path = write_pdf(tmp_path / "plano.pdf", [(21, 29.7, 0.3)])
+
+    async def scenario():
+        server = QuoteServer(workers=1, config={'port': 0})
+        host, port = await server.start()
+        try:
+            job = await _quote_path(host, port, path)
+            listener = server._server.sockets[0].fileno()
+            in_worker = await asyncio.get_running_loop().run_in_executor(
+                server._executor, _descriptor_inode, listener)
+            return job, _descriptor_inode(listener), in_worker
+        finally:
+            await server.close()
+
+    # Con el socket de escucha heredado, el cliente no ve el cierre de su conexión
+    job, listener_inode, worker_inode = asyncio.run(scenario())
+    assert job['status'] == "done"
+    assert worker_inode != listener_inode
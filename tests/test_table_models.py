@@ -0,0 +1,117 @@
+import pytest
+from PySide6.QtCore import Qt
+
+from table_models import QuotesTableModel, ResultsTableModel
+
+
+def _result(pdf_name, page_num, cost, print_type="Medio Pliego", **extra):
+    return dict({'pdf_name': pdf_name, 'page_num': page_num, 'dimensions': "50 x 70 cm",
+                 'non_white_percentage': 30, 'print_type': print_type, 'cost': cost, 'canvas': None,
+                 'method': "raster"}, **extra)
+
+
+@pytest.fixture
+def results(qt_app):
+    return ResultsTableModel([
+        _result("b.pdf", 1, 12000),
+        _result("A.pdf", 2, 3500, print_type="Cuarto Pliego"),
+        _result("a.pdf", 1, 12000, method="vector"),
+        _result("c.pdf", 1, 1250000, print_type="Pliego"),
+    ])
+
+
+def _column(model, column):
+    return [model.data(model.index(row, column)) for row in range(model.rowCount())]
+
+
+def test_rows_and_cells(results):
+    assert (results.rowCount(), results.columnCount()) == (4, len(ResultsTableModel.COLUMNS))
+    assert results.headerData(5, Qt.Horizontal) == "Costo"
+    assert _column(results, 5) == ["$12,000", "$3,500", "$12,000", "$1,250,000"]
+    assert results.data(results.index(0, 5), Qt.TextAlignmentRole) == int(Qt.AlignRight | Qt.AlignVCenter)
+    assert _column(results, 7)[2] == "⚡ Vectorial"
+
+
+def test_sort_is_stable_and_case_insensitive(results):
+    results.sort(0)
+    assert _column(results, 0) == ["a.pdf", "A.pdf", "b.pdf", "c.pdf"]
+    # A igual costo se mantiene el orden anterior (por nombre), también en descendente
+    results.sort(5, Qt.DescendingOrder)
+    assert _column(results, 0) == ["c.pdf", "a.pdf", "b.pdf", "A.pdf"]
+    # Columna negativa: orden de llegada
+    results.sort(-1)
+    assert _column(results, 0) == ["b.pdf", "A.pdf", "a.pdf", "c.pdf"]
+    assert [results.source_row(row) for row in range(4)] == [0, 1, 2, 3]
+
+
+def test_text_filter(results):
+    results.set_filter_text("  PLIEGO ")
+    assert results.rowCount() == 4
+    results.set_filter_text("cuarto")
+    assert [results.record_at(row)['pdf_name'] for row in range(results.rowCount())] == ["A.pdf"]
+    results.set_filter_text("a.pdf")
+    assert _column(results, 0) == ["A.pdf", "a.pdf"]
+    results.set_filter_text("")
+    assert results.rowCount() == 4
+
+
+@pytest.mark.parametrize("text, expected", [
+    (">10000", ["b.pdf", "a.pdf", "c.pdf"]),
+    ("< $5.000", ["A.pdf"]),
+    ("<= 12,000", ["b.pdf", "A.pdf", "a.pdf"]),
+    ("= 1.250.000", ["c.pdf"]),
+    (">=1,250,000", ["c.pdf"]),
+])
+def test_cost_filter_ignores_thousands_separators(results, text, expected):
+    results.set_filter_text(text)
+    assert _column(results, 0) == expected
+
+
+def test_appended_records_keep_sort_and_filter(results):
+    results.set_filter_text(">10000")
+    results.sort(5)
+    results.append_records([_result("d.pdf", 1, 50000), _result("e.pdf", 1, 100)])
+    assert _column(results, 0) == ["b.pdf", "a.pdf", "d.pdf", "c.pdf"]
+    # Reemplazar los registros conserva el orden y el filtro
+    results.set_records([_result("f.pdf", 1, 20000), _result("g.pdf", 1, 15000), _result("h.pdf", 1, 10)])
+    assert _column(results, 0) == ["g.pdf", "f.pdf"]
+    results.remove_source_row(1)
+    assert _column(results, 0) == ["f.pdf"]
+    results.clear()
+    assert results.rowCount() == 0
+
+
+def test_unsorted_append_inserts_rows(results):
+    inserted = []
+    results.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    results.set_filter_text("pdf")
+    results.append_records([_result("d.pdf", 1, 100), _result("otro", 2, 100), _result("e.pdf", 3, 100)])
+    assert inserted == [(4, 5)]
+    assert results.rowCount() == 6
+
+
+def test_method_column_and_tooltips(qt_app):
+    model = ResultsTableModel([
+        _result("a.pdf", 1, 100, duplicate_of="b.pdf p. 2"),
+        _result("a.pdf", 2, 100, method="sampled", coverage_interval=[12.04, 13.96]),
+        _result("a.pdf", 3, 100, dpi=150.0),
+    ])
+    assert _column(model, 7) == ["♻️ Igual a b.pdf p. 2", "🎯 Estimada", "Rasterizada"]
+    tooltips = [model.data(model.index(row, 7), Qt.ToolTipRole) for row in range(3)]
+    assert tooltips[1].startswith("Cobertura estimada por muestreo: entre 12.0% y 14.0%")
+    assert tooltips[2] == "Rasterizada a 150 ppp"
+    assert model.data(model.index(0, 5), Qt.ToolTipRole) is None
+
+
+def test_quotes_model(qt_app):
+    quotes = QuotesTableModel([
+        {'pdf_names': "plano.pdf", 'total_pages': 3, 'print_type': "Pliego", 'total_cost': 45000},
+        {'pdf_names': "Fachada.pdf, corte.pdf", 'total_pages': 12, 'print_type': "Mixto", 'total_cost': 9000},
+    ])
+    assert quotes.rowCount() == 2 and quotes.columnCount() == 4
+    quotes.sort(1, Qt.DescendingOrder)
+    assert _column(quotes, 1) == ["12", "3"]
+    quotes.set_filter_text("corte")
+    assert _column(quotes, 3) == ["$9,000"]
+    quotes.set_filter_text("> 10.000")
+    assert _column(quotes, 0) == ["plano.pdf"]
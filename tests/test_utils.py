@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import utils
+from utils import LINE_DETECTION_CONFIG, combine_pixel_stats, compute_pixel_stats_and_line_type
+
+
+def _reference_stats(rgb):
+    """Conteo píxel a píxel con los umbrales de LINE_DETECTION_CONFIG (la definición original)."""
+    black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
+    white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    white_count = black_count = 0
+    for r, g, b in rgb.reshape(-1, 3).tolist():
+        if r >= white_threshold and g >= white_threshold and b >= white_threshold:
+            white_count += 1
+        elif r <= black_threshold and g <= black_threshold and b <= black_threshold:
+            black_count += 1
+    return utils._pixel_stats_dict(rgb.shape[0] * rgb.shape[1], white_count, black_count,
+                                   LINE_DETECTION_CONFIG["min_black_ratio"])
+
+
+@pytest.fixture
+def page_pixels():
+    """Página RGB con fondo blanco, texto negro, manchas de color y tonos junto a los umbrales."""
+    rng = np.random.default_rng(7)
+    black_threshold = LINE_DETECTION_CONFIG["black_threshold"]
+    white_threshold = LINE_DETECTION_CONFIG["white_threshold"]
+    levels = np.array([0, black_threshold, black_threshold + 1, 128,
+                       white_threshold - 1, white_threshold, 255], dtype=np.uint8)
+    rgb = np.full((97, 131, 3), 255, dtype=np.uint8)
+    rgb[10:40, 5:90] = levels[rng.integers(0, len(levels), size=(30, 85, 3))]
+    rgb[50:60, :] = 0
+    rgb[70:95, 100:130] = rng.integers(0, 256, size=(25, 30, 3), dtype=np.uint8)
+    return rgb
+
+
+def test_numpy_kernel_matches_reference(page_pixels, monkeypatch):
+    expected = _reference_stats(page_pixels)
+    assert compute_pixel_stats_and_line_type(page_pixels) == expected
+    # Bloques de pocas filas: el resultado no depende del troceado
+    monkeypatch.setattr(utils, "KERNEL_BLOCK_PIXELS", 500)
+    assert compute_pixel_stats_and_line_type(page_pixels) == expected
+
+
+def test_kernel_reads_strided_and_alpha_buffers(page_pixels):
+    expected = _reference_stats(page_pixels)
+    rgba = np.dstack([page_pixels, np.zeros(page_pixels.shape[:2], dtype=np.uint8)])
+    assert compute_pixel_stats_and_line_type(rgba) == expected
+    assert compute_pixel_stats_and_line_type(rgba[:, :, :3]) == expected
+    assert compute_pixel_stats_and_line_type(Image.fromarray(rgba, "RGBA")) == expected
+
+
+def test_gray_buffer_matches_rgb_reference(page_pixels):
+    gray = page_pixels[:, :, 0]
+    expected = _reference_stats(np.dstack([gray, gray, gray]))
+    assert compute_pixel_stats_and_line_type(gray) == expected
+    assert compute_pixel_stats_and_line_type(gray[:, :, np.newaxis]) == expected
+
+
+def test_pillow_fallback_matches_numpy(page_pixels, monkeypatch):
+    image = Image.fromarray(page_pixels, "RGB")
+    expected = compute_pixel_stats_and_line_type(image)
+    monkeypatch.setattr(utils, "_HAS_NUMPY", False)
+    assert compute_pixel_stats_and_line_type(image) == expected == _reference_stats(page_pixels)
+
+
+def test_combined_bands_match_whole_page(page_pixels):
+    bands = [compute_pixel_stats_and_line_type(page_pixels[y0:y0 + 20]) for y0 in range(0, 97, 20)]
+    assert combine_pixel_stats(bands) == compute_pixel_stats_and_line_type(page_pixels)